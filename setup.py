@@ -14,6 +14,7 @@ console_scripts = [
     "dev.xia2.show_mask=xia2.cli.show_mask:run",
     "dev.xia2.show_mtz_cells=xia2.cli.show_mtz_cells:run",
     "xia2.add_free_set=xia2.cli.add_free_set:run",
+    "xia2.benchmark=xia2.cli.benchmark:run",
     "xia2.compare_merging_stats=xia2.cli.compare_merging_stats:run",
     "xia2.delta_cc_half=xia2.cli.delta_cc_half:run",
     "xia2.get_image_number=xia2.cli.get_image_number:run",
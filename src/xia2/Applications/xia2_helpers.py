@@ -1,11 +1,12 @@
-import glob
+import concurrent.futures
 import logging
 import os
 import shutil
+import time
 import uuid
 
-from xia2.Driver.DriverFactory import DriverFactory
 from xia2.lib.bits import auto_logfiler
+from xia2.Schema.Serialization import dumps, loads
 from xia2.Wrappers.XIA.Integrate import Integrate as XIA2Integrate
 
 logger = logging.getLogger("xia2.Applications.xia2_helpers")
@@ -16,7 +17,8 @@ def process_one_sweep(args):
     args = args[0]
     # stop_after = args.stop_after
 
-    command_line_args = args.command_line_args
+    # the jobs may run concurrently in threads sharing args, so modify a copy
+    command_line_args = list(args.command_line_args)
     nproc = args.nproc
     crystal_id = args.crystal_id
     wavelength_id = args.wavelength_id
@@ -24,9 +26,6 @@ def process_one_sweep(args):
     failover = args.failover
     driver_type = args.driver_type
 
-    default_driver_type = DriverFactory.get_driver_type()
-    DriverFactory.set_driver_type(driver_type)
-
     curdir = os.path.abspath(os.curdir)
 
     if "-xinfo" in command_line_args:
@@ -34,25 +33,26 @@ def process_one_sweep(args):
         del command_line_args[idx + 1]
         del command_line_args[idx]
 
-    xia2_integrate = XIA2Integrate()
-
-    # import tempfile
-    # tmpdir = tempfile.mkdtemp(dir=curdir)
+    # several sweeps may be processed concurrently from threads of the same
+    # process, so pass the driver type explicitly rather than setting it in
+    # the DriverFactory
+    xia2_integrate = XIA2Integrate(DriverType=driver_type)
 
+    # the sweep is processed in a temporary directory, but with the
+    # crystal/wavelength/sweep directories created directly within the
+    # project directory so that the results need not be moved afterwards
     tmpdir = os.path.join(curdir, str(uuid.uuid4()))
     os.makedirs(tmpdir)
     xia2_integrate.set_working_directory(tmpdir)
-    xia2_integrate.add_command_line_args(args.command_line_args)
+    xia2_integrate.add_command_line_args(command_line_args)
     xia2_integrate.set_phil_file(os.path.join(curdir, "xia2-working.phil"))
     xia2_integrate.add_command_line_args(["sweep.id=%s" % sweep_id])
+    xia2_integrate.add_command_line_args(["project_directory=%s" % curdir])
     xia2_integrate.set_nproc(nproc)
     xia2_integrate.set_njob(1)
     xia2_integrate.set_mp_mode("serial")
     auto_logfiler(xia2_integrate)
 
-    sweep_tmp_dir = os.path.join(tmpdir, crystal_id, wavelength_id, sweep_id)
-    sweep_target_dir = os.path.join(curdir, crystal_id, wavelength_id, sweep_id)
-
     output = None
     success = False
     xsweep_dict = None
@@ -66,38 +66,49 @@ def process_one_sweep(args):
         if not failover:
             raise
     finally:
-        from xia2.Schema.XProject import XProject
-
         xia2_json = os.path.join(tmpdir, "xia2.json")
-        json_files = glob.glob(os.path.join(sweep_tmp_dir, "*", "*.json"))
-        json_files.extend(glob.glob(os.path.join(sweep_tmp_dir, "*", "*.expt")))
         if os.path.exists(xia2_json):
-            json_files.append(xia2_json)
-
-        import fileinput
+            shutil.move(xia2_json, os.path.join(curdir, "xia2-%s.json" % sweep_id))
+        xia2_profile = os.path.join(tmpdir, "xia2-profile.json")
+        if os.path.exists(xia2_profile):
+            shutil.move(
+                xia2_profile, os.path.join(curdir, "xia2-profile-%s.json" % sweep_id)
+            )
 
-        for line in fileinput.FileInput(files=json_files, inplace=1):
-            line = line.replace(sweep_tmp_dir, sweep_target_dir)
-            print(line)
+        if success:
+            xsweep_dict = read_sweep_state(
+                os.path.join(tmpdir, "xia2-sweeps.state"),
+                crystal_id,
+                wavelength_id,
+                sweep_id,
+            )
 
-        if os.path.exists(xia2_json):
-            new_json = os.path.join(curdir, "xia2-%s.json" % sweep_id)
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        return success, output, xsweep_dict
 
-            shutil.copyfile(xia2_json, new_json)
 
-        move_output_folder(sweep_tmp_dir, sweep_target_dir)
+def write_sweep_state(crystals, filename):
+    """Write the serialized state of every sweep, with the crystal,
+    wavelength and sweep names, for read_sweep_state()."""
+    state = []
+    for crystal_id, crystal in crystals.items():
+        for wavelength_id in crystal.get_wavelength_names():
+            for sweep in crystal.get_xwavelength(wavelength_id).get_sweeps():
+                state.append(
+                    (crystal_id, wavelength_id, sweep.get_name(), sweep.to_dict())
+                )
+    with open(filename, "wb") as fh:
+        fh.write(dumps(state))
 
-        if success:
-            xinfo = XProject.from_json(new_json)
-            xcryst = list(xinfo.get_crystals().values())[0]
-            xsweep = xcryst.get_xwavelength(wavelength_id).get_sweeps()[0]
-            xsweep_dict = xsweep.to_dict()
 
-        shutil.rmtree(tmpdir, ignore_errors=True)
-        if os.path.exists(tmpdir):
-            shutil.rmtree(tmpdir, ignore_errors=True)
-        DriverFactory.set_driver_type(default_driver_type)
-        return success, output, xsweep_dict
+def read_sweep_state(filename, crystal_id, wavelength_id, sweep_id):
+    """Return the serialized XSweep written by write_sweep_state()."""
+    with open(filename, "rb") as fh:
+        state = loads(fh.read())
+    for names in state:
+        if tuple(names[:3]) == (crystal_id, wavelength_id, sweep_id):
+            return names[3]
+    raise KeyError((crystal_id, wavelength_id, sweep_id))
 
 
 def get_sweep_output_only(all_output):
@@ -113,12 +124,116 @@ def get_sweep_output_only(all_output):
     return "".join(sweep_lines)
 
 
-def move_output_folder(sweep_tmp_dir, sweep_target_dir):
-    """Move contents of xia2 sweep processing folder from sweep_tmp_dir to
-    sweep_target_dir, while also updating any absolute path in any xia2.json
-    file.
-    """
-    if os.path.exists(sweep_target_dir):
-        shutil.rmtree(sweep_target_dir)
-    # print "Moving %s to %s" %(sweep_tmp_dir, sweep_target_dir)
-    shutil.move(sweep_tmp_dir, sweep_target_dir)
+class SweepScheduler:
+    """Run sweep jobs concurrently within a fixed budget of CPU cores.
+
+    Rather than giving every job the same number of cores, the jobs are
+    started largest first and each is given a share of the cores currently
+    free in proportion to its size (e.g. number of images) relative to the
+    jobs still waiting. Cores freed as jobs finish are therefore given to
+    the remaining jobs, so that the last few (or only) sweeps are not left
+    running on a single core while the rest of the machine is idle."""
+
+    def __init__(self, total_cores, max_jobs):
+        self._total_cores = max(1, total_cores)
+        self._max_jobs = max(1, max_jobs)
+        self._records = []
+        self._start_time = None
+        self._end_time = None
+
+    def allocate(self, weight, pending_weight, free_cores):
+        """Return the number of cores for a job of the given weight, given
+        the total weight of the jobs still to be started (including this
+        one) and the number of cores currently free."""
+        if pending_weight <= 0:
+            return free_cores
+        share = int(round(free_cores * weight / pending_weight))
+        return max(1, min(share, free_cores))
+
+    def run(self, function, jobs, weights):
+        """Call function(job, nproc) for each job, returning the results in
+        the order of the jobs."""
+        jobs = list(jobs)
+        weights = [max(w, 1) for w in weights]
+        assert len(weights) == len(jobs)
+
+        pending = sorted(range(len(jobs)), key=lambda i: weights[i], reverse=True)
+        pending_weight = sum(weights)
+        free_cores = self._total_cores
+        results = [None] * len(jobs)
+        running = {}
+        self._records = []
+        self._start_time = time.time()
+
+        error = None
+
+        with concurrent.futures.ThreadPoolExecutor(self._max_jobs) as pool:
+            while pending or running:
+                while pending and free_cores and len(running) < self._max_jobs:
+                    i = pending.pop(0)
+                    nproc = self.allocate(weights[i], pending_weight, free_cores)
+                    pending_weight -= weights[i]
+                    free_cores -= nproc
+                    record = {"job": i, "nproc": nproc, "start": time.time()}
+                    running[pool.submit(function, jobs[i], nproc)] = record
+
+                done, _ = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    record = running.pop(future)
+                    record["end"] = time.time()
+                    free_cores += record["nproc"]
+                    self._records.append(record)
+                    try:
+                        results[record["job"]] = future.result()
+                    except Exception as e:
+                        # start no more jobs, but let those running finish
+                        if error is None:
+                            error = e
+                        pending = []
+
+        self._end_time = time.time()
+        if error is not None:
+            raise error
+        return results
+
+    def get_statistics(self):
+        """Return the wall clock time, the core time used by the jobs and
+        the fraction of the available core time this represents."""
+        if not self._records:
+            return {"wall_time": 0.0, "core_time": 0.0, "utilisation": 0.0}
+        wall_time = self._end_time - self._start_time
+        core_time = sum(r["nproc"] * (r["end"] - r["start"]) for r in self._records)
+        utilisation = core_time / (wall_time * self._total_cores) if wall_time else 1.0
+        return {
+            "wall_time": wall_time,
+            "core_time": core_time,
+            "utilisation": utilisation,
+        }
+
+    def report(self, names=None):
+        """Return a summary of the jobs run and the core utilisation as a
+        list of strings."""
+        lines = []
+        for record in sorted(self._records, key=lambda r: r["start"]):
+            name = names[record["job"]] if names else "job %d" % record["job"]
+            lines.append(
+                "%s: %d core%s, %.1fs"
+                % (
+                    name,
+                    record["nproc"],
+                    "s" if record["nproc"] > 1 else "",
+                    record["end"] - record["start"],
+                )
+            )
+        statistics = self.get_statistics()
+        lines.append(
+            "Core utilisation: %.1f%% of %d cores over %.1fs"
+            % (
+                100 * statistics["utilisation"],
+                self._total_cores,
+                statistics["wall_time"],
+            )
+        )
+        return lines
@@ -4,9 +4,12 @@
 
 
 import collections
+import concurrent.futures
+import json
 import logging
 import os
 import sys
+import time
 import traceback
 
 import h5py
@@ -14,6 +17,7 @@ from libtbx import easy_mp
 from xia2.Applications.xia2setup_helpers import get_sweep
 from xia2.Experts.FindImages import image2template_directory
 from xia2.Handlers.CommandLine import CommandLine
+from xia2.Handlers.Environment import get_cache_directory
 from xia2.Handlers.Phil import PhilIndex
 from xia2.Schema import imageset_cache
 from xia2.Wrappers.XDS.XDSFiles import XDSFiles
@@ -186,9 +190,18 @@ def parse_sequence(sequence_file):
 
 
 def visit(directory, files):
+    templates, sequences = _visit(directory, files)
+    for sequence_file in sequences:
+        parse_sequence(sequence_file)
+    return templates
+
+
+def _visit(directory, files):
+    """Return the templates and the sequence files found in directory."""
     files.sort()
 
     templates = set()
+    sequences = []
 
     for f in files:
         full_path = os.path.join(directory, f)
@@ -217,9 +230,9 @@ def visit(directory, files):
                 templates.add(template)
 
         elif is_sequence_name(full_path):
-            parse_sequence(full_path)
+            sequences.append(full_path)
 
-    return templates
+    return templates, sequences
 
 
 def _list_hdf5_data_files(h5_file):
@@ -571,18 +584,140 @@ def _get_sweeps(templates):
     return known_sweeps
 
 
+# the maximum number of directories recorded in the setup cache
+_rummage_cache_size = 20000
+
+
+def _rummage_cache_filename():
+    # raises OSError if the cache directory cannot be created
+    return os.path.join(get_cache_directory(), "setup_cache.json")
+
+
+def _load_rummage_cache():
+    try:
+        with open(_rummage_cache_filename()) as fh:
+            return json.load(fh)
+    except (OSError, ValueError) as e:
+        logger.debug("Could not read setup cache: %s" % str(e))
+        return {}
+
+
+def _save_rummage_cache(cache):
+    if len(cache) > _rummage_cache_size:
+        recent = sorted(cache, key=lambda d: cache[d]["used"])
+        for directory in recent[: len(cache) - _rummage_cache_size]:
+            del cache[directory]
+
+    # write atomically, as other xia2 processes may be reading the cache
+    try:
+        filename = _rummage_cache_filename()
+        tmp_filename = "%s.%d" % (filename, os.getpid())
+        with open(tmp_filename, "w") as fh:
+            json.dump(cache, fh)
+        os.replace(tmp_filename, filename)
+    except OSError as e:
+        logger.debug("Could not write setup cache: %s" % str(e))
+
+
+def _directory_signature(directory, files):
+    """Everything which determines the templates found in a directory: the
+    directory modification time (which changes as files are added or
+    removed), the target template and the modification time and size of
+    each HDF5 file, as their format class depends on their content."""
+
+    hdf5_files = {}
+    for f in files:
+        if os.path.splitext(f)[-1] in known_hdf5_extensions:
+            try:
+                st = os.stat(os.path.join(directory, f))
+            except OSError:
+                continue
+            hdf5_files[f] = [st.st_mtime_ns, st.st_size]
+
+    return [os.stat(directory).st_mtime_ns, str(target_template), hdf5_files]
+
+
+def _scan_directory(directory, cache):
+    """List the contents of one directory, returning the subdirectories and
+    the templates and sequence files found in it. Unless the directory has
+    changed since it was last recorded in the cache, the templates and
+    sequence files are taken from the cache."""
+
+    subdirectories = []
+    files = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                subdirectories.append(entry.path)
+            else:
+                files.append(entry.name)
+
+    signature = _directory_signature(directory, files)
+    cached = cache.get(directory)
+    if cached is not None and cached["signature"] == signature:
+        templates = set(cached["templates"])
+        sequences = [os.path.join(directory, f) for f in cached["sequences"]]
+    else:
+        templates, sequences = _visit(directory, files)
+        cache[directory] = {
+            "signature": signature,
+            "templates": sorted(templates),
+            "sequences": [os.path.basename(f) for f in sequences],
+        }
+    cache[directory]["used"] = time.time()
+
+    return subdirectories, templates, sequences
+
+
 def _rummage(directories):
-    """Walk through the directories looking for sweeps."""
+    """Walk through the directories looking for sweeps, scanning several
+    directories at once."""
     templates = set()
+    sequences = []
     visited = set()
-    for path in directories:
-        for root, dirs, files in os.walk(path, followlinks=True):
-            realpath = os.path.realpath(root)
+
+    use_cache = PhilIndex.params.xia2.settings.setup_cache
+    cache = _load_rummage_cache() if use_cache else {}
+
+    with concurrent.futures.ThreadPoolExecutor() as pool:
+        pending = set()
+
+        def scan(directory):
+            realpath = os.path.realpath(directory)
             if realpath in visited:
                 # safety-check to avoid recursively symbolic links
-                continue
+                return
             visited.add(realpath)
-            templates.update(visit(root, files))
+            pending.add(pool.submit(_scan_directory, directory, cache))
+
+        for path in directories:
+            scan(os.path.abspath(path))
+
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                subdirectories, found, found_sequences = future.result()
+                templates.update(found)
+                sequences.extend(found_sequences)
+                for directory in subdirectories:
+                    scan(directory)
+
+    if use_cache:
+        _save_rummage_cache(cache)
+
+    # the directories are scanned in no particular order, so as for a walk
+    # through the directories take the last sequence file in directory order
+    if sequences:
+        sequences.sort(
+            key=lambda f: (os.path.dirname(f).split(os.sep), os.path.basename(f))
+        )
+        parse_sequence(sequences[-1])
 
     return _get_sweeps(templates)
 
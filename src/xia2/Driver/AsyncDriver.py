@@ -0,0 +1,267 @@
+"""A Driver implementation which runs the child processes on a shared asyncio
+event loop, so that several wrappers may run concurrently while sharing a
+fixed budget of CPU cores.
+
+The wrappers themselves are unchanged: each wrapper still calls start(),
+input() and close_wait(), which now block only the calling thread while the
+child process is scheduled on the event loop. Independent wrapper calls may
+then be run together with run_concurrently(), or awaited from a coroutine
+with run_async()."""
+
+import asyncio
+import os
+import queue
+import signal
+import threading
+import time
+
+from xia2.Driver.SimpleDriver import SimpleDriver
+
+
+class CPUBudget:
+    """A counting semaphore for CPU cores, from which each job acquires as
+    many cores as it has threads (clipped to the size of the budget)."""
+
+    def __init__(self, nproc):
+        self._nproc = nproc
+        self._available = nproc
+        self._condition = None
+
+    def get_nproc(self):
+        return self._nproc
+
+    def _clip(self, ncores):
+        if not isinstance(ncores, int):
+            # e.g. libtbx Auto: use every core available
+            return self._nproc
+        return max(1, min(ncores, self._nproc))
+
+    async def acquire(self, ncores):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        ncores = self._clip(ncores)
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._available >= ncores)
+            self._available -= ncores
+        return ncores
+
+    async def release(self, ncores):
+        async with self._condition:
+            self._available += ncores
+            self._condition.notify_all()
+
+
+class _JobExecutor:
+    """An asyncio event loop running in a background thread, on which the
+    child processes of every AsyncDriver instance are run."""
+
+    def __init__(self, nproc=None):
+        self._nproc = nproc or os.cpu_count() or 1
+        self._loop = None
+        self._budget = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def set_nproc(self, nproc):
+        """Set the number of CPU cores shared between concurrent jobs, for
+        all jobs submitted from now on."""
+        with self._lock:
+            self._nproc = nproc
+            self._budget = CPUBudget(nproc)
+
+    def get_nproc(self):
+        return self._nproc
+
+    def _ensure_loop(self):
+        with self._lock:
+            # the event loop thread does not survive a fork, so processes
+            # forked by multiprocessing need to start their own
+            if self._pid == os.getpid():
+                return
+            self._loop = asyncio.new_event_loop()
+            self._budget = CPUBudget(self._nproc)
+            self._pid = os.getpid()
+            threading.Thread(
+                target=self._loop.run_forever, name="xia2-async-driver", daemon=True
+            ).start()
+
+    def submit(self, coroutine_function, ncores):
+        """Schedule coroutine_function() to run on the event loop once ncores
+        CPU cores are available, returning a concurrent.futures.Future."""
+        self._ensure_loop()
+        budget = self._budget
+
+        async def run_within_budget():
+            acquired = await budget.acquire(ncores)
+            try:
+                return await coroutine_function()
+            finally:
+                await budget.release(acquired)
+
+        return asyncio.run_coroutine_threadsafe(run_within_budget(), self._loop)
+
+    def call_soon(self, callback, *args):
+        self._loop.call_soon_threadsafe(callback, *args)
+
+
+executor = _JobExecutor()
+
+
+class AsyncDriver(SimpleDriver):
+    def __init__(self):
+        super().__init__()
+
+        self._future = None
+        self._process = None
+        self._output_queue = None
+
+    def start(self):
+        if self._executable is None:
+            raise RuntimeError("no executable is set.")
+
+        # the process itself is only started by close(), once all of the
+        # standard input has been collected
+        self._future = None
+        self._process = None
+        self._popen_status = None
+        self._output_queue = queue.Queue()
+
+    def _input(self, record):
+        # records are kept in self._standard_input_records and passed to
+        # the child process by close()
+        pass
+
+    def _output(self):
+        if self._output_queue is None:
+            return ""
+        record = self._output_queue.get()
+        if record is None:
+            # the job failed to run - put the sentinel back for later calls
+            self._output_queue.put(None)
+            if not self._future.cancelled():
+                self._future.result()
+            return ""
+        return record
+
+    async def _run_process(self, command_line, environment, standard_input):
+        # the driver may be cleaned up once a cancelled job has been killed
+        output_queue = self._output_queue
+        self._runtime_log["process start"] = time.time()
+        kwargs = dict(
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            cwd=self._working_directory,
+            env=environment,
+            limit=2 ** 24,
+        )
+        try:
+            if os.name == "nt":
+                self._process = await asyncio.create_subprocess_exec(
+                    *command_line, **kwargs
+                )
+            else:
+                self._process = await asyncio.create_subprocess_shell(
+                    command_line, **kwargs
+                )
+
+            async def feed_standard_input():
+                try:
+                    self._process.stdin.write(standard_input.encode())
+                    await self._process.stdin.drain()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    self._process.stdin.close()
+
+            feeder = asyncio.ensure_future(feed_standard_input())
+
+            while True:
+                line = await self._process.stdout.readline()
+                if not line:
+                    break
+                output_queue.put(line.decode(errors="replace"))
+
+            await feeder
+            self._popen_status = await self._process.wait()
+        except BaseException:
+            output_queue.put(None)
+            raise
+        output_queue.put("")
+        return self._popen_status
+
+    def close(self):
+        if self._output_queue is None:
+            raise RuntimeError("child process has not been started")
+        if self._future is not None:
+            return
+
+        command_line = self._get_shell_command_line()
+        environment = self._get_environment()
+        standard_input = "".join(self._standard_input_records)
+
+        self._future = executor.submit(
+            lambda: self._run_process(command_line, environment, standard_input),
+            self._cpu_threads,
+        )
+
+    async def wait(self):
+        """Await the completion of the child process from a coroutine,
+        returning the exit status."""
+        self.close()
+        return await asyncio.wrap_future(self._future)
+
+    def _status(self):
+        return self._popen_status
+
+    def cleanup(self):
+        self._output_queue = None
+
+    def kill(self):
+        if self._process is not None:
+            executor.call_soon(self._process.kill)
+        elif self._future is not None and self._future.cancel():
+            # the process has not been started, e.g. the job is still
+            # waiting for the CPU budget, and now never will be: end the
+            # output and report it as killed
+            self._popen_status = -signal.SIGKILL
+            self._output_queue.put(None)
+
+
+def set_cpu_budget(nproc):
+    """Set the number of CPU cores shared between concurrently running
+    AsyncDriver jobs."""
+    executor.set_nproc(nproc)
+
+
+async def run_async(function, *args):
+    """Call a blocking function, typically the run() method of a wrapper,
+    from a coroutine without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, function, *args)
+
+
+def run_concurrently(functions, njob=None):
+    """Call each of the given functions (e.g. the run() methods of several
+    wrappers) concurrently, at most njob at a time, and return their results
+    in order. Wrappers using the AsyncDriver share the executor CPU budget,
+    so the child processes will not oversubscribe the machine."""
+
+    functions = list(functions)
+    if not njob:
+        njob = max(1, len(functions))
+
+    async def run_all():
+        semaphore = asyncio.Semaphore(njob)
+
+        async def run_one(function):
+            async with semaphore:
+                return await run_async(function)
+
+        return await asyncio.gather(*(run_one(f) for f in functions))
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(run_all())
+    finally:
+        loop.close()
@@ -1,3 +1,4 @@
+import collections
 import logging
 import os
 import time
@@ -45,9 +46,18 @@ class DefaultDriver:
         # usually small
         self._standard_input_records = []
 
-        # this will be bigger but that is ok...
+        # this will be bigger but that is ok... unless a record limit is
+        # set, in which case only the most recent records are retained
+        self._output_record_limit = None
         self._standard_output_records = []
 
+        # optional callables, called with each record of standard output
+        # as it is read - for wrappers which only need a few parsed values
+        self._output_callbacks = []
+
+        # the last few records of output, reported in the debug log
+        self._output_tail = collections.deque(maxlen=50)
+
         # optional - possibly useful if using a batch submission
         # system or wanting to describe better what the job is doing
         self._input_files = []
@@ -91,6 +101,27 @@ class DefaultDriver:
     def set_cpu_threads(self, cpu_threads):
         self._cpu_threads = cpu_threads
 
+    def set_output_record_limit(self, limit):
+        """Enable streaming output handling: keep at most limit records of
+        standard output in memory (None for no limit) and write the log file
+        without flushing after every record."""
+
+        self._output_record_limit = limit
+        self._standard_output_records = self._new_output_records(
+            self._standard_output_records
+        )
+
+    def _new_output_records(self, records=()):
+        if self._output_record_limit is None:
+            return list(records)
+        return collections.deque(records, maxlen=self._output_record_limit)
+
+    def add_output_callback(self, callback):
+        """Add a callable to be called with each record of standard output
+        as it is read from the child program."""
+
+        self._output_callbacks.append(callback)
+
     def _check_executable(self, executable):
         """Pass this on to executable_exists."""
 
@@ -186,7 +217,8 @@ class DefaultDriver:
         """Reset the output things."""
 
         self._standard_input_records = []
-        self._standard_output_records = []
+        self._standard_output_records = self._new_output_records()
+        self._output_tail.clear()
 
         self._command_line = []
 
@@ -245,7 +277,7 @@ class DefaultDriver:
         # only look for errors in the last 30 lines of the standard
         # output - if something went wrong, it went wrong in there...
 
-        self.check_for_error_text(self._standard_output_records[-30:])
+        self.check_for_error_text(list(self._standard_output_records)[-30:])
         # next check the status
 
         self.check_return_code()
@@ -334,14 +366,21 @@ class DefaultDriver:
         # copy record somehow
         self._standard_output_records.append(record)
 
+        if record:
+            self._output_tail.append(record)
+            for callback in self._output_callbacks:
+                callback(record)
+
         if self._log_file is not None:
             self._log_file.write(record)
 
             # FIXME 07/NOV/06 I have noticed that sometimes
             # information is missed from the log files - perhaps
-            # flushing here will help??
+            # flushing here will help?? Not when streaming output,
+            # the log file is closed in close_wait()
 
-            self._log_file.flush()
+            if self._output_record_limit is None:
+                self._log_file.flush()
 
         # presume if there is no output that the program has finished
         if not record:
@@ -381,9 +420,12 @@ class DefaultDriver:
         return ""
 
     def get_all_output(self):
-        """Return all of the output of the job."""
+        """Return all of the output of the job, or only the most recent
+        records if an output record limit is set."""
 
-        return self._standard_output_records
+        if self._output_record_limit is None:
+            return self._standard_output_records
+        return list(self._standard_output_records)
 
     def close(self):
         """Close the standard input channel."""
@@ -424,11 +466,10 @@ class DefaultDriver:
                     )
             self._log_file.close()
             self._log_file = None
-            with open(self._log_file_name, encoding="latin-1") as fh:
-                lines = fh.readlines()
-            n = min(50, len(lines))
-            logger.debug("Last %i lines of %s:", n, self._log_file_name)
-            for line in lines[-n:]:
+            logger.debug(
+                "Last %i lines of %s:", len(self._output_tail), self._log_file_name
+            )
+            for line in self._output_tail:
                 logger.debug(line.rstrip("\n"))
         elif hasattr(self, "_runtime_log") and self._runtime_log:
             if self._executable:
@@ -1,5 +1,6 @@
 import os
 
+from xia2.Driver.AsyncDriver import AsyncDriver
 from xia2.Driver.InteractiveDriver import InteractiveDriver
 from xia2.Driver.QSubDriver import QSubDriver
 from xia2.Driver.ScriptDriver import ScriptDriver
@@ -15,6 +16,7 @@ class _DriverFactory:
             "script",
             "interactive",
             "qsub",
+            "async",
         ]
 
         # should probably write a message or something explaining
@@ -45,6 +47,7 @@ class _DriverFactory:
             "script": ScriptDriver,
             "interactive": InteractiveDriver,
             "qsub": QSubDriver,
+            "async": AsyncDriver,
         }.get(driver_type)
         if driver_class:
             return driver_class()
@@ -14,10 +14,7 @@ class SimpleDriver(DefaultDriver):
         self._popen = None
         self._popen_status = None
 
-    def start(self):
-        if self._executable is None:
-            raise RuntimeError("no executable is set.")
-
+    def _get_shell_command_line(self):
         if os.name == "nt":
             # pass in CL as a list of tokens
             command_line = []
@@ -33,6 +30,9 @@ class SimpleDriver(DefaultDriver):
             for c in self._command_line:
                 command_line += " '%s'" % c
 
+        return command_line
+
+    def _get_environment(self):
         environment = copy.deepcopy(os.environ)
 
         for name in self._working_environment:
@@ -45,6 +45,15 @@ class SimpleDriver(DefaultDriver):
             else:
                 environment[name] = added
 
+        return environment
+
+    def start(self):
+        if self._executable is None:
+            raise RuntimeError("no executable is set.")
+
+        command_line = self._get_shell_command_line()
+        environment = self._get_environment()
+
         self._runtime_log["process start"] = time.time()
         self._popen = subprocess.Popen(
             command_line,
@@ -0,0 +1,110 @@
+import os
+import time
+
+import pytest
+
+from xia2.Driver import AsyncDriver
+
+
+@pytest.fixture
+def cpu_budget():
+    """Set the CPU budget shared by all AsyncDriver jobs for one test,
+    restoring the previous budget afterwards."""
+    nproc = AsyncDriver.executor.get_nproc()
+    yield AsyncDriver.set_cpu_budget
+    AsyncDriver.set_cpu_budget(nproc)
+
+
+def _wait_for(path, timeout=30):
+    t0 = time.time()
+    while not os.path.exists(path):
+        assert time.time() - t0 < timeout, "timed out waiting for %s" % path
+        time.sleep(0.01)
+
+
+@pytest.mark.skipif(os.name == "nt", reason="requires a POSIX shell")
+def test_asyncdriver_runs_wrappers_concurrently(tmp_path, cpu_budget):
+    cpu_budget(4)
+
+    # each job waits (for a while) until all four have started, then reports
+    # how many it saw: if they did not overlap, the first sees only itself
+    def make_driver(i):
+        d = AsyncDriver.AsyncDriver()
+        d.set_executable("sh")
+        d.set_working_directory(str(tmp_path))
+        d.add_command_line(
+            [
+                "-c",
+                "touch started_%d; n=0; "
+                "while [ $(ls started_* | wc -l) -lt 4 ] && [ $n -lt 1000 ]; "
+                "do sleep 0.01; n=$((n+1)); done; "
+                "cat; echo started $(ls started_* | wc -l); echo done %d" % (i, i),
+            ]
+        )
+        return d
+
+    drivers = [make_driver(i) for i in range(4)]
+
+    def run(d):
+        def run_wrapper():
+            d.start()
+            d.input("some input")
+            d.close_wait()
+            d.check_for_errors()
+            return d.get_all_output()
+
+        return run_wrapper
+
+    results = AsyncDriver.run_concurrently([run(d) for d in drivers])
+    for i, output in enumerate(results):
+        assert output[-2] == "done %d\n" % i
+        assert output[-3].split() == ["started", "4"]
+        assert output[0] == "some input\n"
+
+
+@pytest.mark.skipif(os.name == "nt", reason="requires a POSIX shell")
+def test_asyncdriver_reports_failure(tmp_path):
+    d = AsyncDriver.AsyncDriver()
+    d.set_executable("sh")
+    d.set_working_directory(str(tmp_path))
+    d.add_command_line(["-c", "exit 3"])
+    d.start()
+    d.close_wait()
+    assert d.status() == 3
+    with pytest.raises(RuntimeError):
+        d.check_for_errors()
+
+
+@pytest.mark.skipif(os.name == "nt", reason="requires a POSIX shell")
+def test_asyncdriver_kill_queued_job(tmp_path, cpu_budget):
+    cpu_budget(1)
+
+    # a job holding the only core until told to stop
+    running = AsyncDriver.AsyncDriver()
+    running.set_executable("sh")
+    running.set_working_directory(str(tmp_path))
+    running.add_command_line(
+        ["-c", "touch started; while [ ! -e stop ]; do sleep 0.01; done"]
+    )
+    running.start()
+    running.close()
+    _wait_for(str(tmp_path / "started"))
+
+    # waiting for the only core to become free
+    queued = AsyncDriver.AsyncDriver()
+    queued.set_executable("sh")
+    queued.set_working_directory(str(tmp_path))
+    queued.add_command_line(["-c", "echo never"])
+    queued.start()
+    queued.close()
+    queued.kill()
+
+    # returns without waiting for the running job to free the core
+    queued.close_wait()
+    assert running.status() is None
+    assert queued.status() != 0
+    assert not any("never" in line for line in queued.get_all_output())
+
+    (tmp_path / "stop").touch()
+    running.close_wait()
+    assert running.status() == 0
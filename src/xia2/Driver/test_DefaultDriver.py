@@ -6,3 +6,29 @@ def test_defaultdriver_fails_on_start():
     d = xia2.Driver.DefaultDriver.DefaultDriver()
     with pytest.raises(NotImplementedError):
         d.start()
+
+
+class _ListDriver(xia2.Driver.DefaultDriver.DefaultDriver):
+    def __init__(self, records):
+        super().__init__()
+        self._records = iter(records)
+
+    def _output(self):
+        return next(self._records, "")
+
+
+def test_defaultdriver_streaming_output(tmp_path):
+    records = ["line %d\n" % i for i in range(1000)]
+    d = _ListDriver(records)
+    d.set_output_record_limit(10)
+    d.write_log_file(str(tmp_path / "streaming.log"))
+    seen = []
+    d.add_output_callback(seen.append)
+    while d.output():
+        pass
+    assert d.finished()
+    assert seen == records
+    assert d.get_all_output() == records[-9:] + [""]
+    d._log_file.close()
+    d._log_file = None
+    assert (tmp_path / "streaming.log").read_text() == "".join(records)
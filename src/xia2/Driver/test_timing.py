@@ -1,4 +1,6 @@
+import json
 import re
+from unittest import mock
 
 import xia2.Driver.timing
 
@@ -263,3 +265,73 @@ def test_timing_visualisation():
 
     # thinking time should appear in the tree
     assert re.search("^13.* T[0-9] .*xia2 thinking time.*$", tree, re.MULTILINE)
+
+
+def test_recording_of_stages(tmpdir):
+    xia2.Driver.timing.reset()
+
+    with xia2.Driver.timing.record_stage("integrate", sweep="SWEEP1"):
+        with xia2.Driver.timing.record_stage("index", sweep="SWEEP1"):
+            sum(range(100000))
+        with xia2.Driver.timing.record_step("dials.integrate"):
+            pass
+    with xia2.Driver.timing.record_stage("scale", crystal="DEFAULT"):
+        pass
+
+    profile = xia2.Driver.timing.profile()
+    assert [s["stage"] for s in profile["stages"]] == ["integrate", "index", "scale"]
+    assert [s["parent"] for s in profile["stages"]] == [None, 0, None]
+    integrate, index, scale = profile["stages"]
+    assert index["self_wall"] == index["wall"]
+    assert integrate["self_wall"] == integrate["wall"] - index["wall"]
+    assert index["cpu_python"] > 0
+    assert set(profile["summary"]) == {"integrate", "index", "scale"}
+    assert set(profile["sweeps"]) == {"SWEEP1"}
+    assert profile["sweeps"]["SWEEP1"]["index"]["count"] == 1
+    assert [c["command"] for c in profile["commands"]] == ["dials.integrate"]
+
+    trace = xia2.Driver.timing.chrome_trace(profile)
+    names = [e["name"] for e in trace["traceEvents"] if e["ph"] == "X"]
+    assert names == [
+        "integrate SWEEP1",
+        "index SWEEP1",
+        "scale DEFAULT",
+        "dials.integrate",
+    ]
+
+    # include the stages recorded by another process, e.g. for a sweep
+    # processed in parallel
+    other = tmpdir.join("xia2-profile-SWEEP2.json")
+    other.write(json.dumps(dict(profile, stages=profile["stages"][:2], commands=[])))
+    xia2.Driver.timing.write_profile(
+        tmpdir.join("xia2-profile.json").strpath,
+        trace_filename=tmpdir.join("xia2-trace.json").strpath,
+        include=[other.strpath],
+    )
+    written = json.loads(tmpdir.join("xia2-profile.json").read())
+    assert [s["parent"] for s in written["stages"]] == [None, 0, None, None, 3]
+    assert written["summary"]["index"]["count"] == 2
+    assert json.loads(tmpdir.join("xia2-trace.json").read())["traceEvents"]
+
+    xia2.Driver.timing.reset()
+    assert xia2.Driver.timing.profile()["stages"] == []
+
+
+def test_resource_usage_without_resource_module(monkeypatch):
+    # e.g. on Windows
+    monkeypatch.setattr(xia2.Driver.timing, "resource", None)
+    monkeypatch.setattr(
+        xia2.Driver.timing, "open", mock.Mock(side_effect=OSError), raising=False
+    )
+    usage = xia2.Driver.timing.resource_usage()
+    assert usage["cpu_children"] == 0
+    assert usage["maxrss_children"] == 0
+    assert usage["bytes_read"] == usage["bytes_written"] == 0
+
+    xia2.Driver.timing.reset()
+    with xia2.Driver.timing.record_stage("index", sweep="SWEEP1"):
+        pass
+    (stage,) = xia2.Driver.timing.profile()["stages"]
+    assert stage["cpu_children"] == 0
+    assert stage["peak_rss_children"] is None
+    xia2.Driver.timing.reset()
@@ -1,7 +1,22 @@
 import contextlib
+import json
+import os
+import sys
+import threading
 import time
 
+try:
+    import resource
+except ImportError:
+    # not available on all operating systems
+    resource = None
+
 _timing_db = []
+_stage_db = []
+_stage_stack = threading.local()
+
+# ru_maxrss is in kilobytes on Linux, but bytes on macOS
+_maxrss_bytes = 1 if sys.platform == "darwin" else 1024
 
 
 def record(timing_information):
@@ -37,6 +52,105 @@ def record_step(name):
         record(timing)
 
 
+def _io_counters():
+    """
+    The bytes read and written by this process and its finished child
+    processes: from /proc/self/io where available, otherwise estimated from
+    the block input and output operations, or zero if neither is available.
+    """
+    try:
+        with open("/proc/self/io") as fh:
+            counters = dict(line.split(":") for line in fh if ":" in line)
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):
+        if resource is None:
+            return 0, 0
+        usage = [
+            resource.getrusage(who)
+            for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)
+        ]
+        return (
+            512 * sum(u.ru_inblock for u in usage),
+            512 * sum(u.ru_oublock for u in usage),
+        )
+
+
+def resource_usage():
+    """
+    A snapshot of the resources used so far by the current thread, and by
+    the child processes of this process which have finished.
+
+    :return: A dictionary of the wall clock time, the Python CPU time of the
+             current thread, the CPU time and peak resident set size (in
+             bytes) of the child processes and the bytes read and written.
+             Those of the child processes are zero where the resource
+             module is not available, e.g. on Windows
+    """
+    if resource is not None:
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu_children = children.ru_utime + children.ru_stime
+        maxrss_children = children.ru_maxrss * _maxrss_bytes
+    else:
+        cpu_children = 0.0
+        maxrss_children = 0
+    bytes_read, bytes_written = _io_counters()
+    return {
+        "time": time.time(),
+        "cpu_python": time.thread_time(),
+        "cpu_children": cpu_children,
+        "maxrss_children": maxrss_children,
+        "bytes_read": bytes_read,
+        "bytes_written": bytes_written,
+    }
+
+
+@contextlib.contextmanager
+def record_stage(stage, sweep=None, crystal=None):
+    """
+    Record the resources used by a processing stage (e.g. index, refine,
+    integrate, scale or report) for a sweep or crystal. Stages may be nested,
+    e.g. integration will trigger indexing when it is first needed.
+
+    Usage:
+
+    with record_stage("integrate", sweep="SWEEP1"):
+        do_stuff()
+
+    The CPU time and bytes read and written by child processes are those of
+    the child processes which finished during the stage, so will include
+    those of other threads running at the same time.
+    """
+    stack = getattr(_stage_stack, "stack", None)
+    if stack is None:
+        stack = _stage_stack.stack = []
+    entry = {
+        "stage": stage,
+        "sweep": sweep,
+        "crystal": crystal,
+        "pid": os.getpid(),
+        "thread": threading.get_ident(),
+        "parent": stack[-1] if stack else None,
+    }
+    start = resource_usage()
+    _stage_db.append(entry)
+    stack.append(len(_stage_db) - 1)
+    try:
+        yield
+    finally:
+        stack.pop()
+        end = resource_usage()
+        entry["time_start"] = start["time"]
+        entry["time_end"] = end["time"]
+        for k in ("cpu_python", "cpu_children", "bytes_read", "bytes_written"):
+            entry[k] = end[k] - start[k]
+        # the peak is only known if a child process which finished during
+        # the stage used more memory than any before it
+        if end["maxrss_children"] > start["maxrss_children"]:
+            entry["peak_rss_children"] = end["maxrss_children"]
+        else:
+            entry["peak_rss_children"] = None
+
+
 def report():
     """
     Visualise all recorded program executions in a flow diagram
@@ -50,8 +164,181 @@ def reset():
     """
     Remove all records from the global database
     """
-    global _timing_db
+    global _timing_db, _stage_db
     _timing_db = []
+    _stage_db = []
+
+
+_stage_totals = ("wall", "cpu_python", "cpu_children", "bytes_read", "bytes_written")
+
+
+def profile(stage_db=None, timing_db=None):
+    """
+    Summarise the recorded stages. Each stage is charged only with what was
+    not used by the stages nested within it, and these are totalled for
+    each stage and for each stage of each sweep.
+
+    :return: A dictionary of the stages, the program executions and the
+             totals, suitable for writing to xia2-profile.json
+    """
+    if stage_db is None:
+        stage_db = _stage_db
+    if timing_db is None:
+        timing_db = _timing_db
+
+    # only the stages which have finished, for which parents are renumbered
+    stages = []
+    index = {}
+    for n, s in enumerate(stage_db):
+        if "time_end" in s:
+            index[n] = len(stages)
+            stages.append(dict(s))
+    for s in stages:
+        s["parent"] = index.get(s["parent"])
+
+    for s in stages:
+        s["wall"] = s["time_end"] - s["time_start"]
+        for k in _stage_totals:
+            s["self_" + k] = s[k]
+    for s in stages:
+        if s["parent"] is not None:
+            parent = stages[s["parent"]]
+            for k in _stage_totals:
+                parent["self_" + k] -= s[k]
+
+    def add(totals, s):
+        t = totals.setdefault(s["stage"], dict.fromkeys(_stage_totals, 0))
+        t.setdefault("count", 0)
+        t.setdefault("peak_rss_children", None)
+        t["count"] += 1
+        for k in _stage_totals:
+            t[k] += s["self_" + k]
+        if s["peak_rss_children"] is not None:
+            t["peak_rss_children"] = max(
+                t["peak_rss_children"] or 0, s["peak_rss_children"]
+            )
+
+    summary = {}
+    sweeps = {}
+    for s in stages:
+        add(summary, s)
+        if s["sweep"]:
+            add(sweeps.setdefault(s["sweep"], {}), s)
+
+    return {
+        "stages": stages,
+        "commands": [
+            {
+                "command": t["command"],
+                "time_start": t["time_start"],
+                "time_end": t["time_end"],
+                "pid": t.get("pid", os.getpid()),
+            }
+            for t in timing_db
+        ],
+        "summary": summary,
+        "sweeps": sweeps,
+    }
+
+
+def chrome_trace(profile_data):
+    """
+    Convert a profile to the Chrome trace event format, for viewing in
+    chrome://tracing or https://ui.perfetto.dev: the stages of each thread,
+    and the program executions (arranged so as not to overlap), of each
+    process.
+
+    :return: A dictionary to be written as JSON
+    """
+    events = []
+    threads = {}
+
+    def event(name, category, start, end, pid, tid, args):
+        events.append(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": int(start * 1e6),
+                "dur": int((end - start) * 1e6),
+                "pid": pid,
+                "tid": tid,
+                "args": args,
+            }
+        )
+
+    for s in profile_data["stages"]:
+        tid = threads.setdefault((s["pid"], s["thread"]), len(threads) + 1)
+        name = s["stage"]
+        if s["sweep"] or s["crystal"]:
+            name += " %s" % (s["sweep"] or s["crystal"])
+        args = {k: s[k] for k in _stage_totals + ("peak_rss_children",)}
+        event(name, "stage", s["time_start"], s["time_end"], s["pid"], tid, args)
+
+    # arrange the (possibly concurrent) program executions of each process
+    # in lanes
+    lanes = {}
+    for t in sorted(profile_data["commands"], key=lambda t: t["time_start"]):
+        pid_lanes = lanes.setdefault(t["pid"], [])
+        for lane, lane_end in enumerate(pid_lanes):
+            if lane_end <= t["time_start"]:
+                break
+        else:
+            lane = len(pid_lanes)
+            pid_lanes.append(None)
+        pid_lanes[lane] = t["time_end"]
+        event(
+            t["command"].split(" ")[0],
+            "command",
+            t["time_start"],
+            t["time_end"],
+            t["pid"],
+            "command %d" % (lane + 1),
+            {"command": t["command"]},
+        )
+    for (stage_pid, _), tid in threads.items():
+        events.append(
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": stage_pid,
+                "tid": tid,
+                "args": {"name": "stages %d" % tid},
+            }
+        )
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write_profile(filename="xia2-profile.json", trace_filename=None, include=()):
+    """
+    Write the profile of this process to filename and, if trace_filename is
+    given, a Chrome trace to trace_filename. The stages recorded by other
+    xia2 processes, e.g. for sweeps processed in parallel, are included
+    from the profiles written by them listed in include.
+    """
+    stage_db = list(_stage_db)
+    timing_db = list(_timing_db)
+    for other in include:
+        try:
+            with open(other) as fh:
+                other_profile = json.load(fh)
+            other_stages = other_profile["stages"]
+            other_commands = other_profile["commands"]
+        except (OSError, ValueError, KeyError):
+            continue
+        offset = len(stage_db)
+        for s in other_stages:
+            if s["parent"] is not None:
+                s["parent"] += offset
+            stage_db.append(s)
+        timing_db.extend(other_commands)
+
+    profile_data = profile(stage_db=stage_db, timing_db=timing_db)
+    with open(filename, "w") as fh:
+        json.dump(profile_data, fh, indent=2)
+    if trace_filename:
+        with open(trace_filename, "w") as fh:
+            json.dump(chrome_trace(profile_data), fh)
 
 
 def visualise_db(timing_db):
@@ -0,0 +1,119 @@
+"""Incremental checkpoints of a xia2 project, for continue_from_previous_job.
+
+Rather than the whole project, as in xia2.json, each checkpoint writes only
+what has changed: a small file for each sweep as its processing completes,
+one for the scaler of each crystal once it has scaled, and the project
+itself without either of these, which refers to the files for the sweeps
+and scalers. When the project is restored the files for all of the sweeps
+are read, but those for the scalers may be skipped altogether. The files are
+encoded with xia2.Schema.Serialization, as msgpack where available."""
+
+import hashlib
+import logging
+import os
+import shutil
+
+from xia2.Schema.Serialization import dumps, loads
+from xia2.Schema.XProject import XProject
+
+logger = logging.getLogger("xia2.Handlers.Checkpoint")
+
+
+class CheckpointStore:
+    def __init__(self, directory):
+        self._directory = os.path.abspath(directory)
+
+        # the files written by (or read from) this process, with a digest of
+        # their contents
+        self._written = {}
+
+    def exists(self):
+        return os.path.exists(os.path.join(self._directory, "project.state"))
+
+    def clear(self):
+        """Remove the checkpoints, e.g. from a previous job."""
+        shutil.rmtree(self._directory, ignore_errors=True)
+        self._written = {}
+
+    @staticmethod
+    def _sweep_filename(crystal_id, wavelength_id, sweep_id):
+        return os.path.join("sweeps", crystal_id, wavelength_id, "%s.state" % sweep_id)
+
+    @staticmethod
+    def _scaler_filename(crystal_id):
+        return os.path.join("scalers", "%s.state" % crystal_id)
+
+    def _write(self, filename, obj):
+        data = dumps(obj)
+        digest = hashlib.sha1(data).digest()
+        if self._written.get(filename) == digest:
+            return
+        path = os.path.join(self._directory, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write atomically, so that a crash leaves the previous checkpoint
+        tmp_path = "%s.%d" % (path, os.getpid())
+        with open(tmp_path, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp_path, path)
+        self._written[filename] = digest
+        logger.debug("Written checkpoint %s", path)
+
+    def _read(self, filename):
+        with open(os.path.join(self._directory, filename), "rb") as fh:
+            data = fh.read()
+        self._written[filename] = hashlib.sha1(data).digest()
+        return loads(data)
+
+    def write_sweep(self, crystal_id, wavelength_id, xsweep):
+        """Checkpoint a sweep, e.g. as its integration completes."""
+        self._write(
+            self._sweep_filename(crystal_id, wavelength_id, xsweep.get_name()),
+            xsweep.to_dict(),
+        )
+
+    def write_scaler(self, crystal_id, xcrystal):
+        """Checkpoint the scaler of a crystal, e.g. as its scaling completes."""
+        if xcrystal._scaler is not None:
+            self._write(self._scaler_filename(crystal_id), xcrystal._scaler.to_dict())
+
+    def write_project(self, xproject):
+        """Checkpoint the project along with all of its sweeps and scalers,
+        which may have changed since they were checkpointed by write_sweep()
+        and write_scaler(), e.g. sweeps reindexed by the scaler. Only those
+        files whose contents have changed are rewritten."""
+        obj = xproject.to_dict(include_stages=False)
+        for crystal_id, xcrystal in xproject.get_crystals().items():
+            crystal = obj["_crystals"][crystal_id]
+            for wavelength_id in xcrystal.get_wavelength_names():
+                xwavelength = xcrystal.get_xwavelength(wavelength_id)
+                sweeps = crystal["_wavelengths"][wavelength_id]["_sweeps"]
+                for xsweep in xwavelength.get_sweeps():
+                    filename = self._sweep_filename(
+                        crystal_id, wavelength_id, xsweep.get_name()
+                    )
+                    self.write_sweep(crystal_id, wavelength_id, xsweep)
+                    sweeps.append({"__checkpoint__": filename})
+            if xcrystal._scaler is not None:
+                self.write_scaler(crystal_id, xcrystal)
+                crystal["_scaler"] = {
+                    "__checkpoint__": self._scaler_filename(crystal_id)
+                }
+        self._write("project.state", obj)
+
+    def load_project(self, include_scalers=True):
+        """Restore the project from the checkpoints, reading the file for
+        each sweep and, if include_scalers, each scaler."""
+        obj = self._read("project.state")
+        for crystal in obj["_crystals"].values():
+            for wavelength in crystal["_wavelengths"].values():
+                wavelength["_sweeps"] = [
+                    self._read(sweep["__checkpoint__"])
+                    for sweep in wavelength["_sweeps"]
+                ]
+            scaler = crystal.get("_scaler")
+            if scaler is not None:
+                if include_scalers:
+                    crystal["_scaler"] = self._read(scaler["__checkpoint__"])
+                else:
+                    crystal["_scaler"] = None
+        return XProject.from_dict(obj, base_path=os.path.dirname(self._directory))
@@ -509,7 +509,10 @@ class _CommandLine:
         with open(xinfo) as fh:
             logger.debug(fh.read().strip())
         logger.debug(60 * "-")
-        self._xinfo = XProject(xinfo)
+        params = PhilIndex.get_python_object()
+        self._xinfo = XProject(
+            xinfo, base_path=params.xia2.settings.developmental.project_directory
+        )
 
     def get_xinfo(self):
         """Return the XProject."""
@@ -113,5 +113,21 @@ def get_number_cpus():
     return number_of_processors(return_value_if_unknown=-1)
 
 
+def get_cache_directory():
+    """Return the directory in which xia2 keeps caches which persist between
+    runs: $XIA2_CACHE_DIR if set, else xia2 within the user cache directory.
+    Raises OSError if the directory cannot be created, e.g. as the home
+    directory is not writable, in which case the caches should be skipped."""
+
+    cache_directory = os.environ.get("XIA2_CACHE_DIR")
+    if not cache_directory:
+        cache_directory = os.path.join(
+            os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+            "xia2",
+        )
+    os.makedirs(cache_directory, exist_ok=True)
+    return cache_directory
+
+
 set_up_ccp4_tmpdir()
 ulimit_n()
@@ -757,6 +757,18 @@ xia2.settings
     scales = *rotation batch
       .type = choice
       .short_caption = "Smoothed or batch scaling"
+    pipeline_preparation = False
+      .type = bool
+      .short_caption = "Prepare sweeps for scaling during integration"
+      .help = "Start the symmetry analysis of each sweep for scaling as soon " \
+              "as its integration is complete, while the remaining sweeps are " \
+              "integrated."
+    prepare_njob = Auto
+      .type = int(value_min=1)
+      .short_caption = "Number of sweeps to prepare for scaling at once"
+      .help = "The number of sweeps for which the independent per-sweep " \
+              "preparation for scaling (symmetry analysis, reindexing and " \
+              "export) is run at the same time. By default njob * nproc."
     two_theta_refine = True
       .type = bool
       .short_caption = "Run dials.two_theta_refine"
@@ -810,6 +822,26 @@ xia2.settings
     .type = bool
     .short_caption = "Read all image headers"
     .expert_level = 1
+  setup_cache = True
+    .type = bool
+    .help = "Keep a record of the images found in each directory searched, " \
+            "so that unchanged directories need not be searched again on " \
+            "subsequent runs."
+    .short_caption = "Cache directory search results"
+    .expert_level = 2
+  imageset_cache = True
+    .type = bool
+    .help = "Keep the imagesets read from the image headers in a cache shared " \
+            "between xia2 processes and runs, used while the images are " \
+            "unchanged."
+    .short_caption = "Cache imagesets between runs"
+    .expert_level = 2
+  imageset_cache_max_size = 1024
+    .type = int(value_min=0)
+    .help = "The maximum size in MB of the imageset cache, beyond which the " \
+            "least recently used imagesets are discarded."
+    .short_caption = "Imageset cache size (MB)"
+    .expert_level = 2
   detector_distance = None
     .type = float(value_min=0.0)
     .help = "Distance between sample and detector (mm)"
@@ -858,8 +890,9 @@ xia2.settings
   {
     continue_from_previous_job = False
       .type = bool
-      .help = "If xia2.json file is present from a previous xia2 job then "
-              "continue scaling from the previous integration results."
+      .help = "If the checkpoints (xia2-checkpoint) or xia2.json file of a "
+              "previous xia2 job are present then continue scaling from the "
+              "previous integration results."
     use_dials_spotfinder = False
       .type = bool
       .help = "This feature requires the dials project to be installed, and " \
@@ -870,6 +903,10 @@ xia2.settings
     detector_id = None
       .type = str
       .help = "Override detector serial number information"
+    project_directory = None
+      .type = path
+      .help = "Create the crystal/wavelength/sweep processing directories "
+              "within this directory rather than the current working directory"
   }
   multi_sweep_indexing = Auto
     .type = bool
@@ -965,9 +1002,11 @@ xia2.settings
       .type = int(value_min=1)
       .help = "The number of sweeps to process simultaneously."
       .expert_level = 1
-    type = *simple qsub
+    type = *simple qsub async
       .type = choice
-      .help = "How to run the parallel processing jobs, e.g. over a cluster"
+      .help = "How to run the parallel processing jobs, e.g. over a cluster," \
+              " or async to run every program locally within a shared budget" \
+              " of njob x nproc cores"
       .expert_level = 1
     qsub_command = ''
       .type = str
@@ -0,0 +1,139 @@
+"""A persistent, on-disk registry of the version banners of the external
+programs run by xia2, shared between xia2 processes and between runs, so
+that each program need only be run once to find out its version.
+
+Each entry is keyed on the full path of the executable and the arguments
+used to print the banner, and is only used while the modification time and
+size of the executable are unchanged. If the registry cannot be created,
+e.g. as the home directory is not writable, the versions are only kept in
+memory. The programs consulted by this process are listed by report(), for
+the provenance of the results."""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+
+from xia2.Handlers.Environment import get_cache_directory
+
+logger = logging.getLogger("xia2.Handlers.ProgramVersions")
+
+
+def executable_signature(path):
+    """Return the modification time and size of the executable."""
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+class ProgramVersions:
+    def __init__(self, directory=None):
+        """Store entries in directory, by default programs within the xia2
+        cache directory."""
+        try:
+            if directory is None:
+                directory = os.path.join(get_cache_directory(), "programs")
+            os.makedirs(directory, exist_ok=True)
+        except OSError as e:
+            logger.debug("Program version registry not available: %s" % str(e))
+            directory = None
+        self._directory = directory
+
+        # the entries used by this process
+        self._entries = {}
+
+    def _filename(self, key):
+        digest = hashlib.sha1(json.dumps(key).encode()).hexdigest()
+        return os.path.join(self._directory, "%s.json" % digest)
+
+    def _read(self, key):
+        if self._directory is None:
+            return None
+        try:
+            with open(self._filename(key)) as fh:
+                entry = json.load(fh)
+            if [entry["executable"], entry["arguments"]] != key:
+                return None
+        except (OSError, ValueError, KeyError):
+            return None
+        return entry
+
+    def _write(self, key, entry):
+        if self._directory is None:
+            return
+        # write atomically, as other xia2 processes may be reading the registry
+        filename = self._filename(key)
+        tmp_filename = "%s.%d" % (filename, os.getpid())
+        try:
+            with open(tmp_filename, "w") as fh:
+                json.dump(entry, fh)
+            os.replace(tmp_filename, filename)
+        except OSError as e:
+            logger.debug("Could not write program version registry: %s" % str(e))
+
+    def _entry(self, executable, arguments):
+        path = os.path.realpath(shutil.which(executable) or executable)
+        signature = executable_signature(path)
+        key = [path, list(arguments)]
+        cache_key = json.dumps(key)
+
+        entry = self._entries.get(cache_key)
+        if entry is None or entry["signature"] != signature:
+            entry = self._read(key)
+        if entry is None or entry["signature"] != signature:
+            logger.debug("Reading version of %s" % path)
+            result = subprocess.run(
+                [path] + list(arguments),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+            )
+            entry = {
+                "executable": path,
+                "arguments": list(arguments),
+                "signature": signature,
+                "output": result.stdout.decode("latin-1"),
+                "version": None,
+            }
+            self._write(key, entry)
+        self._entries[cache_key] = entry
+        return entry
+
+    def get_output(self, executable, arguments=()):
+        """Return the output of running executable with the given arguments
+        and no input, e.g. its version banner."""
+        return self._entry(executable, arguments)["output"]
+
+    def get_version(self, executable, parse, arguments=()):
+        """Return the version of executable, as found by parse() from the
+        output of running executable with the given arguments."""
+        entry = self._entry(executable, arguments)
+        version = parse(entry["output"])
+        if entry["version"] != version:
+            entry["version"] = version
+            self._write([entry["executable"], entry["arguments"]], entry)
+        return version
+
+    def entries(self):
+        """Return the entries for the programs consulted by this process."""
+        return sorted(self._entries.values(), key=lambda e: e["executable"])
+
+    def report(self):
+        """Return the path and version of each program consulted by this
+        process, as a list of strings."""
+        return [
+            "%s: %s" % (entry["executable"], entry["version"])
+            for entry in self.entries()
+        ]
+
+
+_program_versions = None
+
+
+def get_program_versions():
+    """Return the registry of program versions for this process."""
+    global _program_versions
+    if _program_versions is None:
+        _program_versions = ProgramVersions()
+    return _program_versions
@@ -0,0 +1,526 @@
+"""Benchmarks of the xia2 hot paths which run without external programs,
+on synthetic data of configurable size, for xia2.benchmark.
+
+Each case sets up its synthetic data for a given size (a scale factor on a
+nominal problem size) in a working directory, and returns the function to
+be timed and a description of the data. Cases which need modules that are
+not available are recorded as skipped, and those which fail with the error
+so that the other cases still run. The results are a JSON-serialisable
+dictionary laid out as for pytest-benchmark, so that the results for two
+versions of xia2 may be compared with compare_results()."""
+
+import collections
+import copy
+import datetime
+import logging
+import math
+import os
+import platform
+import statistics
+import time
+
+import numpy as np
+
+import iotbx.phil
+
+logger = logging.getLogger("xia2.Modules.Benchmark")
+
+phil_scope = iotbx.phil.parse(
+    """\
+size = 1.0
+  .type = float(value_min=0, allow_none=False)
+  .help = "Scale factor on the nominal size of the synthetic data for each case"
+case = None
+  .type = str
+  .multiple = True
+  .help = "The cases to run, by default all of them"
+rounds = 5
+  .type = int(value_min=1)
+  .help = "The number of times each case is timed, after one warm-up run"
+seed = 0
+  .type = int
+  .help = "Seed for the generation of the synthetic data"
+""",
+    process_includes=True,
+)
+
+_cases = collections.OrderedDict()
+
+
+def benchmark_case(name):
+    """Register a function as a benchmark case. The function is called with
+    the size, working directory and a numpy random generator, and returns
+    the function to time and a dictionary describing the synthetic data."""
+
+    def register(setup):
+        _cases[name] = setup
+        return setup
+
+    return register
+
+
+def case_names():
+    return list(_cases)
+
+
+def _scaled(n, size):
+    return max(1, int(round(n * size)))
+
+
+def _synthetic_frame(rng, ny, nx):
+    """A Pilatus-like frame: a low background with some strong pixels and
+    the inter-module gaps flagged as -1."""
+    frame = rng.poisson(3, size=(ny, nx)).astype(np.int32)
+    frame[::5, ::13] = rng.integers(1000, 2 ** 20, size=frame[::5, ::13].shape)
+    frame[195::212, :] = -1
+    frame[:, 487::494] = -1
+    return frame
+
+
+def _synthetic_unmerged_intensities(rng, n_datasets, n_images, d_min):
+    """Unmerged intensities and batches for n_datasets data sets of a
+    primitive monoclinic crystal, each a random multiplicity (around 3) of
+    observations of the reflections to d_min spread over n_images images."""
+    from cctbx import crystal, miller
+    from cctbx.array_family import flex
+
+    crystal_symmetry = crystal.symmetry(
+        unit_cell=(40.0, 50.0, 60.0, 90.0, 105.0, 90.0), space_group_symbol="P 1 21 1"
+    )
+    unique = miller.build_set(crystal_symmetry, anomalous_flag=True, d_min=d_min)
+    d_spacings = unique.d_spacings().data().as_numpy_array()
+    wilson = 1000 * np.exp(-0.5 * 20.0 / d_spacings ** 2)
+
+    intensities = []
+    batches = []
+    for k in range(n_datasets):
+        selection = np.repeat(
+            np.arange(unique.size()), rng.poisson(3, size=unique.size())
+        )
+        true = rng.exponential(wilson[selection])
+        sigmas = np.sqrt(true + 10.0)
+        data = true + rng.normal(scale=sigmas)
+        miller_set = miller.set(
+            crystal_symmetry,
+            unique.indices().select(flex.size_t(selection.astype(np.uint64))),
+            anomalous_flag=False,
+        )
+        intensities.append(
+            miller.array(miller_set, data=flex.double(data), sigmas=flex.double(sigmas))
+            .set_observation_type_xray_intensity()
+            .set_info(miller.array_info(source="synthetic%i" % (k + 1)))
+        )
+        batch_offset = k * (n_images + 100)
+        images = rng.integers(1, n_images + 1, size=selection.size) + batch_offset
+        batches.append(
+            miller.array(miller_set, data=flex.int(images.astype(np.int32)))
+        )
+    return intensities, batches
+
+
+@benchmark_case("byte_offset")
+def _byte_offset(size, working_directory, rng):
+    from xia2.Modules.UnpackByteOffset import pack_values, unpack_values
+
+    frame = _synthetic_frame(rng, _scaled(1679, size), 1475)
+
+    def run():
+        unpack_values(pack_values(frame), frame.size)
+
+    return run, {"pixels": frame.size}
+
+
+@benchmark_case("byte_offset_python")
+def _byte_offset_python(size, working_directory, rng):
+    from xia2.Modules.UnpackByteOffset import (
+        _pack_values_python,
+        _unpack_values_python,
+    )
+
+    values = _synthetic_frame(rng, _scaled(195, size), 487).ravel().tolist()
+
+    def run():
+        _unpack_values_python(_pack_values_python(values), len(values))
+
+    return run, {"pixels": len(values)}
+
+
+@benchmark_case("backstop_mask")
+def _backstop_mask(size, working_directory, rng):
+    from xia2.Modules.UnpackByteOffset import pack_values
+    from xia2.Toolkit.BackstopMask import BackstopMask, mask_cbf
+
+    nx, ny = 1475, _scaled(1679, size)
+    site_file = os.path.join(working_directory, "backstop.site")
+    with open(site_file, "w") as fh:
+        for distance in (150.0, 250.0, 350.0):
+            # half the width of the backstop, as a fraction of the frame so
+            # that it stays within the frame for any size
+            shift = 0.03 * ny * distance / 250.0
+            fh.write(
+                "%.1f 0 %.3f %.3f %.3f %.3f %.3f 0 %.3f\n"
+                % (
+                    distance,
+                    0.55 * ny - shift,
+                    0.5 * nx,
+                    0.55 * ny - shift,
+                    0.5 * nx,
+                    0.55 * ny + shift,
+                    0.55 * ny + shift,
+                )
+            )
+
+    frame = _synthetic_frame(rng, ny, nx)
+    cbf_header = (
+        "###CBF: VERSION 1.5\r\n"
+        "X-Binary-Size-Fastest-Dimension: %d\r\n"
+        "X-Binary-Size-Second-Dimension: %d\r\n"
+        "X-Binary-Number-of-Elements: %d\r\n\r\n" % (nx, ny, nx * ny)
+    )
+    cbf_in = os.path.join(working_directory, "backstop_in.cbf")
+    cbf_out = os.path.join(working_directory, "backstop_out.cbf")
+    with open(cbf_in, "wb") as fh:
+        fh.write(cbf_header.encode() + bytes.fromhex("0c1a04d5") + pack_values(frame))
+
+    header = {"distance": 200.0, "size": (nx, ny)}
+
+    def run():
+        # the mask indices are cached between calls, so compute them directly
+        # to time that too
+        mask = BackstopMask(site_file)
+        indices = mask.rectangle(header).mask_indices(nx, ny)
+        mask_cbf(cbf_in, cbf_out, nx, ny, indices)
+
+    return run, {"pixels": frame.size}
+
+
+@benchmark_case("delta_cc_half")
+def _delta_cc_half(size, working_directory, rng):
+    from xia2.Modules.DeltaCcHalf import DeltaCcHalf
+
+    n_datasets = _scaled(20, size)
+    intensities, batches = _synthetic_unmerged_intensities(
+        rng, n_datasets, n_images=100, d_min=2.5
+    )
+
+    def run():
+        DeltaCcHalf(intensities, batches, n_bins=20, group_size=10)
+
+    return run, {
+        "datasets": n_datasets,
+        "observations": sum(ma.size() for ma in intensities),
+    }
+
+
+def _combined_unmerged_intensities(rng, size):
+    intensities, batches = _synthetic_unmerged_intensities(
+        rng, _scaled(5, size), n_images=360, d_min=2.0
+    )
+    combined_intensities = intensities[0]
+    combined_batches = batches[0]
+    for ma, ba in zip(intensities[1:], batches[1:]):
+        combined_intensities = combined_intensities.concatenate(ma)
+        combined_batches = combined_batches.concatenate(ba)
+    combined_intensities.set_observation_type_xray_intensity()
+    return combined_intensities, combined_batches
+
+
+@benchmark_case("report_statistics")
+def _report_statistics(size, working_directory, rng):
+    from xia2.Modules.Analysis import phil_scope as report_phil_scope
+    from xia2.Modules.Report import Report
+
+    intensities, batches = _combined_unmerged_intensities(rng, size)
+    params = report_phil_scope.extract()
+
+    def run():
+        report = Report(
+            intensities, copy.deepcopy(params), batches=batches, report_dir=None
+        )
+        report.merged_intensities
+        report.merging_stats
+        report.merging_stats_anom
+
+    return run, {"observations": intensities.size()}
+
+
+@benchmark_case("multi_crystal_clustering")
+def _multi_crystal_clustering(size, working_directory, rng):
+    from xia2.Modules.MultiCrystal import multi_crystal_analysis
+
+    n_datasets = _scaled(10, size)
+    intensities, _ = _synthetic_unmerged_intensities(
+        rng, n_datasets, n_images=100, d_min=3.0
+    )
+    prefix = os.path.join(working_directory, "")
+
+    def run():
+        multi_crystal_analysis(intensities, prefix=prefix)
+
+    return run, {
+        "datasets": n_datasets,
+        "observations": sum(ma.size() for ma in intensities),
+    }
+
+
+def _synthetic_integrate_lp(rng, n_images, block_size=50):
+    """The text of an INTEGRATE.LP file for n_images images, processed in
+    blocks of block_size images."""
+    lines = [" OSCILLATION_RANGE=  0.100000 DEGREES", ""]
+    for start in range(1, n_images + 1, block_size):
+        end = min(n_images, start + block_size - 1)
+        lines.extend(
+            [
+                " " + "*" * 78,
+                "                     PROCESSING OF IMAGES %8d ... %7d" % (start, end),
+                " " + "*" * 78,
+                "",
+                " IMAGE IER  SCALE     NBKG NOVL NEWALD NSTRONG  NREJ"
+                "   SIGMAB   SIGMAR",
+            ]
+        )
+        for image in range(start, end + 1):
+            newald = int(rng.integers(2000, 3000))
+            lines.append(
+                "%6d%4d%7.3f%9d%5d%7d%8d%6d%9.5f%9.5f"
+                % (
+                    image,
+                    0,
+                    rng.uniform(0.9, 1.1),
+                    int(rng.integers(16000000, 17000000)),
+                    0,
+                    newald,
+                    int(rng.integers(50, 150)),
+                    int(rng.integers(0, 5)),
+                    rng.uniform(0.01, 0.03),
+                    rng.uniform(0.04, 0.06),
+                )
+            )
+        lines.extend(
+            [
+                "",
+                "  1433 OUT OF   1433 REFLECTIONS ACCEPTED FOR REFINEMENT",
+                " STANDARD DEVIATION OF SPOT    POSITION (PIXELS)     0.50",
+                " STANDARD DEVIATION OF SPINDLE POSITION (DEGREES)    0.05",
+                " UNIT CELL PARAMETERS     57.687    57.687   149.879"
+                "  90.000  90.000  90.000",
+                " CRYSTAL MOSAICITY (DEGREES)     0.042",
+                " DETECTOR COORDINATES (PIXELS) OF DIRECT BEAM    2217.03   2306.10",
+                " CRYSTAL TO DETECTOR DISTANCE (mm)       213.68",
+                "",
+            ]
+        )
+    return "\n".join(lines) + "\n"
+
+
+@benchmark_case("parse_integrate_lp")
+def _parse_integrate_lp(size, working_directory, rng):
+    from xia2.Wrappers.XDS.XDSIntegrateHelpers import parse_integrate_lp
+
+    n_images = _scaled(3600, size)
+    integrate_lp = os.path.join(working_directory, "INTEGRATE.LP")
+    with open(integrate_lp, "w") as fh:
+        fh.write(_synthetic_integrate_lp(rng, n_images))
+
+    def run():
+        parse_integrate_lp(integrate_lp)
+
+    return run, {"images": n_images}
+
+
+@benchmark_case("xia2setup_scan")
+def _xia2setup_scan(size, working_directory, rng):
+    from xia2.Applications.xia2setup import _scan_directory
+
+    n_sweeps = _scaled(20, size)
+    top = os.path.join(working_directory, "images")
+    for k in range(n_sweeps):
+        # a few sweeps per directory, each with its processing directory
+        directory = os.path.join(top, "sample%d" % (k // 4), "data")
+        os.makedirs(os.path.join(directory, "processing"), exist_ok=True)
+        for image in range(1, 101):
+            name = os.path.join(directory, "sweep%d_%05d.cbf" % (k, image))
+            open(name, "w").close()
+
+    def run():
+        cache = {}
+        directories = [top]
+        while directories:
+            subdirectories, _, _ = _scan_directory(directories.pop(), cache)
+            directories.extend(subdirectories)
+
+    return run, {"sweeps": n_sweeps, "images": 100 * n_sweeps}
+
+
+def _synthetic_xproject(size, working_directory):
+    from xia2.Schema.XCrystal import XCrystal
+    from xia2.Schema.XProject import XProject
+    from xia2.Schema.XWavelength import XWavelength
+
+    project = XProject(name="benchmark", base_path=working_directory)
+    for k in range(_scaled(50, size)):
+        xcrystal = XCrystal("crystal%d" % k, project)
+        for j, wavelength in enumerate((0.9795, 0.9793, 0.9000)):
+            xcrystal.add_wavelength(
+                XWavelength("wave%d" % (j + 1), xcrystal, wavelength)
+            )
+        project.add_crystal(xcrystal)
+    return project
+
+
+@benchmark_case("xproject_json")
+def _xproject_json(size, working_directory, rng):
+    from xia2.Schema.XProject import XProject
+
+    project = _synthetic_xproject(size, working_directory)
+
+    def run():
+        XProject.from_json(string=project.as_json())
+
+    return run, {
+        "crystals": len(project.get_crystals()),
+        "bytes": len(project.as_json()),
+    }
+
+
+def _xproject_serialization(size, working_directory, encoding):
+    from xia2.Schema.Serialization import dumps, loads
+    from xia2.Schema.XProject import XProject
+
+    project = _synthetic_xproject(size, working_directory)
+    # raises ImportError if the encoding is not available
+    payload = dumps(project.to_dict(), encoding=encoding)
+
+    def run():
+        XProject.from_dict(
+            loads(dumps(project.to_dict(), encoding=encoding)),
+            base_path=working_directory,
+        )
+
+    return run, {
+        "crystals": len(project.get_crystals()),
+        "bytes": len(payload),
+        "encoding": encoding,
+    }
+
+
+@benchmark_case("xproject_serialization_json")
+def _xproject_serialization_json(size, working_directory, rng):
+    return _xproject_serialization(size, working_directory, "json")
+
+
+@benchmark_case("xproject_serialization_msgpack")
+def _xproject_serialization_msgpack(size, working_directory, rng):
+    return _xproject_serialization(size, working_directory, "msgpack")
+
+
+def _stats(times):
+    return {
+        "min": min(times),
+        "max": max(times),
+        "mean": statistics.mean(times),
+        "median": statistics.median(times),
+        "stddev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "rounds": len(times),
+        "data": times,
+    }
+
+
+def run_case(name, size, working_directory, rounds=5, seed=0):
+    """Set up and time one case, returning its results, which record why
+    instead if it was skipped as a module it needs is not available or if it
+    failed."""
+    directory = os.path.join(working_directory, name)
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    try:
+        run, extra_info = _cases[name](size, directory, rng)
+    except ImportError as e:
+        logger.info("Skipping %s: %s", name, e)
+        return {"name": name, "params": {"size": size}, "skipped": str(e)}
+    except Exception as e:
+        logger.warning("%s failed: %s", name, e, exc_info=True)
+        return {"name": name, "params": {"size": size}, "error": str(e)}
+
+    times = []
+    try:
+        # one warm-up run, to exclude any one-off costs e.g. of imports
+        run()
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - t0)
+    except Exception as e:
+        logger.warning("%s failed: %s", name, e, exc_info=True)
+        return {"name": name, "params": {"size": size}, "error": str(e)}
+
+    result = {
+        "name": name,
+        "params": {"size": size},
+        "extra_info": extra_info,
+        "stats": _stats(times),
+    }
+    message = "%-24s min %9.4fs mean %9.4fs" % (
+        name,
+        result["stats"]["min"],
+        result["stats"]["mean"],
+    )
+    if "bytes" in extra_info:
+        message += " payload %10d bytes" % extra_info["bytes"]
+    logger.info(message)
+    return result
+
+
+def run_benchmarks(params, working_directory):
+    """Run the cases selected by params, returning the results."""
+    from xia2.XIA2Version import VersionNumber
+
+    names = params.case or case_names()
+    unknown = set(names) - set(_cases)
+    if unknown:
+        raise ValueError("Unknown benchmark case: %s" % ", ".join(sorted(unknown)))
+
+    return {
+        "machine_info": {
+            "node": platform.node(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "system": platform.system(),
+            "python_version": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "datetime": datetime.datetime.now().isoformat(),
+        "version": VersionNumber,
+        "benchmarks": [
+            run_case(
+                name,
+                params.size,
+                working_directory,
+                rounds=params.rounds,
+                seed=params.seed,
+            )
+            for name in names
+        ],
+    }
+
+
+def compare_results(results, reference):
+    """Compare the mean times of the cases in results with those in an
+    earlier set of results for the same size, as a list of rows of case
+    name, reference time, time and ratio."""
+
+    def timed(r):
+        return {
+            (b["name"], b["params"]["size"]): b["stats"]["mean"]
+            for b in r["benchmarks"]
+            if "stats" in b
+        }
+
+    reference_times = timed(reference)
+    rows = []
+    for (name, size), mean in timed(results).items():
+        if (name, size) in reference_times:
+            ref = reference_times[(name, size)]
+            ratio = mean / ref if ref else math.inf
+            rows.append((name, ref, mean, ratio))
+    return rows
@@ -1,7 +1,11 @@
+import concurrent.futures
 import logging
 import math
 
+import numpy as np
+
 import iotbx.phil
+from cctbx import miller
 from cctbx.array_family import flex
 from libtbx.utils import frange
 
@@ -17,6 +21,9 @@ n_bins = 20
   .type = int(value_min=1)
 d_min = None
   .type = float(value_min=0)
+nproc = 1
+  .type = int(value_min=1)
+  .help = "Number of processes over which to spread the groups"
 """,
     process_includes=True,
 )
@@ -31,11 +38,13 @@ class DeltaCcHalf:
         d_min=None,
         cc_one_half_method="sigma_tau",
         group_size=None,
+        nproc=1,
     ):
         self.intensities = intensities
         self.batches = batches
         self._cc_one_half_method = cc_one_half_method
         self._n_bins = n_bins
+        self._nproc = nproc
 
         unmerged_intensities = None
         for ma in intensities:
@@ -79,6 +88,41 @@ class DeltaCcHalf:
                 self._group_to_dataset_id.append(test_k)
 
     def _compute_ccs(self):
+        if self._cc_one_half_method == "sigma_tau":
+            ccs = self._compute_ccs_sigma_tau()
+        else:
+            ccs = self._compute_ccs_half_dataset()
+        for (group_start, group_end), cc in zip(self._group_to_batches, ccs):
+            logger.debug(
+                "CC½ excluding batches %i-%i: %.3f", group_start, group_end, cc
+            )
+        return ccs
+
+    def _compute_ccs_sigma_tau(self):
+        statistics = _SigmaTauStatistics(self.intensities, self.batches, self.binner)
+        groups = [
+            (test_k, group_start, group_end)
+            for (group_start, group_end), test_k in zip(
+                self._group_to_batches, self._group_to_dataset_id
+            )
+        ]
+        if self._nproc > 1 and len(groups) > 1:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=self._nproc,
+                initializer=_set_worker_statistics,
+                initargs=(statistics,),
+            ) as pool:
+                chunksize = int(math.ceil(len(groups) / (4 * self._nproc)))
+                ccs = list(
+                    pool.map(_worker_cc_half_excluding, groups, chunksize=chunksize)
+                )
+        else:
+            ccs = [statistics.cc_half_excluding(*group) for group in groups]
+        return flex.double(ccs)
+
+    def _compute_ccs_half_dataset(self):
+        # the random assignment of observations to half datasets means the
+        # whole calculation must be repeated for each group
         ccs = flex.double()
         for (group_start, group_end), test_k in zip(
             self._group_to_batches, self._group_to_dataset_id
@@ -100,12 +144,6 @@ class DeltaCcHalf:
             )
 
             ccs.append(self._compute_mean_weighted_cc_half(unmerged_i))
-            logger.debug(
-                "CC½ excluding batches %i-%i: %.3f",
-                group_start,
-                group_end,
-                ccs[-1],
-            )
         return ccs
 
     def _compute_mean_weighted_cc_half(self, intensities):
@@ -216,3 +254,123 @@ class DeltaCcHalf:
         plt.xlabel("Group")
         plt.ylabel(r"$\sigma$")
         plt.savefig(filename)
+
+
+class _SigmaTauStatistics:
+    """The sums over the observations of each unique reflection, and over
+    the merged reflections in each resolution bin, needed to calculate the
+    CC½ of all datasets by the sigma-tau method (as
+    cctbx.miller.array.cc_one_half_sigma_tau, i.e. with unit weights and
+    internal variances) with any group of observations left out, changing
+    only the sums for the reflections in that group."""
+
+    def __init__(self, intensities, batches, binner):
+        self._n_bins = binner.n_bins_all()
+        self._batches = [b.data().as_numpy_array() for b in batches]
+
+        indices = [
+            ma.indices().as_vec3_double().as_double().as_numpy_array().reshape(-1, 3)
+            for ma in intensities
+        ]
+        unique, ids = np.unique(np.concatenate(indices), axis=0, return_inverse=True)
+        ids = ids.ravel()
+        data = np.concatenate([ma.data().as_numpy_array() for ma in intensities])
+        bins = np.concatenate(
+            [
+                miller.binner(binner, ma).bin_indices().as_numpy_array()
+                for ma in intensities
+            ]
+        )
+        self._bin_of_id = np.zeros(len(unique), dtype=np.intp)
+        self._bin_of_id[ids] = bins
+
+        # accumulate deviations from the mean of each reflection, for
+        # numerical stability
+        n_ids = len(unique)
+        self._n = np.bincount(ids, minlength=n_ids).astype(np.float64)
+        self._mean = np.bincount(ids, weights=data, minlength=n_ids) / np.maximum(
+            self._n, 1
+        )
+        deviations = data - self._mean[ids]
+        self._s1 = np.bincount(ids, weights=deviations, minlength=n_ids)
+        self._s2 = np.bincount(ids, weights=deviations ** 2, minlength=n_ids)
+
+        offsets = np.cumsum([0] + [ma.size() for ma in intensities])
+        self._ids = [ids[i:j] for i, j in zip(offsets[:-1], offsets[1:])]
+        self._deviations = [
+            deviations[i:j] for i, j in zip(offsets[:-1], offsets[1:])
+        ]
+
+        self._n_obs = np.bincount(bins, minlength=self._n_bins)
+        self._totals = self._bin_totals(
+            np.arange(n_ids), self._n, self._s1, self._s2
+        )
+
+    def _bin_totals(self, ids, n, s1, s2):
+        """For the reflections ids with more than one observation, return
+        per resolution bin the number of reflections and the sums of their
+        mean intensities, squared mean intensities and internal variances."""
+        sel = n > 1
+        ids, n, s1, s2 = ids[sel], n[sel], s1[sel], s2[sel]
+        mean = self._mean[ids] + s1 / n
+        variance = np.maximum((s2 - s1 * s1 / n) / (n - 1), 1) / n
+        bins = self._bin_of_id[ids]
+        return np.array(
+            [
+                np.bincount(bins, weights=w, minlength=self._n_bins)
+                for w in (np.ones_like(n), mean, mean * mean, variance)
+            ]
+        )
+
+    def _mean_weighted_cc_half(self, totals, n_obs):
+        count, sum_mean, sum_mean_sq, sum_variance = totals[:, n_obs > 0]
+        cc = np.zeros(count.size)
+        sel = count > 1
+        var_y = (sum_mean_sq[sel] - sum_mean[sel] ** 2 / count[sel]) / (count[sel] - 1)
+        var_e = 2 * sum_variance[sel] / count[sel]
+        cc[sel] = (var_y - 0.5 * var_e) / (var_y + 0.5 * var_e)
+        return float(np.sum(cc * count) / np.sum(count))
+
+    def cc_half(self):
+        return self._mean_weighted_cc_half(self._totals, self._n_obs)
+
+    def cc_half_excluding(self, dataset, batch_start, batch_end):
+        """Return the CC½ excluding batches batch_start to batch_end of the
+        given dataset."""
+        batches = self._batches[dataset]
+        sel = (batches >= batch_start) & (batches <= batch_end)
+        ids = self._ids[dataset][sel]
+        deviations = self._deviations[dataset][sel]
+
+        affected, inverse = np.unique(ids, return_inverse=True)
+        inverse = inverse.ravel()
+        n = self._n[affected]
+        s1 = self._s1[affected]
+        s2 = self._s2[affected]
+        totals = (
+            self._totals
+            - self._bin_totals(affected, n, s1, s2)
+            + self._bin_totals(
+                affected,
+                n - np.bincount(inverse),
+                s1 - np.bincount(inverse, weights=deviations),
+                s2 - np.bincount(inverse, weights=deviations ** 2),
+            )
+        )
+        n_obs = self._n_obs - np.bincount(
+            self._bin_of_id[ids], minlength=self._n_bins
+        )
+        return self._mean_weighted_cc_half(totals, n_obs)
+
+
+# the statistics shared by the worker processes, set once for each process
+_worker_statistics = None
+
+
+def _set_worker_statistics(statistics):
+    global _worker_statistics
+    _worker_statistics = statistics
+
+
+def _worker_cc_half_excluding(group):
+    return _worker_statistics.cc_half_excluding(*group)
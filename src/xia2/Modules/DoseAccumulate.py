@@ -7,28 +7,132 @@
 # This is to work with fortran program "doser"
 
 
-import collections
+import collections.abc
+import logging
 
-from scitbx.array_family import flex
+import numpy as np
+
+logger = logging.getLogger("xia2.Modules.DoseAccumulate")
+
+_no_default = object()
+
+
+class DoseTable(collections.abc.Mapping):
+    """The accumulated dose at each exposure epoch, stored as a sorted array
+    of epochs and the corresponding array of doses. Doses for many epochs or
+    batches at once may be looked up with dose_for_epochs() and
+    dose_for_batches(); the table may also be used as a read-only mapping
+    from epoch to dose."""
+
+    def __init__(self, epochs, doses):
+        self.epochs = np.asarray(epochs, dtype=np.float64)
+        self.doses = np.asarray(doses, dtype=np.float64)
+        assert self.epochs.shape == self.doses.shape
+
+    @classmethod
+    def concatenate(cls, tables):
+        """Combine several tables into one: where an epoch appears in more
+        than one table the dose from the last is used."""
+        tables = list(tables)
+        if not tables:
+            return cls([], [])
+        epochs = np.concatenate([table.epochs for table in tables])
+        doses = np.concatenate([table.doses for table in tables])
+        perm = np.argsort(epochs, kind="stable")
+        epochs = epochs[perm]
+        doses = doses[perm]
+        last = np.append(epochs[1:] != epochs[:-1], True)
+        return cls(epochs[last], doses[last])
+
+    def dose_for_epochs(self, epochs, default=_no_default):
+        """Return an array of the doses for an array of epochs. Epochs which
+        are not in the table are given the default dose if one is given,
+        otherwise raise a KeyError."""
+        epochs = np.asarray(epochs, dtype=np.float64)
+        if self.epochs.size:
+            index = np.searchsorted(self.epochs, epochs)
+            index = np.minimum(index, self.epochs.size - 1)
+            found = self.epochs[index] == epochs
+            doses = self.doses[index]
+        else:
+            found = np.zeros(epochs.shape, dtype=bool)
+            doses = np.zeros(epochs.shape)
+        if default is _no_default:
+            if not found.all():
+                raise KeyError(float(epochs[~found][0]))
+            return doses
+        return np.where(found, doses, default)
+
+    def dose_for_batches(
+        self, batches, image_to_epoch, batch_offset=0, epoch_offset=0.0
+    ):
+        """Return an array of the doses for an array of batches from one
+        sweep, where image_to_epoch maps the image numbers of the sweep to
+        their epochs and the image for each batch is batch - batch_offset.
+
+        When handling Eiger data the epochs in the table may be relative to
+        the start of the sweep, see https://github.com/xia2/xia2/issues/90 -
+        any epochs not found in the table are then looked up after
+        subtracting epoch_offset."""
+        images = np.fromiter(image_to_epoch.keys(), dtype=np.int64)
+        image_epochs = np.fromiter(image_to_epoch.values(), dtype=np.float64)
+        perm = np.argsort(images)
+        images = images[perm]
+        image_epochs = image_epochs[perm]
+
+        wanted = np.asarray(batches, dtype=np.int64) - batch_offset
+        if not wanted.size:
+            return np.zeros(0)
+        if not images.size:
+            raise KeyError(int(wanted[0]))
+        index = np.minimum(np.searchsorted(images, wanted), images.size - 1)
+        found = images[index] == wanted
+        if not found.all():
+            raise KeyError(int(wanted[~found][0]))
+        epochs = image_epochs[index]
+
+        doses = self.dose_for_epochs(epochs, default=np.nan)
+        missing = np.isnan(doses)
+        if missing[0]:
+            logger.debug("Epoch not found; using offset %f", epoch_offset)
+        else:
+            logger.debug("Epoch found; all good")
+        if missing.any():
+            doses[missing] = self.dose_for_epochs(epochs[missing] - epoch_offset)
+        return doses
+
+    def __getitem__(self, epoch):
+        return float(self.dose_for_epochs([epoch])[0])
+
+    def __iter__(self):
+        return iter(self.epochs.tolist())
+
+    def __len__(self):
+        return self.epochs.size
 
 
 def accumulate_dose(imagesets):
-    epochs = flex.double()
-    exposure_times = flex.double()
+    epochs = []
+    exposure_times = []
     for imageset in imagesets:
         scan = imageset.get_scan()
-        epochs.extend(scan.get_epochs())
-        exposure_times.extend(scan.get_exposure_times())
-
-    perm = flex.sort_permutation(epochs)
-    epochs = epochs.select(perm)
-    exposure_times = exposure_times.select(perm)
+        epochs.append(np.asarray(scan.get_epochs(), dtype=np.float64))
+        exposure_times.append(
+            np.asarray(scan.get_exposure_times(), dtype=np.float64)
+        )
+    if not epochs:
+        return DoseTable([], [])
 
-    integrated_dose = collections.OrderedDict()
+    epochs = np.concatenate(epochs)
+    exposure_times = np.concatenate(exposure_times)
+    perm = np.argsort(epochs, kind="stable")
+    epochs = epochs[perm]
+    exposure_times = exposure_times[perm]
 
-    total = 0.0
-    for e, t in zip(epochs, exposure_times):
-        integrated_dose[e] = total + 0.5 * t
-        total += t
+    # dose at the middle of each exposure, after the total of all the
+    # preceding exposures
+    total = np.concatenate(([0.0], np.cumsum(exposure_times)[:-1]))
+    doses = total + 0.5 * exposure_times
 
-    return integrated_dose
+    # as for a dictionary keyed by epoch, the last of any repeated epochs wins
+    return DoseTable.concatenate([DoseTable(epochs, doses)])
@@ -6,13 +6,14 @@
 
 
 import copy
-import inspect
 import logging
 import math
 import os
 import shutil
 import time
+import warnings
 
+import numpy as np
 import scitbx.matrix
 from dials.array_family import flex
 from iotbx.xds import xparm
@@ -29,6 +30,7 @@ from xia2.lib.bits import auto_logfiler
 from xia2.Modules.Indexer.XDSIndexer import XDSIndexer
 from xia2.Schema.Exceptions.BadLatticeError import BadLatticeError
 from xia2.Schema.Interfaces.Integrater import Integrater
+from xia2.Schema.Serialization import serializable_members
 from xia2.Wrappers.CCP4.CCP4Factory import CCP4Factory
 from xia2.Wrappers.CCP4.Reindex import Reindex
 from xia2.Wrappers.Dials.ImportXDS import ImportXDS
@@ -64,7 +66,7 @@ class XDSIntegrater(Integrater):
     def to_dict(self):
         obj = Integrater.to_dict(self)
 
-        attributes = inspect.getmembers(self, lambda m: not (inspect.isroutine(m)))
+        attributes = serializable_members(self)
         for a in attributes:
             if a[0].startswith("_xds_"):
                 obj[a[0]] = a[1]
@@ -507,14 +509,13 @@ class XDSIntegrater(Integrater):
                 .get_masker()
             )
             if masker is not None:
-                integrate_filename = integrate_hkl_to_reflection_file(
-                    integrate_hkl, experiments_json, self.get_working_directory()
+                integrated = read_integrate_hkl(integrate_hkl)
+                reflections = integrate_hkl_to_reflection_table(
+                    integrated, experiments[0].detector
                 )
-                reflections = flex.reflection_table.from_file(integrate_filename)
 
                 t0 = time.time()
                 sel = filter_shadowed_reflections(experiments, reflections)
-                shadowed = reflections.select(sel)
                 t1 = time.time()
                 logger.debug(
                     "Filtered %i reflections in %.1f seconds"
@@ -522,19 +523,7 @@ class XDSIntegrater(Integrater):
                 )
 
                 filter_hkl = os.path.join(self.get_working_directory(), "FILTER.HKL")
-                with open(filter_hkl, "wb") as f:
-                    detector = experiments[0].detector
-                    for ref in shadowed:
-                        p = detector[ref["panel"]]
-                        ox, oy = p.get_raw_image_offset()
-                        h, k, l = ref["miller_index"]
-                        x, y, z = ref["xyzcal.px"]
-                        dx, dy, dz = (2, 2, 2)
-                        print(
-                            "%i %i %i %.1f %.1f %.1f %.1f %.1f %.1f"
-                            % (h, k, l, x + ox, y + oy, z, dx, dy, dz),
-                            file=f,
-                        )
+                write_filter_hkl(filter_hkl, integrated, sel.as_numpy_array())
                 t2 = time.time()
                 logger.debug("Written FILTER.HKL in %.1f seconds" % (t2 - t1))
 
@@ -898,16 +887,69 @@ class XDSIntegrater(Integrater):
         return self._intgr_experiments_filename
 
 
-def integrate_hkl_to_reflection_file(
-    integrate_hkl, experiments_json, working_directory
-):
-    importer = ImportXDS()
-    importer.set_working_directory(working_directory)
-    auto_logfiler(importer)
-    importer.set_experiments_json(experiments_json)
-    importer.set_integrate_hkl(integrate_hkl)
-    importer.run()
-    return importer.get_reflection_filename()
+def read_integrate_hkl(integrate_hkl):
+    """Read the reflections from INTEGRATE.HKL, returning a dictionary of
+    arrays of the miller indices, calculated and observed positions (in
+    the raw image, i.e. including the offset of the panel) and panel
+    (numbered from 0) of each reflection."""
+    with warnings.catch_warnings():
+        # numpy warns of a file with no reflections
+        warnings.simplefilter("ignore", UserWarning)
+        records = np.loadtxt(integrate_hkl, comments="!", ndmin=2)
+    if records.size == 0:
+        records = np.empty((0, 21))
+    if records.shape[1] > 20:
+        panel = records[:, 20].astype(np.int64) - 1
+    else:
+        panel = np.zeros(records.shape[0], dtype=np.int64)
+    return {
+        "miller_index": records[:, 0:3].astype(np.int32),
+        "xyzcal": records[:, 5:8],
+        "xyzobs": records[:, 12:15],
+        "panel": panel,
+    }
+
+
+def integrate_hkl_to_reflection_table(integrated, detector):
+    """Make a reflection table from the reflections read from INTEGRATE.HKL by
+    read_integrate_hkl(), as dials.import_xds would, with the offset of each
+    panel removed from the positions. The INTEGRATE.HKL reflections are in
+    the setting of the XPARM.XDS that the experiments were made from."""
+    offsets = np.zeros((len(detector), 3))
+    for p_id, p in enumerate(detector):
+        offsets[p_id, :2] = p.get_raw_image_offset()
+    offsets = offsets[integrated["panel"]]
+
+    def columns(values):
+        return [flex.double(np.ascontiguousarray(c)) for c in values.T]
+
+    def int_columns(values):
+        return [flex.int(np.ascontiguousarray(c)) for c in values.T]
+
+    reflections = flex.reflection_table()
+    reflections["id"] = flex.int(len(integrated["panel"]), 0)
+    reflections["panel"] = flex.size_t(integrated["panel"].astype(np.uint64))
+    reflections["miller_index"] = flex.miller_index(
+        *int_columns(integrated["miller_index"])
+    )
+    reflections["xyzcal.px"] = flex.vec3_double(
+        *columns(integrated["xyzcal"] - offsets)
+    )
+    reflections["xyzobs.px.value"] = flex.vec3_double(
+        *columns(integrated["xyzobs"] - offsets)
+    )
+    return reflections
+
+
+def write_filter_hkl(filter_hkl, integrated, selection):
+    """Write the selected reflections read from INTEGRATE.HKL by
+    read_integrate_hkl() to filter_hkl, to be excluded from CORRECT, each
+    with a box of 2 pixels and 2 images around its calculated position."""
+    records = np.empty((np.count_nonzero(selection), 9))
+    records[:, 0:3] = integrated["miller_index"][selection]
+    records[:, 3:6] = integrated["xyzcal"][selection]
+    records[:, 6:9] = 2
+    np.savetxt(filter_hkl, records, fmt="%i %i %i %.1f %.1f %.1f %.1f %.1f %.1f")
 
 
 def xparm_xds_to_experiments_json(xparm_xds, working_directory):
@@ -1,9 +1,13 @@
+import concurrent.futures
 import copy
 import logging
 import math
 import os
+import shutil
 from collections import OrderedDict
 
+import numpy as np
+
 from libtbx import Auto
 import iotbx.phil
 from cctbx import miller
@@ -164,6 +168,10 @@ max_clusters = None
   .type = int(value_min=1)
 cluster_method = *cos_angle correlation unit_cell
   .type = choice
+cluster_njob = 1
+  .type = int(value_min=1)
+  .help = "The number of clusters to scale concurrently, each in a separate "
+          "process"
 
 identifiers = None
   .type = strings
@@ -199,6 +207,23 @@ symmetry.cosym.best_monoclinic_beta = False
 )
 
 
+def identifiers_with_flagged_reflections(experiments, reflections, flag):
+    """Return the identifiers of the experiments with at least one reflection
+    with the given flag set, in the order of the experiments, counting the
+    flagged reflections of every experiment in a single pass."""
+    ids = reflections["id"].select(reflections.get_flags(flag))
+    ids = ids.select(ids >= 0).as_numpy_array()
+    counts = np.bincount(ids)
+    id_to_identifier = reflections.experiment_identifiers()
+    identifier_to_id = dict(zip(id_to_identifier.values(), id_to_identifier.keys()))
+    keep = []
+    for expt in experiments:
+        i = identifier_to_id.get(expt.identifier)
+        if i is not None and i < counts.size and counts[i]:
+            keep.append(expt.identifier)
+    return keep
+
+
 class DataManager:
     def __init__(self, experiments, reflections):
         self._input_experiments = experiments
@@ -206,6 +231,8 @@ class DataManager:
 
         self._experiments = copy.deepcopy(experiments)
         self._reflections = copy.deepcopy(reflections)
+        self._experiments_filename = None
+        self._reflections_filename = None
         self.ids_to_identifiers_map = dict(self._reflections.experiment_identifiers())
         self.identifiers_to_ids_map = {
             value: key for key, value in self.ids_to_identifiers_map.items()
@@ -214,12 +241,12 @@ class DataManager:
         self._set_batches()
 
     def _set_batches(self):
-        max_batches = max(e.scan.get_image_range()[1] for e in self._experiments)
+        max_batches = max(e.scan.get_image_range()[1] for e in self.experiments)
         max_batches += 10  # allow some head room
 
         n = int(math.ceil(math.log10(max_batches)))
 
-        for i, expt in enumerate(self._experiments):
+        for i, expt in enumerate(self.experiments):
             expt.scan.set_batch_offset(i * 10 ** n)
             # This may be a different scan instance ¯\_(ツ)_/¯
             expt.imageset.get_scan().set_batch_offset(expt.scan.get_batch_offset())
@@ -229,25 +256,71 @@ class DataManager:
 
     @property
     def experiments(self):
+        if self._experiments is None:
+            self._experiments = load.experiment_list(
+                self._experiments_filename, check_format=False
+            )
         return self._experiments
 
     @experiments.setter
     def experiments(self, experiments):
         self._experiments = experiments
+        self._experiments_filename = None
 
     @property
     def reflections(self):
+        if self._reflections is None:
+            self._reflections = flex.reflection_table.from_file(
+                self._reflections_filename
+            )
         return self._reflections
 
     @reflections.setter
     def reflections(self, reflections):
         self._reflections = reflections
+        self._reflections_filename = None
+
+    def set_experiments_file(self, filename):
+        """Replace the experiments with those in filename, which will only be
+        read when they are first needed."""
+        self._experiments = None
+        self._experiments_filename = filename
+
+    def set_reflections_file(self, filename):
+        """Replace the reflections with those in filename, which will only be
+        read when they are first needed."""
+        self._reflections = None
+        self._reflections_filename = filename
+
+    def copy_selection(self, experiment_identifiers):
+        """Return a new DataManager with copies of only the selected
+        experiments and their reflections, keeping the batch offsets."""
+        data_manager = copy.copy(self)
+        experiments = ExperimentList(
+            [
+                expt
+                for expt in self.experiments
+                if expt.identifier in experiment_identifiers
+            ]
+        )
+        reflections = self.reflections.select_on_experiment_identifiers(
+            experiment_identifiers
+        )
+        reflections.reset_ids()
+        reflections.assert_experiment_identifiers_are_consistent(experiments)
+        data_manager.experiments = copy.deepcopy(experiments)
+        data_manager.reflections = reflections
+        data_manager._input_experiments = data_manager.experiments
+        data_manager._input_reflections = data_manager.reflections
+        data_manager.ids_to_identifiers_map = dict(self.ids_to_identifiers_map)
+        data_manager.identifiers_to_ids_map = dict(self.identifiers_to_ids_map)
+        return data_manager
 
     def select(self, experiment_identifiers):
-        self._experiments = ExperimentList(
+        self.experiments = ExperimentList(
             [
                 expt
-                for expt in self._experiments
+                for expt in self.experiments
                 if expt.identifier in experiment_identifiers
             ]
         )
@@ -264,7 +337,7 @@ class DataManager:
         )
 
         keep_expts = []
-        for i, expt in enumerate(self._experiments):
+        for i, expt in enumerate(self.experiments):
             start, end = expt.scan.get_image_range()
             if (start <= dose_min <= end) or (start <= dose_max <= end):
                 keep_expts.append(expt.identifier)
@@ -283,16 +356,16 @@ class DataManager:
                 max(dose_min, expt.scan.get_image_range()[0]),
                 min(dose_max, expt.scan.get_image_range()[1]),
             )
-            for expt in self._experiments
+            for expt in self.experiments
         ]
-        n_refl_before = self._reflections.size()
-        self._experiments = slice_experiments(self._experiments, image_range)
-        flex.min_max_mean_double(self._reflections["xyzobs.px.value"].parts()[2]).show()
-        self._reflections = slice_reflections(self._reflections, image_range)
-        flex.min_max_mean_double(self._reflections["xyzobs.px.value"].parts()[2]).show()
+        n_refl_before = self.reflections.size()
+        self.experiments = slice_experiments(self.experiments, image_range)
+        flex.min_max_mean_double(self.reflections["xyzobs.px.value"].parts()[2]).show()
+        self.reflections = slice_reflections(self.reflections, image_range)
+        flex.min_max_mean_double(self.reflections["xyzobs.px.value"].parts()[2]).show()
         logger.info(
             "%i reflections out of %i remaining after filtering for dose"
-            % (self._reflections.size(), n_refl_before)
+            % (self.reflections.size(), n_refl_before)
         )
 
     def reflections_as_miller_arrays(self, combined=False):
@@ -305,12 +378,12 @@ class DataManager:
 
         # offsets = calculate_batch_offsets(experiments)
         reflection_tables = []
-        for id_ in set(self._reflections["id"]).difference({-1}):
+        for id_ in set(self.reflections["id"]).difference({-1}):
             reflection_tables.append(
-                self._reflections.select(self._reflections["id"] == id_)
+                self.reflections.select(self.reflections["id"] == id_)
             )
 
-        offsets = [expt.scan.get_batch_offset() for expt in self._experiments]
+        offsets = [expt.scan.get_batch_offset() for expt in self.experiments]
         reflection_tables = assign_batches_to_reflections(reflection_tables, offsets)
 
         if combined:
@@ -324,7 +397,7 @@ class DataManager:
                 batches.extend(r["batch"].select(sel))
                 scales.extend(r["inverse_scale_factor"].select(sel))
             scaled_array = scaled_data_as_miller_array(
-                reflection_tables, self._experiments
+                reflection_tables, self.experiments
             )
             batch_array = miller.array(scaled_array, data=batches)
             scale_array = miller.array(scaled_array, data=scales)
@@ -334,7 +407,7 @@ class DataManager:
             scaled_arrays = []
             batch_arrays = []
             scale_arrays = []
-            for expt, r in zip(self._experiments, reflection_tables):
+            for expt, r in zip(self.experiments, reflection_tables):
                 sel = ~r.get_flags(r.flags.bad_for_scaling, all=False)
                 sel &= r["inverse_scale_factor"] > 0
                 batches = r["batch"].select(sel)
@@ -346,25 +419,30 @@ class DataManager:
 
     def reindex(self, cb_op, space_group=None):
         logger.info("Reindexing: %s" % cb_op)
-        self._reflections["miller_index"] = cb_op.apply(
-            self._reflections["miller_index"]
+        self.reflections["miller_index"] = cb_op.apply(
+            self.reflections["miller_index"]
         )
 
-        for expt in self._experiments:
+        for expt in self.experiments:
             cryst_reindexed = expt.crystal.change_basis(cb_op)
             if space_group is not None:
                 cryst_reindexed.set_space_group(space_group)
             expt.crystal.update(cryst_reindexed)
 
     def export_reflections(self, filename, d_min=None):
-        reflections = self._reflections
+        if self._reflections is None and not d_min:
+            # no need to read the reflections only to write them out again
+            if os.path.abspath(filename) != os.path.abspath(self._reflections_filename):
+                shutil.copyfile(self._reflections_filename, filename)
+            return filename
+        reflections = self.reflections
         if d_min:
             reflections = reflections.select(reflections["d"] >= d_min)
         reflections.as_file(filename)
         return filename
 
     def export_experiments(self, filename):
-        self._experiments.as_file(filename)
+        self.experiments.as_file(filename)
         return filename
 
     def export_unmerged_mtz(self, filename, d_min=None):
@@ -372,14 +450,14 @@ class DataManager:
         params.mtz.d_min = d_min
         params.mtz.hklout = filename
         params.intensity = ["scale"]
-        export.export_mtz(params, self._experiments, [self._reflections])
+        export.export_mtz(params, self.experiments, [self.reflections])
 
     def export_merged_mtz(self, filename, d_min=None):
         params = merge.phil_scope.extract()
         params.d_min = d_min
         params.assess_space_group = False
         mtz_obj = merge.merge_data_to_mtz(
-            params, self._experiments, [self._reflections]
+            params, self.experiments, [self.reflections]
         )
         mtz_obj.write(filename)
 
@@ -404,19 +482,11 @@ class MultiCrystalScale:
 
         if params.remove_profile_fitting_failures:
             reflections = self._data_manager.reflections
-            profile_fitted_mask = reflections.get_flags(
-                reflections.flags.integrated_prf
+            keep_expts = identifiers_with_flagged_reflections(
+                self._data_manager.experiments,
+                reflections,
+                reflections.flags.integrated_prf,
             )
-            keep_expts = []
-            for i, expt in enumerate(self._data_manager.experiments):
-                refl_used = reflections.select(profile_fitted_mask)
-                if (
-                    expt.identifier in refl_used.experiment_identifiers().values()
-                    and refl_used.select_on_experiment_identifiers(
-                        [expt.identifier]
-                    ).size()
-                ):
-                    keep_expts.append(expt.identifier)
             if len(keep_expts):
                 logger.info(
                     "Selecting %i experiments with profile-fitted reflections"
@@ -425,18 +495,14 @@ class MultiCrystalScale:
                 self._data_manager.select(keep_expts)
 
         reflections = self._data_manager.reflections
-        used_in_refinement_mask = reflections.get_flags(
-            reflections.flags.used_in_refinement
+        keep_expts = identifiers_with_flagged_reflections(
+            self._data_manager.experiments,
+            reflections,
+            reflections.flags.used_in_refinement,
         )
-        keep_expts = []
-        for i, expt in enumerate(self._data_manager.experiments):
-            refl_used = reflections.select(used_in_refinement_mask)
-            if (
-                expt.identifier in refl_used.experiment_identifiers().values()
-                and refl_used.select_on_experiment_identifiers([expt.identifier]).size()
-            ):
-                keep_expts.append(expt.identifier)
-            else:
+        kept = set(keep_expts)
+        for expt in self._data_manager.experiments:
+            if expt.identifier not in kept:
                 logger.info(
                     "Removing experiment %s (no refined reflections remaining)"
                     % expt.identifier
@@ -487,9 +553,9 @@ class MultiCrystalScale:
         if max_clusters or min_completeness is not None or min_multiplicity is not None:
             self._data_manager_original = self._data_manager
             cwd = os.path.abspath(os.getcwd())
-            n_processed = 0
+            selected = []
             for cluster in reversed(clusters):
-                if max_clusters is not None and n_processed == max_clusters:
+                if max_clusters is not None and len(selected) == max_clusters:
                     break
                 if (
                     min_completeness is not None
@@ -503,32 +569,45 @@ class MultiCrystalScale:
                     continue
                 if len(cluster.labels) == len(self._data_manager_original.experiments):
                     continue
-                n_processed += 1
+                selected.append(cluster)
 
+            jobs = []
+            for cluster in selected:
                 logger.info("Scaling cluster %i:" % cluster.cluster_id)
                 logger.info(cluster)
-                cluster_dir = "cluster_%i" % cluster.cluster_id
+                cluster_dir = os.path.join(cwd, "cluster_%i" % cluster.cluster_id)
                 if not os.path.exists(cluster_dir):
                     os.mkdir(cluster_dir)
-                os.chdir(cluster_dir)
-                data_manager = copy.deepcopy(self._data_manager_original)
                 cluster_identifiers = [
                     self._data_manager.ids_to_identifiers_map[l] for l in cluster.labels
                 ]
-                data_manager.select(cluster_identifiers)
-                scaled = Scale(data_manager, self._params)
+                jobs.append((cluster_identifiers, cluster_dir))
 
-                data_manager.export_unmerged_mtz(
-                    "scaled_unmerged.mtz", d_min=scaled.d_min
-                )
-                data_manager.export_merged_mtz("scaled.mtz", d_min=scaled.d_min)
-                data_manager.export_experiments("scaled.expt")
-                data_manager.export_reflections("scaled.refl", d_min=scaled.d_min)
-
-                self._record_individual_report(
-                    data_manager, scaled.report(), cluster_dir.replace("_", " ")
+            # each job is given a copy of only the data for its cluster
+            data_managers = (
+                self._data_manager_original.copy_selection(identifiers)
+                for identifiers, _ in jobs
+            )
+            cluster_dirs = [cluster_dir for _, cluster_dir in jobs]
+            params = [self._params] * len(jobs)
+            njob = min(self._params.cluster_njob, len(jobs))
+            pool = None
+            if njob > 1:
+                pool = concurrent.futures.ProcessPoolExecutor(max_workers=njob)
+            try:
+                results = (pool.map if pool else map)(
+                    _scale_cluster, data_managers, params, cluster_dirs
                 )
-                os.chdir(cwd)
+                # the results are returned in order, as each cluster completes
+                for cluster, (data_manager, d_min) in zip(selected, results):
+                    self._record_individual_report(
+                        data_manager,
+                        scaling_report(data_manager, d_min),
+                        "cluster %i" % cluster.cluster_id,
+                    )
+            finally:
+                if pool:
+                    pool.shutdown()
         if self._params.filtering.method:
             # Final round of scaling, this time filtering out any bad datasets
             data_manager = copy.deepcopy(self._data_manager)
@@ -829,12 +908,8 @@ class MultiCrystalScale:
         self._cosym_analysis = cosym.get_cosym_analysis()
         self._experiments_filename = cosym.get_reindexed_experiments()
         self._reflections_filename = cosym.get_reindexed_reflections()
-        self._data_manager.experiments = load.experiment_list(
-            self._experiments_filename, check_format=False
-        )
-        self._data_manager.reflections = flex.reflection_table.from_file(
-            self._reflections_filename
-        )
+        self._data_manager.set_experiments_file(self._experiments_filename)
+        self._data_manager.set_reflections_file(self._reflections_filename)
 
         if not any(
             [self._params.symmetry.space_group, self._params.symmetry.laue_group]
@@ -888,12 +963,8 @@ class MultiCrystalScale:
         symmetry.set_mode_absences_only()
         symmetry.decide_pointgroup()
 
-        self._data_manager.experiments = load.experiment_list(
-            self._experiments_filename, check_format=False
-        )
-        self._data_manager.reflections = flex.reflection_table.from_file(
-            self._reflections_filename
-        )
+        self._data_manager.set_experiments_file(self._experiments_filename)
+        self._data_manager.set_reflections_file(self._reflections_filename)
         space_group = self._data_manager.experiments[0].crystal.get_space_group()
 
         logger.info("Space group determined by dials.symmetry: %s" % space_group.info())
@@ -932,14 +1003,51 @@ class MultiCrystalScale:
         self._cc_clusters = mca.cc_clusters
 
 
+def scaling_report(data_manager, d_min):
+    params = Report.phil_scope.extract()
+    params.dose.batch = []
+    params.d_min = d_min
+    report = Report.Report.from_data_manager(data_manager, params=params)
+    return report
+
+
+def _scale_cluster(data_manager, params, working_directory):
+    """Scale the data for one cluster in working_directory, exporting the
+    results there, and return the scaled data manager and resolution limit.
+
+    When run in a separate process any changes Scale makes to params are
+    lost, but these (the default scaling model and the resolution labels)
+    have already been made by scaling all of the data before the clusters."""
+    scaled = Scale(data_manager, params, working_directory=working_directory)
+
+    data_manager.export_unmerged_mtz(
+        os.path.join(working_directory, "scaled_unmerged.mtz"), d_min=scaled.d_min
+    )
+    data_manager.export_merged_mtz(
+        os.path.join(working_directory, "scaled.mtz"), d_min=scaled.d_min
+    )
+    data_manager.export_experiments(os.path.join(working_directory, "scaled.expt"))
+    data_manager.export_reflections(
+        os.path.join(working_directory, "scaled.refl"), d_min=scaled.d_min
+    )
+    return data_manager, scaled.d_min
+
+
 class Scale:
-    def __init__(self, data_manager, params, filtering=False):
+    def __init__(self, data_manager, params, filtering=False, working_directory=None):
         self._data_manager = data_manager
         self._params = params
         self._filtering = filtering
+        if working_directory is None:
+            working_directory = os.getcwd()
+        self._working_directory = os.path.abspath(working_directory)
 
-        self._experiments_filename = "models.expt"
-        self._reflections_filename = "observations.refl"
+        self._experiments_filename = os.path.join(
+            self._working_directory, "models.expt"
+        )
+        self._reflections_filename = os.path.join(
+            self._working_directory, "observations.refl"
+        )
         self._data_manager.export_experiments(self._experiments_filename)
         self._data_manager.export_reflections(self._reflections_filename)
 
@@ -959,14 +1067,12 @@ class Scale:
     def refine(self):
         # refine in correct bravais setting
         self._experiments_filename, self._reflections_filename = self._dials_refine(
-            self._experiments_filename, self._reflections_filename
-        )
-        self._data_manager.experiments = load.experiment_list(
-            self._experiments_filename, check_format=False
-        )
-        self._data_manager.reflections = flex.reflection_table.from_file(
-            self._reflections_filename
+            self._experiments_filename,
+            self._reflections_filename,
+            working_directory=self._working_directory,
         )
+        self._data_manager.set_experiments_file(self._experiments_filename)
+        self._data_manager.set_reflections_file(self._reflections_filename)
 
     def two_theta_refine(self):
         # two-theta refinement to get best estimate of unit cell
@@ -974,10 +1080,9 @@ class Scale:
             self._experiments_filename,
             self._reflections_filename,
             combine_crystal_models=self._params.two_theta_refine.combine_crystal_models,
+            working_directory=self._working_directory,
         )
-        self._data_manager.experiments = load.experiment_list(
-            self._experiments_filename, check_format=False
-        )
+        self._data_manager.set_experiments_file(self._experiments_filename)
 
     @property
     def scaled_mtz(self):
@@ -992,8 +1097,12 @@ class Scale:
         return self._data_manager
 
     @staticmethod
-    def _dials_refine(experiments_filename, reflections_filename):
+    def _dials_refine(
+        experiments_filename, reflections_filename, working_directory=None
+    ):
         refiner = Refine()
+        if working_directory is not None:
+            refiner.set_working_directory(working_directory)
         auto_logfiler(refiner)
         refiner.set_experiments_filename(experiments_filename)
         refiner.set_indexed_filename(reflections_filename)
@@ -1005,9 +1114,14 @@ class Scale:
 
     @staticmethod
     def _dials_two_theta_refine(
-        experiments_filename, reflections_filename, combine_crystal_models=True
+        experiments_filename,
+        reflections_filename,
+        combine_crystal_models=True,
+        working_directory=None,
     ):
         tt_refiner = TwoThetaRefine()
+        if working_directory is not None:
+            tt_refiner.set_working_directory(working_directory)
         auto_logfiler(tt_refiner)
         tt_refiner.set_experiments([experiments_filename])
         tt_refiner.set_reflection_files([reflections_filename])
@@ -1018,6 +1132,7 @@ class Scale:
     def scale(self, d_min=None, d_max=None):
         logger.debug("Scaling with dials.scale")
         scaler = DialsScale()
+        scaler.set_working_directory(self._working_directory)
         auto_logfiler(scaler)
         scaler.add_experiments_json(self._experiments_filename)
         scaler.add_reflections_file(self._reflections_filename)
@@ -1090,12 +1205,9 @@ class Scale:
         self._scaled_unmerged_mtz = scaler.get_scaled_unmerged_mtz()
         self._experiments_filename = scaler.get_scaled_experiments()
         self._reflections_filename = scaler.get_scaled_reflections()
-        self._data_manager.experiments = load.experiment_list(
-            self._experiments_filename, check_format=False
-        )
-        self._data_manager.reflections = flex.reflection_table.from_file(
-            self._reflections_filename
-        )
+        # the scaled data are only read once they are needed, e.g. for export
+        self._data_manager.set_experiments_file(self._experiments_filename)
+        self._data_manager.set_reflections_file(self._reflections_filename)
         self._params.resolution.labels = "IPR,SIGIPR"
         if self._filtering:
             self.scale_and_filter_results = scaler.get_scale_and_filter_results()
@@ -1105,6 +1217,7 @@ class Scale:
         # see also xia2/Modules/Scaler/CommonScaler.py: CommonScaler._estimate_resolution_limit()
         params = self._params.resolution
         m = EstimateResolution()
+        m.set_working_directory(self._working_directory)
         auto_logfiler(m)
         # use the scaled .refl and .expt file
         if self._experiments_filename and self._reflections_filename:
@@ -1168,8 +1281,4 @@ class Scale:
         return resolution, reasoning
 
     def report(self):
-        params = Report.phil_scope.extract()
-        params.dose.batch = []
-        params.d_min = self.d_min
-        report = Report.Report.from_data_manager(self._data_manager, params=params)
-        return report
+        return scaling_report(self._data_manager, self.d_min)
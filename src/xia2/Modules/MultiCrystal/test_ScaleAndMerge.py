@@ -0,0 +1,32 @@
+from dials.array_family import flex
+from dxtbx.model import Experiment, ExperimentList
+
+from xia2.Modules.MultiCrystal.ScaleAndMerge import (
+    identifiers_with_flagged_reflections,
+)
+
+
+def test_identifiers_with_flagged_reflections():
+    experiments = ExperimentList()
+    for identifier in ("a", "b", "c", "d"):
+        experiments.append(Experiment(identifier=identifier))
+
+    reflections = flex.reflection_table()
+    reflections["id"] = flex.int([0, 0, 1, 2, 2, -1])
+    for i, identifier in enumerate(("a", "b", "c")):
+        reflections.experiment_identifiers()[i] = identifier
+    reflections.set_flags(
+        flex.bool([False, True, False, False, True, True]),
+        reflections.flags.used_in_refinement,
+    )
+
+    # no flagged reflections for b, no reflections at all for d
+    assert identifiers_with_flagged_reflections(
+        experiments, reflections, reflections.flags.used_in_refinement
+    ) == ["a", "c"]
+    assert (
+        identifiers_with_flagged_reflections(
+            experiments, reflections, reflections.flags.integrated_prf
+        )
+        == []
+    )
@@ -91,6 +91,7 @@ class Report:
         self.dose = dose
         self.report_dir = report_dir
         self._xanalysis = None
+        self._xtriage_log = None
 
         assert self.intensities is not None
         # assert self.batches is not None
@@ -113,7 +114,70 @@ class Report:
                 self.batches = self.batches.as_anomalous_array()
 
         self.intensities.setup_binner(n_bins=self.params.resolution_bins)
-        self.merged_intensities = self.intensities.merge_equivalents().array()
+
+        # the merged data and merging statistics are shared between the report
+        # sections, and each is only computed once when first needed
+        self._merged_intensities = None
+        self._intensities_anom = None
+        self._merging_stats = {}
+
+    @property
+    def merged_intensities(self):
+        if self._merged_intensities is None:
+            self._merged_intensities = self.intensities.merge_equivalents().array()
+        return self._merged_intensities
+
+    @property
+    def intensities_anom(self):
+        """The unmerged intensities as an anomalous array, mapped to the
+        asymmetric unit."""
+        if self._intensities_anom is None:
+            intensities_anom = self.intensities.as_anomalous_array()
+            self._intensities_anom = intensities_anom.map_to_asu().customized_copy(
+                info=self.intensities.info()
+            )
+        return self._intensities_anom
+
+    def _merging_statistics(self, anomalous=False):
+        if anomalous not in self._merging_stats:
+            if anomalous:
+                intensities = self.intensities_anom
+            else:
+                intensities = self.intensities
+            self._merging_stats[anomalous] = merging_statistics.dataset_statistics(
+                intensities,
+                n_bins=self.params.resolution_bins,
+                anomalous=anomalous,
+                cc_one_half_significance_level=self.params.cc_half_significance_level,
+                eliminate_sys_absent=self.params.eliminate_sys_absent,
+                use_internal_variance=self.params.use_internal_variance,
+                assert_is_not_unique_set_under_symmetry=False,
+            )
+        return self._merging_stats[anomalous]
+
+    @property
+    def merging_stats(self):
+        return self._merging_statistics()
+
+    @property
+    def merging_stats_anom(self):
+        return self._merging_statistics(anomalous=True)
+
+    def _xtriage_analyses(self):
+        """Run xtriage on the merged and unmerged intensities, at most once."""
+        if self._xanalysis is None:
+            s = io.StringIO()
+            pout = printed_output(out=s)
+            xtriage_params = xtriage_master_params.fetch(sources=[]).extract()
+            xtriage_params.scaling.input.xray_data.skip_sanity_checks = True
+            self._xanalysis = xtriage_analyses(
+                miller_obs=self.merged_intensities,
+                unmerged_obs=self.intensities,
+                text_out=pout,
+                params=xtriage_params,
+            )
+            self._xtriage_log = s.getvalue()
+        return self._xanalysis
 
     def multiplicity_plots(self, dest_path=None):
         settings = master_phil.extract()
@@ -165,20 +229,11 @@ class Report:
         xtriage_success = []
         xtriage_warnings = []
         xtriage_danger = []
-        s = io.StringIO()
-        pout = printed_output(out=s)
-
-        xtriage_params = xtriage_master_params.fetch(sources=[]).extract()
-        xtriage_params.scaling.input.xray_data.skip_sanity_checks = True
-        xanalysis = xtriage_analyses(
-            miller_obs=self.merged_intensities,
-            unmerged_obs=self.intensities,
-            text_out=pout,
-            params=xtriage_params,
-        )
+
+        xanalysis = self._xtriage_analyses()
         if self.report_dir is not None:
             with open(os.path.join(self.report_dir, "xtriage.log"), "w") as f:
-                f.write(s.getvalue())
+                f.write(self._xtriage_log)
             xia2.Handlers.Files.FileHandler.record_log_file(
                 "Xtriage", os.path.join(self.report_dir, "xtriage.log")
             )
@@ -199,7 +254,6 @@ class Report:
                 xtriage_warnings.append(d)
             elif level == 2:
                 xtriage_danger.append(d)
-        self._xanalysis = xanalysis
         return xtriage_success, xtriage_warnings, xtriage_danger
 
     def batch_dependent_plots(self):
@@ -218,29 +272,6 @@ class Report:
         return d
 
     def resolution_plots_and_stats(self):
-        self.merging_stats = merging_statistics.dataset_statistics(
-            self.intensities,
-            n_bins=self.params.resolution_bins,
-            cc_one_half_significance_level=self.params.cc_half_significance_level,
-            eliminate_sys_absent=self.params.eliminate_sys_absent,
-            use_internal_variance=self.params.use_internal_variance,
-            assert_is_not_unique_set_under_symmetry=False,
-        )
-
-        intensities_anom = self.intensities.as_anomalous_array()
-        intensities_anom = intensities_anom.map_to_asu().customized_copy(
-            info=self.intensities.info()
-        )
-        self.merging_stats_anom = merging_statistics.dataset_statistics(
-            intensities_anom,
-            n_bins=self.params.resolution_bins,
-            anomalous=True,
-            cc_one_half_significance_level=self.params.cc_half_significance_level,
-            eliminate_sys_absent=self.params.eliminate_sys_absent,
-            use_internal_variance=self.params.use_internal_variance,
-            assert_is_not_unique_set_under_symmetry=False,
-        )
-
         is_centric = self.intensities.space_group().is_centric()
         plotter = ResolutionPlotsAndStats(
             self.merging_stats, self.merging_stats_anom, is_centric
@@ -252,6 +283,9 @@ class Report:
         return overall_stats, merging_stats, d
 
     def intensity_stats_plots(self, run_xtriage=True):
+        if run_xtriage:
+            # share the xtriage analysis with xtriage_report()
+            self._xtriage_analyses()
         plotter = IntensityStatisticsPlots(
             self.intensities,
             anomalous=self.params.anomalous,
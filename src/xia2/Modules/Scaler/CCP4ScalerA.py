@@ -7,6 +7,8 @@ import math
 import os
 import re
 
+import numpy as np
+
 from xia2.Handlers.CIF import CIF, mmCIF
 from xia2.Handlers.Citations import Citations
 from xia2.Handlers.Files import FileHandler
@@ -15,6 +17,7 @@ from xia2.Handlers.Syminfo import Syminfo
 from xia2.lib.bits import is_mtz_file, nifty_power_of_ten, transpose_loggraph
 from xia2.lib.SymmetryLib import sort_lattices
 from xia2.Modules import MtzUtils
+from xia2.Modules.DoseAccumulate import DoseTable
 from xia2.Modules.Scaler.CCP4ScalerHelpers import (
     CCP4ScalerHelper,
     SweepInformationHandler,
@@ -134,12 +137,102 @@ class CCP4ScalerA(Scaler):
 
         return aimless
 
-    def _pointless_indexer_jiffy(self, hklin, refiner):
-        return self._helper.pointless_indexer_jiffy(hklin, refiner)
+    def _pointless_indexer_jiffy(self, hklin, refiner, symmetry=None):
+        return self._helper.pointless_indexer_jiffy(hklin, refiner, symmetry=symmetry)
 
     def _pointless_indexer_multisweep(self, hklin, refiners):
         return self._helper.pointless_indexer_multisweep(hklin, refiners)
 
+    def _prepare_sweep(self, integrater):
+        # the per-sweep pointless analysis from _scale_prepare, only used
+        # there for more than one sweep without multi-sweep indexing
+        multi_sweep_indexing = PhilIndex.params.xia2.settings.multi_sweep_indexing
+        if len(self._scalr_integraters) < 2 or self._scalr_input_pointgroup:
+            return None
+        if multi_sweep_indexing:
+            return None
+
+        hklin = integrater.get_integrater_intensities()
+        pointless_hklin = self._prepare_pointless_hklin(
+            hklin, integrater.get_phi_width()
+        )
+        symmetry = self._helper.decide_pointgroup(pointless_hklin)
+        return hklin, pointless_hklin, symmetry
+
+    def _sweep_symmetry_analysis(self, epoch):
+        """The pointless analysis of one sweep, independent of the other
+        sweeps, using that from _prepare_sweep() if available."""
+        si = self._sweep_handler.get_sweep_information(epoch)
+        intgr = si.get_integrater()
+        hklin = si.get_reflections()
+
+        prepared = self._get_sweep_preparation(intgr)
+        if prepared is not None and prepared[0] == hklin:
+            return prepared[1:]
+
+        pointless_hklin = self._prepare_pointless_hklin(hklin, intgr.get_phi_width())
+        return pointless_hklin, self._helper.decide_pointgroup(pointless_hklin)
+
+    def _sweep_reference_reindexing(self, epoch):
+        """Reindex one sweep to match the reference, independent of the
+        other sweeps, returning the reflection file analysed, the reindexing
+        operator and the lattice and cell of the reindexed data."""
+        pl = self._factory.Pointless()
+
+        si = self._sweep_handler.get_sweep_information(epoch)
+        hklin = si.get_reflections()
+
+        pl.set_hklin(
+            self._prepare_pointless_hklin(hklin, si.get_integrater().get_phi_width())
+        )
+
+        hklout = os.path.join(
+            self.get_working_directory(),
+            "%s_rdx2.mtz" % os.path.split(hklin)[-1][:-4],
+        )
+
+        # we will want to delete this one exit
+        FileHandler.record_temporary_file(hklout)
+
+        # now set the initial reflection set as a reference...
+
+        pl.set_hklref(self._reference)
+
+        # https://github.com/xia2/xia2/issues/115 - should ideally iteratively
+        # construct a reference or a tree of correlations to ensure correct
+        # reference setting - however if small molecule assume has been
+        # multi-sweep-indexed so can ignore "fatal errors" - temporary hack
+        pl.decide_pointgroup(ignore_errors=PhilIndex.params.xia2.settings.small_molecule)
+
+        pointgroup = pl.get_pointgroup()
+        reindex_op = pl.get_reindex_operator()
+
+        # apply this...
+
+        integrater = si.get_integrater()
+
+        integrater.set_integrater_reindex_operator(reindex_op, reason="match reference")
+        integrater.set_integrater_spacegroup_number(
+            Syminfo.spacegroup_name_to_number(pointgroup)
+        )
+        si.set_reflections(integrater.get_integrater_intensities())
+
+        md = self._factory.Mtzdump()
+        md.set_hklin(si.get_reflections())
+        md.dump()
+
+        datasets = md.get_datasets()
+
+        if len(datasets) > 1:
+            raise RuntimeError("more than one dataset in %s" % si.get_reflections())
+
+        # then get the unit cell, lattice etc.
+
+        lattice = Syminfo.get_lattice(md.get_spacegroup())
+        cell = md.get_dataset_info(datasets[0])["cell"]
+
+        return pl.get_hklin(), reindex_op, lattice, cell
+
     def _scale_prepare(self):
         """Perform all of the preparation required to deliver the scaled
         data. This should sort together the reflection files, ensure that
@@ -329,6 +422,9 @@ class CCP4ScalerA(Scaler):
             else:
                 lattices = []
 
+                if not self._scalr_input_pointgroup:
+                    symmetries = self._prepare_sweeps(self._sweep_symmetry_analysis)
+
                 for epoch in self._sweep_handler.get_epochs():
 
                     si = self._sweep_handler.get_sweep_information(epoch)
@@ -342,12 +438,10 @@ class CCP4ScalerA(Scaler):
                         ntr = False
 
                     else:
-                        pointless_hklin = self._prepare_pointless_hklin(
-                            hklin, si.get_integrater().get_phi_width()
-                        )
+                        pointless_hklin, symmetry = symmetries[epoch]
 
                         pointgroup, reindex_op, ntr, pt = self._pointless_indexer_jiffy(
-                            pointless_hklin, refiner
+                            pointless_hklin, refiner, symmetry=symmetry
                         )
 
                         logger.debug("X1698: %s: %s", pointgroup, reindex_op)
@@ -529,11 +623,12 @@ class CCP4ScalerA(Scaler):
 
         # START OF if not mulit-sweep or pg given
         else:
+            if not self._scalr_input_pointgroup:
+                symmetries = self._prepare_sweeps(self._sweep_symmetry_analysis)
+
             for epoch in self._sweep_handler.get_epochs():
                 si = self._sweep_handler.get_sweep_information(epoch)
 
-                hklin = si.get_reflections()
-
                 integrater = si.get_integrater()
                 refiner = integrater.get_integrater_refiner()
 
@@ -546,13 +641,10 @@ class CCP4ScalerA(Scaler):
                     pt = False
 
                 else:
-
-                    pointless_hklin = self._prepare_pointless_hklin(
-                        hklin, si.get_integrater().get_phi_width()
-                    )
+                    pointless_hklin, symmetry = symmetries[epoch]
 
                     pointgroup, reindex_op, ntr, pt = self._pointless_indexer_jiffy(
-                        pointless_hklin, refiner
+                        pointless_hklin, refiner, symmetry=symmetry
                     )
 
                     logger.debug("X1698: %s: %s", pointgroup, reindex_op)
@@ -669,82 +761,26 @@ class CCP4ScalerA(Scaler):
 
             # ---------- REINDEX TO CORRECT (REFERENCE) SETTING ----------
 
-            for epoch in self._sweep_handler.get_epochs():
-
-                # if we are working with unified UB matrix then this should not
-                # be a problem here (note, *if*; *should*)
+            # if we are working with unified UB matrix then this should not
+            # be a problem here (note, *if*; *should*)
 
-                # what about e.g. alternative P1 settings?
-                # see JIRA MXSW-904
-                if PhilIndex.params.xia2.settings.unify_setting:
-                    continue
+            # what about e.g. alternative P1 settings?
+            # see JIRA MXSW-904
+            if PhilIndex.params.xia2.settings.unify_setting:
+                epochs = []
+            else:
+                epochs = self._sweep_handler.get_epochs()
 
-                pl = self._factory.Pointless()
+            # the sweeps are reindexed independently, then checked in order
+            reindexed = self._prepare_sweeps(self._sweep_reference_reindexing, epochs)
 
+            for epoch in epochs:
                 si = self._sweep_handler.get_sweep_information(epoch)
-                hklin = si.get_reflections()
-
-                pl.set_hklin(
-                    self._prepare_pointless_hklin(
-                        hklin, si.get_integrater().get_phi_width()
-                    )
-                )
-
-                hklout = os.path.join(
-                    self.get_working_directory(),
-                    "%s_rdx2.mtz" % os.path.split(hklin)[-1][:-4],
-                )
-
-                # we will want to delete this one exit
-                FileHandler.record_temporary_file(hklout)
-
-                # now set the initial reflection set as a reference...
-
-                pl.set_hklref(self._reference)
-
-                # https://github.com/xia2/xia2/issues/115 - should ideally iteratively
-                # construct a reference or a tree of correlations to ensure correct
-                # reference setting - however if small molecule assume has been
-                # multi-sweep-indexed so can ignore "fatal errors" - temporary hack
-                pl.decide_pointgroup(
-                    ignore_errors=PhilIndex.params.xia2.settings.small_molecule
-                )
-
-                logger.debug("Reindexing analysis of %s", pl.get_hklin())
-
-                pointgroup = pl.get_pointgroup()
-                reindex_op = pl.get_reindex_operator()
+                hklin, reindex_op, lattice, cell = reindexed[epoch]
 
+                logger.debug("Reindexing analysis of %s", hklin)
                 logger.debug("Operator: %s", reindex_op)
 
-                # apply this...
-
-                integrater = si.get_integrater()
-
-                integrater.set_integrater_reindex_operator(
-                    reindex_op, reason="match reference"
-                )
-                integrater.set_integrater_spacegroup_number(
-                    Syminfo.spacegroup_name_to_number(pointgroup)
-                )
-                si.set_reflections(integrater.get_integrater_intensities())
-
-                md = self._factory.Mtzdump()
-                md.set_hklin(si.get_reflections())
-                md.dump()
-
-                datasets = md.get_datasets()
-
-                if len(datasets) > 1:
-                    raise RuntimeError(
-                        "more than one dataset in %s" % si.get_reflections()
-                    )
-
-                # then get the unit cell, lattice etc.
-
-                lattice = Syminfo.get_lattice(md.get_spacegroup())
-                cell = md.get_dataset_info(datasets[0])["cell"]
-
                 if lattice != reference_lattice:
                     raise RuntimeError(
                         "lattices differ in %s and %s"
@@ -1186,35 +1222,24 @@ Scaling & analysis of unmerged intensities, absorption correction using spherica
 
     def get_batch_to_dose(self):
         batch_to_dose = {}
-        epoch_to_dose = {}
-        for xsample in self.get_scaler_xcrystal()._samples.values():
-            epoch_to_dose.update(xsample.get_epoch_to_dose())
+        dose_table = DoseTable.concatenate(
+            xsample.get_epoch_to_dose()
+            for xsample in self.get_scaler_xcrystal()._samples.values()
+        )
         for e0 in self._sweep_handler._sweep_information:
             si = self._sweep_handler._sweep_information[e0]
-            batch_offset = si.get_batch_offset()
-            printed = False
-            for b in range(si.get_batches()[0], si.get_batches()[1] + 1):
-                if epoch_to_dose:
-                    # when handling Eiger data this table appears to be somewhat broken
-                    # see https://github.com/xia2/xia2/issues/90 - proper fix should be
-                    # to work out why the epochs are not set correctly in first place...
-                    if si._image_to_epoch[b - batch_offset] in epoch_to_dose:
-                        if not printed:
-                            logger.debug("Epoch found; all good")
-                            printed = True
-                        batch_to_dose[b] = epoch_to_dose[
-                            si._image_to_epoch[b - batch_offset]
-                        ]
-                    else:
-                        if not printed:
-                            logger.debug("Epoch not found; using offset %f", e0)
-                            printed = True
-                        batch_to_dose[b] = epoch_to_dose[
-                            si._image_to_epoch[b - batch_offset] - e0
-                        ]
-                else:
-                    # backwards compatibility 2015-12-11
-                    batch_to_dose[b] = b
+            batches = np.arange(si.get_batches()[0], si.get_batches()[1] + 1)
+            if len(dose_table):
+                doses = dose_table.dose_for_batches(
+                    batches,
+                    si._image_to_epoch,
+                    batch_offset=si.get_batch_offset(),
+                    epoch_offset=e0,
+                )
+            else:
+                # backwards compatibility 2015-12-11
+                doses = batches
+            batch_to_dose.update(zip(batches.tolist(), doses.tolist()))
         return batch_to_dose
 
     def get_UBlattsymm_from_sweep_info(self, sweep_info):
@@ -3,11 +3,11 @@
 # small functions for computing e.g. resolution limits.
 
 
-import inspect
 import logging
 import math
 import os
 
+import numpy as np
 import xia2.Wrappers.CCP4.Pointless
 import xia2.Wrappers.Dials.Symmetry
 from cctbx.sgtbx import lattice_symmetry_group
@@ -18,6 +18,7 @@ from xia2.Handlers.Files import FileHandler
 from xia2.Handlers.Phil import PhilIndex
 from xia2.lib.bits import auto_logfiler
 from xia2.Modules import MtzUtils
+from xia2.Schema.Serialization import serializable_members
 
 logger = logging.getLogger("xia2.Modules.Scaler.CCP4ScalerHelpers")
 
@@ -73,62 +74,112 @@ def ersatz_resolution(reflection_file, batch_ranges):
     ipr_values = ipr_column.extract_values()
     sigipr_values = sigipr_column.extract_values()
     batch_values = batch_column.extract_values()
-    batches = batch_values.as_double().iround()
-    resolutions = {}
-
-    for start, end in batch_ranges:
-        sel = (batches >= start) & (batches <= end)
-        d = uc.d(miller.select(sel))
-        isig = ipr_values.select(sel) / sigipr_values.select(sel)
-        resolutions[(start, end)] = compute_resolution(dmax, dmin, d, isig)
-
-    return resolutions
+    batches = batch_values.as_double().iround().as_numpy_array()
+
+    d = uc.d(miller).as_numpy_array()
+    isig = (ipr_values / sigipr_values).as_numpy_array()
+
+    # assign each reflection to the batch ranges it falls in, so that the
+    # shell means for every batch range are computed in one go
+    groups = []
+    selections = []
+    for j, (start, end) in enumerate(batch_ranges):
+        sel = np.flatnonzero((batches >= start) & (batches <= end))
+        groups.append(np.full(sel.size, j))
+        selections.append(sel)
+    sel = np.concatenate(selections) if selections else np.zeros(0, dtype=int)
+    groups = np.concatenate(groups) if groups else np.zeros(0, dtype=int)
+
+    shells, means = _shell_means(
+        dmax, dmin, d[sel], isig[sel], groups, len(batch_ranges)
+    )
 
+    return {
+        (start, end): _resolution_from_shell_means(dmax, dmin, shells, means[j])
+        for j, (start, end) in enumerate(batch_ranges)
+    }
 
-def meansd(values):
-    mean = sum(values) / len(values)
-    var = sum((v - mean) * (v - mean) for v in values) / len(values)
-    return mean, math.sqrt(var)
 
+def _shells(dmax, dmin, d):
+    """Return the resolution shell, of 100 shells in 1/d^2 between dmax and
+    dmin, for each of the array of resolutions d, as nint() would."""
+    smax = 1.0 / (dmax * dmax)
+    smin = 1.0 / (dmin * dmin)
 
-def compute_resolution(dmax, dmin, d, isig):
+    s = 1.0 / (d * d)
+    x = 100.0 * (s - smax) / (smin - smax)
+    shells = np.rint(x).astype(int)
+    shells[(x > 0) & (shells == 0)] = 1
+    return shells
+
+
+def _shell_means(dmax, dmin, d, isig, groups, ngroups):
+    """Return the occupied shells and the mean I/sigma in each of these
+    shells for each group, an array of shape (ngroups, len(shells)), for
+    the reflections with resolution d, I/sigma isig in group groups. Shells
+    with no reflections in a group have a mean of NaN."""
+    shells = _shells(dmax, dmin, d)
+    if not shells.size:
+        return shells, np.zeros((ngroups, 0))
+
+    first = shells.min()
+    nshells = shells.max() - first + 1
+    index = groups * nshells + (shells - first)
+    size = ngroups * nshells
+    # bincount accumulates in order, so the sums are as for sum() of the
+    # values in each shell
+    weights = isig.astype(np.float64)
+    counts = np.bincount(index, minlength=size).reshape(ngroups, nshells)
+    sums = np.bincount(index, weights=weights, minlength=size).reshape(ngroups, nshells)
+
+    occupied = counts.any(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = np.where(counts > 0, sums / counts, np.nan)
+    return np.flatnonzero(occupied) + first, means[:, occupied]
+
+
+def _resolution_from_shell_means(dmax, dmin, shells, means):
+    """Return the resolution of the first shell, from the one with the
+    highest mean I/sigma, where the mean I/sigma falls below 1, otherwise
+    dmin."""
     # XXX As far as I can tell this function doesn't do anything useful as it
     # just returns the unmodified dmin that was passed as input! Please refer
     # to return 1.0 / math.sqrt(s) below & remove comment when you are happy...
 
-    bins = {}
-
     smax = 1.0 / (dmax * dmax)
     smin = 1.0 / (dmin * dmin)
 
-    for j, dj in enumerate(d):
-        s = 1.0 / (dj * dj)
-        n = nint(100.0 * (s - smax) / (smin - smax))
-        bins.setdefault(n, []).append(isig[j])
+    occupied = ~np.isnan(means)
+    shells = shells[occupied]
+    means = means[occupied]
 
     # compute starting point i.e. maximum point on the curve, to cope with
     # cases where low resolution has low I / sigma - see #1690.
 
-    max_misig = 0.0
     max_bin = 0
+    if means.size and means.max() > 0.0:
+        max_bin = shells[np.argmax(means)]
 
-    for b in sorted(bins):
-        misig = meansd(bins[b])[0]
+    (below,) = np.nonzero((shells >= max_bin) & (means < 1.0))
+    if below.size:
+        s = smax + shells[below[0]] * (smin - smax) / 100.0
+        return 1.0 / math.sqrt(s)
 
-        if misig > max_misig:
-            max_misig = misig
-            max_bin = b
+    return dmin
 
-    for b in sorted(bins):
-        if b < max_bin:
-            continue
 
-        s = smax + b * (smin - smax) / 100.0
-        misig = meansd(bins[b])[0]
-        if misig < 1.0:
-            return 1.0 / math.sqrt(s)
+def _as_numpy_array(values):
+    # flex arrays are converted much faster with as_numpy_array()
+    if hasattr(values, "as_numpy_array"):
+        values = values.as_numpy_array()
+    return np.asarray(values, dtype=np.float64)
 
-    return dmin
+
+def compute_resolution(dmax, dmin, d, isig):
+    d = _as_numpy_array(d)
+    isig = _as_numpy_array(isig)
+    shells, means = _shell_means(dmax, dmin, d, isig, np.zeros(d.size, dtype=int), 1)
+    return _resolution_from_shell_means(dmax, dmin, shells, means[0])
 
 
 def _prepare_pointless_hklin(working_directory, hklin, phi_width):
@@ -217,12 +268,9 @@ class CCP4ScalerHelper:
         auto_logfiler(symmetry)
         return symmetry
 
-    def pointless_indexer_jiffy(self, hklin, refiner):
-        """A jiffy to centralise the interactions between pointless
-        and the Indexer."""
-
-        need_to_return = False
-        probably_twinned = False
+    def decide_pointgroup(self, hklin):
+        """Run the symmetry analysis of hklin and return the wrapper, for
+        pointless_indexer_jiffy."""
 
         if PhilIndex.params.xia2.settings.symmetry.program == "dials":
             symmetry = self.dials_symmetry()
@@ -231,6 +279,18 @@ class CCP4ScalerHelper:
 
         symmetry.set_hklin(hklin)
         symmetry.decide_pointgroup()
+        return symmetry
+
+    def pointless_indexer_jiffy(self, hklin, refiner, symmetry=None):
+        """A jiffy to centralise the interactions between pointless
+        and the Indexer. symmetry may be the result of an earlier call to
+        decide_pointgroup(hklin)."""
+
+        need_to_return = False
+        probably_twinned = False
+
+        if symmetry is None:
+            symmetry = self.decide_pointgroup(hklin)
 
         rerun_pointless = False
 
@@ -379,7 +439,7 @@ class SweepInformation:
         obj = {}
         obj["__id__"] = "SweepInformation"
 
-        attributes = inspect.getmembers(self, lambda m: not (inspect.isroutine(m)))
+        attributes = serializable_members(self)
         for a in attributes:
             if a[0].startswith("__"):
                 continue
@@ -1,6 +1,7 @@
 # Bits the scalers have in common - inherit from me!
 
 
+import concurrent.futures
 import logging
 import math
 import os
@@ -13,6 +14,7 @@ from iotbx import mtz
 from iotbx.reflection_file_reader import any_reflection_file
 from iotbx.shelx import writer
 from iotbx.shelx.hklf import miller_array_export_as_shelx_hklf
+from libtbx import Auto
 from xia2.Handlers.CIF import CIF, mmCIF
 from xia2.Handlers.Files import FileHandler
 from xia2.Handlers.Phil import PhilIndex
@@ -45,6 +47,77 @@ class CommonScaler(Scaler):
         self._scalr_twinning_conclusion = None
         self._spacegroup_reindex_operator = None
 
+        # per-sweep preparation for scaling run in the background during
+        # integration, keyed by integrater
+        self._sweep_preparation_executor = None
+        self._sweep_preparations = {}
+
+    def prepare_scaler_sweep(self, integrater):
+        if not PhilIndex.params.xia2.settings.scale.pipeline_preparation:
+            return
+        if not integrater.get_integrater_finish_done():
+            return
+
+        # one job at a time, so as to take little from the integration still
+        # running in the foreground
+        if self._sweep_preparation_executor is None:
+            self._sweep_preparation_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1
+            )
+        future = self._sweep_preparation_executor.submit(
+            self._prepare_sweep, integrater
+        )
+        self._sweep_preparations[id(integrater)] = future
+
+    def _prepare_sweep(self, integrater):
+        """Do whatever preparation for scaling depends only on this sweep
+        and return the result, for _get_sweep_preparation() - overloaded by
+        the implementations."""
+        return None
+
+    def _get_sweep_preparation(self, integrater):
+        """Return the result of _prepare_sweep() for this integrater, if
+        prepare_scaler_sweep() was called for it, else None. Each result is
+        only returned once."""
+        future = self._sweep_preparations.pop(id(integrater), None)
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except Exception as e:
+            logger.debug("Preparing sweep for scaling failed: %s", e, exc_info=True)
+            return None
+
+    def _prepare_sweeps(self, function, epochs=None):
+        """Call function(epoch) for each epoch, by default every epoch of the
+        sweep handler, where the calls for different sweeps are independent
+        so may be run concurrently, on a pool of up to prepare_njob threads.
+        Return the results keyed by epoch, in the order of the epochs. If any
+        of the calls fail, the exception for the first epoch which failed is
+        raised once all have finished. Anything function logs is logged from
+        the threads as it happens, so for more than one job the output for
+        different sweeps may be interleaved."""
+        if epochs is None:
+            epochs = self._sweep_handler.get_epochs()
+        epochs = list(epochs)
+
+        njob = PhilIndex.params.xia2.settings.scale.prepare_njob
+        if njob is Auto:
+            mp_params = PhilIndex.params.xia2.settings.multiprocessing
+            njob = 1
+            for n in (mp_params.njob, mp_params.nproc):
+                if isinstance(n, int):
+                    njob *= n
+        njob = min(njob, len(epochs))
+
+        if njob <= 1:
+            return {epoch: function(epoch) for epoch in epochs}
+
+        logger.debug("Preparing %d sweeps on %d threads", len(epochs), njob)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=njob) as pool:
+            futures = [(epoch, pool.submit(function, epoch)) for epoch in epochs]
+        return {epoch: future.result() for epoch, future in futures}
+
     def _sort_together_data_ccp4(self):
         """Sort together in the right order (rebatching as we go) the sweeps
         we want to scale together."""
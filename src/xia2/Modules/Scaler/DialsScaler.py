@@ -1,6 +1,7 @@
 # An implementation of the scaler interface for dials.scale
 
 
+import functools
 import logging
 import math
 import os
@@ -228,9 +229,12 @@ class DialsScaler(Scaler):
         else:
             self._scalr_likely_spacegroups = [pointgroup]
             if reindex_initial:
-                for epoch in self._sweep_handler.get_epochs():
+
+                def reindex(epoch):
                     si = self._sweep_handler.get_sweep_information(epoch)
                     self._helper.reindex_jiffy(si, pointgroup, reindex_op=reindex_op)
+
+                self._prepare_sweeps(reindex)
                 # integrater reset reindex op and update in si.
             else:
                 self._sweep_handler = self._helper.split_experiments(
@@ -245,10 +249,13 @@ class DialsScaler(Scaler):
             self._scalr_likely_spacegroups = [self._scalr_input_spacegroup]
             pointgroup = self._scalr_input_spacegroup
         logger.debug("Using input pointgroup: %s", pointgroup)
-        for epoch in self._sweep_handler.get_epochs():
+
+        def reindex(epoch):
             si = self._sweep_handler.get_sweep_information(epoch)
             self._helper.reindex_jiffy(si, pointgroup, "h,k,l")
 
+        self._prepare_sweeps(reindex)
+
     def _standard_scale_prepare(self):
         pointgroups = {}
         reindex_ops = {}
@@ -259,6 +266,7 @@ class DialsScaler(Scaler):
         # First check for the existence of multiple lattices. If only one
         # epoch, then this gives the necessary data for proceeding straight
         # to the point group check.
+        symmetry_analysers = self._prepare_sweeps(self._sweep_symmetry_analysis)
         for epoch in self._sweep_handler.get_epochs():
             si = self._sweep_handler.get_sweep_information(epoch)
             intgr = si.get_integrater()
@@ -275,7 +283,10 @@ class DialsScaler(Scaler):
                 __,
                 ___,
             ) = self._helper.dials_symmetry_indexer_jiffy(
-                [experiment], [reflections], [refiner]
+                [experiment],
+                [reflections],
+                [refiner],
+                symmetry_analyser=symmetry_analysers[epoch],
             )
 
             lattice = Syminfo.get_lattice(pointgroup)
@@ -339,11 +350,72 @@ class DialsScaler(Scaler):
         else:
             overall_pointgroup = pointgroup_set.pop()
         self._scalr_likely_spacegroups = [overall_pointgroup]
-        for epoch in self._sweep_handler.get_epochs():
+
+        def reindex(epoch):
             si = self._sweep_handler.get_sweep_information(epoch)
             self._helper.reindex_jiffy(si, overall_pointgroup, reindex_ops[epoch])
+
+        self._prepare_sweeps(reindex)
         return need_to_return
 
+    def _prepare_sweep(self, integrater):
+        # the per-sweep symmetry analysis from _standard_scale_prepare
+        multi_sweep_indexing = PhilIndex.params.xia2.settings.multi_sweep_indexing
+        if self._scalr_input_pointgroup:
+            return None
+        if len(self._scalr_integraters) > 1 and multi_sweep_indexing:
+            return None
+
+        pname, xname, _ = integrater.get_integrater_project_info()
+        self._helper.set_pname_xname(pname, xname)
+        experiment = integrater.get_integrated_experiments()
+        reflections = integrater.get_integrated_reflections()
+        symmetry_analyser = self._helper.dials_symmetry_decide_pointgroup(
+            [experiment], [reflections]
+        )
+        return experiment, reflections, symmetry_analyser
+
+    def _sweep_symmetry_analysis(self, epoch):
+        """The dials.symmetry analysis of one sweep, independent of the other
+        sweeps, using that from _prepare_sweep() if available."""
+        intgr = self._sweep_handler.get_sweep_information(epoch).get_integrater()
+        experiment = intgr.get_integrated_experiments()
+        reflections = intgr.get_integrated_reflections()
+
+        prepared = self._get_sweep_preparation(intgr)
+        if prepared is not None and prepared[:2] == (experiment, reflections):
+            return prepared[2]
+
+        return self._helper.dials_symmetry_decide_pointgroup(
+            [experiment], [reflections]
+        )
+
+    def _sweep_reference_reindexing(self, epoch, reference_expt, reference_refl):
+        """Reindex one sweep to match the reference, independent of the other
+        sweeps, returning the cell of the reindexed data."""
+        reindexer = DialsReindex()
+        reindexer.set_working_directory(self.get_working_directory())
+        auto_logfiler(reindexer)
+
+        si = self._sweep_handler.get_sweep_information(epoch)
+        reindexer.set_reference_filename(reference_expt)
+        reindexer.set_reference_reflections(reference_refl)
+        reindexer.set_indexed_filename(si.get_reflections())
+        reindexer.set_experiments_filename(si.get_experiments())
+        reindexer.run()
+
+        # At this point, CCP4ScalerA would reset in integrator so that
+        # the integrater calls reindex, no need to do that here as
+        # have access to the files and will never need to reintegrate.
+
+        si.set_reflections(reindexer.get_reindexed_reflections_filename())
+        si.set_experiments(reindexer.get_reindexed_experiments_filename())
+
+        # FIXME how to get some indication of the reindexing used?
+
+        exp = load.experiment_list(reindexer.get_reindexed_experiments_filename())
+        return exp[0].crystal.get_unit_cell().parameters()
+
     def _scale_prepare(self):
         """Perform all of the preparation required to deliver the scaled
         data. This should sort together the reflection files, ensure that
@@ -469,43 +541,29 @@ pipeline=dials (supported for pipeline=dials-aimless).
             # ---------- REINDEX TO CORRECT (REFERENCE) SETTING ----------
             logger.info("Reindexing all datasets to common reference")
 
-            if using_external_references:
+            # if we are working with unified UB matrix then this should not
+            # be a problem here (note, *if*; *should*)
+
+            # what about e.g. alternative P1 settings?
+            # see JIRA MXSW-904
+            if PhilIndex.params.xia2.settings.unify_setting:
+                epochs = []
+            elif using_external_references:
                 epochs = self._sweep_handler.get_epochs()
             else:
                 epochs = self._sweep_handler.get_epochs()[1:]
-            for epoch in epochs:
-                # if we are working with unified UB matrix then this should not
-                # be a problem here (note, *if*; *should*)
 
-                # what about e.g. alternative P1 settings?
-                # see JIRA MXSW-904
-                if PhilIndex.params.xia2.settings.unify_setting:
-                    continue
-
-                reindexer = DialsReindex()
-                reindexer.set_working_directory(self.get_working_directory())
-                auto_logfiler(reindexer)
+            cells = self._prepare_sweeps(
+                functools.partial(
+                    self._sweep_reference_reindexing,
+                    reference_expt=reference_expt,
+                    reference_refl=reference_refl,
+                ),
+                epochs,
+            )
 
+            for epoch, cell in cells.items():
                 si = self._sweep_handler.get_sweep_information(epoch)
-                reindexer.set_reference_filename(reference_expt)
-                reindexer.set_reference_reflections(reference_refl)
-                reindexer.set_indexed_filename(si.get_reflections())
-                reindexer.set_experiments_filename(si.get_experiments())
-                reindexer.run()
-
-                # At this point, CCP4ScalerA would reset in integrator so that
-                # the integrater calls reindex, no need to do that here as
-                # have access to the files and will never need to reintegrate.
-
-                si.set_reflections(reindexer.get_reindexed_reflections_filename())
-                si.set_experiments(reindexer.get_reindexed_experiments_filename())
-
-                # FIXME how to get some indication of the reindexing used?
-
-                exp = load.experiment_list(
-                    reindexer.get_reindexed_experiments_filename()
-                )
-                cell = exp[0].crystal.get_unit_cell().parameters()
 
                 # Note - no lattice check as this will already be caught by reindex
                 logger.debug("Cell: %.2f %.2f %.2f %.2f %.2f %.2f" % cell)
@@ -1179,10 +1237,16 @@ class DialsScalerHelper:
         return sweep_handler
 
     def dials_symmetry_indexer_jiffy(
-        self, experiments, reflections, refiners, multisweep=False
+        self,
+        experiments,
+        reflections,
+        refiners,
+        multisweep=False,
+        symmetry_analyser=None,
     ):
         """A jiffy to centralise the interactions between dials.symmetry
-        and the Indexer, multisweep edition."""
+        and the Indexer, multisweep edition. symmetry_analyser may be the
+        result of an earlier call to dials_symmetry_decide_pointgroup()."""
         # First check format of input against expected input
         assert len(experiments) == len(
             reflections
@@ -1194,9 +1258,10 @@ Passing multple datasets to indexer_jiffy but not set multisweep=True"""
 
         reindex_initial = False
 
-        symmetry_analyser = self.dials_symmetry_decide_pointgroup(
-            experiments, reflections
-        )
+        if symmetry_analyser is None:
+            symmetry_analyser = self.dials_symmetry_decide_pointgroup(
+                experiments, reflections
+            )
 
         possible = symmetry_analyser.get_possible_lattices()
 
@@ -4,11 +4,13 @@
 
 
 import copy
-import inspect
+import functools
 import logging
 import os
 import shutil
 
+import numpy as np
+
 from xia2.Handlers.Citations import Citations
 from xia2.Handlers.Files import FileHandler
 from xia2.Handlers.Phil import PhilIndex
@@ -16,9 +18,11 @@ from xia2.Handlers.Syminfo import Syminfo
 from xia2.lib.bits import auto_logfiler, is_mtz_file, transpose_loggraph
 from xia2.lib.SymmetryLib import lattices_in_order
 from xia2.Modules import MtzUtils
+from xia2.Modules.DoseAccumulate import DoseTable
 from xia2.Modules.Scaler.CommonScaler import CommonScaler as Scaler
 from xia2.Modules.Scaler.tools import compute_average_unit_cell
 from xia2.Modules.Scaler.XDSScalerHelpers import XDSScalerHelper
+from xia2.Schema.Serialization import serializable_members
 from xia2.Wrappers.CCP4.CCP4Factory import CCP4Factory
 from xia2.Wrappers.XDS.XScaleR import XScaleR as _XScale
 
@@ -58,7 +62,7 @@ class XDSScalerA(Scaler):
 
     def to_dict(self):
         obj = super().to_dict()
-        attributes = inspect.getmembers(self, lambda m: not (inspect.isroutine(m)))
+        attributes = serializable_members(self)
         for a in attributes:
             if a[0].startswith("_xds_"):
                 obj[a[0]] = a[1]
@@ -705,17 +709,25 @@ class XDSScalerA(Scaler):
                     )
                     for sweep_information in self._sweep_information.values()
                 ]
-                results_list = easy_mp.parallel_map(
-                    run_one_sweep,
-                    args,
-                    params=None,
-                    processes=njob,
-                    method="threading",
-                    asynchronous=True,
-                    callback=None,
-                    preserve_order=True,
-                    preserve_exception_message=True,
-                )
+                if mp_params.type == "async":
+                    from xia2.Driver.AsyncDriver import run_concurrently
+
+                    # the pointless jobs share the CPU budget of the driver
+                    results_list = run_concurrently(
+                        [functools.partial(run_one_sweep, a) for a in args], njob
+                    )
+                else:
+                    results_list = easy_mp.parallel_map(
+                        run_one_sweep,
+                        args,
+                        params=None,
+                        processes=njob,
+                        method="threading",
+                        asynchronous=True,
+                        callback=None,
+                        preserve_order=True,
+                        preserve_exception_message=True,
+                    )
 
                 # restore drivertype
                 DriverFactory.set_driver_type(drivertype)
@@ -1299,34 +1311,22 @@ class XDSScalerA(Scaler):
 
     def get_batch_to_dose(self):
         batch_to_dose = {}
-        epoch_to_dose = {}
-        for xsample in self.get_scaler_xcrystal()._samples.values():
-            epoch_to_dose.update(xsample.get_epoch_to_dose())
+        dose_table = DoseTable.concatenate(
+            xsample.get_epoch_to_dose()
+            for xsample in self.get_scaler_xcrystal()._samples.values()
+        )
         for e0, si in self._sweep_information.items():
-            batch_offset = si["batch_offset"]
             frame_offset = si["integrater"].get_frame_offset()
-            printed = False
-            for b in range(si["batches"][0], si["batches"][1] + 1):
-                if epoch_to_dose:
-                    # see https://github.com/xia2/xia2/issues/90
-                    if (
-                        si["image_to_epoch"][b + frame_offset - batch_offset]
-                        in epoch_to_dose
-                    ):
-                        if not printed:
-                            logger.debug("Epoch found; all good")
-                            printed = True
-                        batch_to_dose[b] = epoch_to_dose[
-                            si["image_to_epoch"][b + frame_offset - batch_offset]
-                        ]
-                    else:
-                        if not printed:
-                            logger.debug("Epoch not found; using offset %f", e0)
-                            printed = True
-                        batch_to_dose[b] = epoch_to_dose[
-                            si["image_to_epoch"][b + frame_offset - batch_offset] - e0
-                        ]
-                else:
-                    # backwards compatibility 2015-12-11
-                    batch_to_dose[b] = b
+            batches = np.arange(si["batches"][0], si["batches"][1] + 1)
+            if len(dose_table):
+                doses = dose_table.dose_for_batches(
+                    batches,
+                    si["image_to_epoch"],
+                    batch_offset=si["batch_offset"] - frame_offset,
+                    epoch_offset=e0,
+                )
+            else:
+                # backwards compatibility 2015-12-11
+                doses = batches
+            batch_to_dose.update(zip(batches.tolist(), doses.tolist()))
         return batch_to_dose
@@ -2,6 +2,7 @@
 # functions...
 
 
+import contextlib
 import logging
 import os
 
@@ -10,6 +11,10 @@ from xia2.Wrappers.CCP4.Pointless import Pointless as _Pointless
 
 logger = logging.getLogger("xia2.Modules.Scaler.XDSScalerHelpers")
 
+# the buffer for each of the reflection files written when splitting XSCALE
+# output, which may be for many runs at once
+_buffer_size = 1 << 20
+
 
 class XDSScalerHelper:
     """A class which contains functions which will help the XDS Scaler
@@ -33,6 +38,17 @@ class XDSScalerHelper:
     def get_working_directory(self):
         return self._working_directory
 
+    @staticmethod
+    def _parse_input_file(line, file_map):
+        """Record the input reflection file for a set from a header line."""
+        if "ISET" in line and "INPUT_FILE" in line:
+            set = int(line.split()[2].strip())
+            input_file = line.split("=")[2].strip()
+
+            file_map[set] = input_file
+
+            logger.debug("Set %d is from data %s", set, input_file)
+
     @staticmethod
     def parse_xscale_ascii_header(xds_ascii_file):
         """Parse out the input reflection files which contributed to this
@@ -41,67 +57,77 @@ class XDSScalerHelper:
         file_map = {}
 
         with open(xds_ascii_file) as fh:
-            for line in fh.readlines():
+            for line in fh:
                 if not line[0] == "!":
                     break
 
-                if "ISET" in line and "INPUT_FILE" in line:
-                    set = int(line.split()[2].strip())
-                    input_file = line.split("=")[2].strip()
-
-                    file_map[set] = input_file
-
-                    logger.debug("Set %d is from data %s", set, input_file)
+                XDSScalerHelper._parse_input_file(line, file_map)
 
         return file_map
 
     def _split_xscale_ascii_file(self, xds_ascii_file, prefix):
         """Split the output of XSCALE to separate reflection files for
-        each run. The output files will be called ${prefix}${input_file}."""
-
-        file_map = self.parse_xscale_ascii_header(xds_ascii_file)
-        file_content = {k: [] for k in file_map}
-
-        # copy the header to all of the files
-        with open(xds_ascii_file) as fh:
-            for line in fh.readlines():
-                if not line[0] == "!":
-                    break
+        each run. The output files will be called ${prefix}${input_file}.
+        The file is read once, with each reflection written as it is read
+        to the file for its run, so the reflections are never all held in
+        memory."""
 
-                for k in file_map:
-                    if "ISET" in line and int(line.split("ISET=")[1].split()[0]) != k:
-                        continue
+        header = []
+        file_map = {}
 
-                    file_content[k].append(line)
+        with open(xds_ascii_file) as fh, contextlib.ExitStack() as stack:
+            writers = None
 
-        # next copy the appropriate reflections to each file
-        with open(xds_ascii_file) as fh:
-            for line in fh.readlines():
+            for line in fh:
                 if line[0] == "!":
+                    if writers is None:
+                        header.append(line)
+                        self._parse_input_file(line, file_map)
                     continue
 
+                if writers is None:
+                    writers = self._open_split_files(stack, header, file_map, prefix)
+
                 # FIXME this will not be correct if zero-dose correction
                 # has been used as this applies an additional record at
                 # the end... though it should always be #9
-                k = int(line.split()[9])
-                file_content[k].append(line)
+                writers[int(line.split(None, 10)[9])].write(line)
 
-        # then add the tailer
-        for k in file_map:
-            file_content[k].append("!END_OF_DATA\n")
+            if writers is None:
+                writers = self._open_split_files(stack, header, file_map, prefix)
 
-        # and finally actually write the files
-        for k in file_map:
-            with open(
-                os.path.join(
-                    self.get_working_directory(), "%s%s" % (prefix, file_map[k])
-                ),
-                "w",
-            ) as fh:
-                fh.write("".join(file_content[k]))
+            # then add the tailer
+            for writer in writers.values():
+                writer.write("!END_OF_DATA\n")
 
         return {filename: "%s%s" % (prefix, filename) for filename in file_map.values()}
 
+    def _open_split_files(self, stack, header, file_map, prefix):
+        """Open the output file for each run, registered with the ExitStack
+        stack, and copy the header to each: the header records for other
+        runs are omitted."""
+
+        writers = {}
+
+        for k in file_map:
+            writers[k] = stack.enter_context(
+                open(
+                    os.path.join(
+                        self.get_working_directory(), "%s%s" % (prefix, file_map[k])
+                    ),
+                    "w",
+                    buffering=_buffer_size,
+                )
+            )
+
+            for line in header:
+                if "ISET" in line and int(line.split("ISET=")[1].split()[0]) != k:
+                    continue
+
+                writers[k].write(line)
+
+        return writers
+
     def split_and_convert_xscale_output(
         self, input_file, prefix, project_info, scale_factor=1.0
     ):
@@ -133,7 +159,7 @@ class XDSScalerHelper:
 
     def limit_batches(self, input_file, output_file, start, end):
         with open(input_file) as infile, open(output_file, "w") as outfile:
-            for line in infile.readlines():
+            for line in infile:
                 if line.startswith("!"):
                     outfile.write(line)
                 else:
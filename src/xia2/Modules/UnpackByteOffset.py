@@ -1,38 +1,156 @@
+"""Encode and decode the CBF byte offset compression scheme.
+
+Each value is stored as the difference from the previous value (starting
+from zero) in the smallest of 1, 2, 4 or 8 little-endian signed bytes, a
+wider integer being flagged by the most negative value of the narrower one.
+pack_values() and unpack_values() work on whole arrays with numpy, only
+looping in Python over the (comparatively rare) escaped wide differences;
+the pure Python reference implementations are retained for comparison."""
+
 import struct
 
+import numpy as np
+
+# (escape bytes before the value, struct format, exclusive limit) for each
+# width of delta
+_widths = (
+    (b"", "<b", 127),
+    (b"\x80", "<h", 32767),
+    (b"\x80\x00\x80", "<i", 2147483647),
+    (b"\x80\x00\x80\x00\x00\x00\x80", "<q", None),
+)
+
 
 def pack_values(data):
+    """Compress a sequence of integers, returning bytes."""
+
+    values = np.asarray(data, dtype=np.int64).ravel()
+    deltas = values.copy()
+    deltas[1:] -= values[:-1]
+    magnitude = np.abs(deltas)
+
+    # write every delta as one byte, then replace the wide deltas with the
+    # escape byte and insert the rest of the escaped payload after it
+    packed = deltas.astype(np.int8).view(np.uint8)
+    wide = np.flatnonzero(magnitude >= _widths[0][2])
+    if not wide.size:
+        return packed.tobytes()
+    packed[wide] = 0x80
+
+    # index into _widths for each wide delta
+    width = np.ones(wide.size, dtype=np.intp)
+    for _, _, limit in _widths[1:-1]:
+        width += magnitude[wide] >= limit
+
+    positions = []
+    payloads = []
+    for j, (escape, fmt, _) in enumerate(_widths[1:], start=1):
+        selected = wide[width == j]
+        if not selected.size:
+            continue
+        dtype = np.dtype(fmt)
+        escape_bytes = np.frombuffer(escape[1:], dtype=np.uint8)
+        delta_bytes = deltas[selected].astype(dtype).view(np.uint8)
+        payload = np.concatenate(
+            (
+                np.broadcast_to(escape_bytes, (selected.size, escape_bytes.size)),
+                delta_bytes.reshape(selected.size, dtype.itemsize),
+            ),
+            axis=1,
+        )
+        positions.append(np.repeat(selected + 1, payload.shape[1]))
+        payloads.append(payload.ravel())
+
+    packed = np.insert(packed, np.concatenate(positions), np.concatenate(payloads))
+    return packed.tobytes()
+
+
+def unpack_values(data, length, dtype=np.int32):
+    """Decompress length values from the bytes-like object data, returning
+    a numpy array of dtype."""
+
+    raw = np.frombuffer(data, dtype=np.int8)
+
+    # every byte between escapes is a one byte delta, so only the escapes
+    # need to be handled one at a time; escape candidates which fall within
+    # the payload of a preceding escape are skipped
+    escapes = []
+    wide_deltas = []
+    payload_sizes = []
+    count = 0
+    ptr = 0
+
+    for escape in np.flatnonzero(raw == -128).tolist():
+        if escape < ptr:
+            continue
+        if count + escape - ptr >= length:
+            break
+        count += escape - ptr + 1
+
+        ptr = escape + 1
+        for _, fmt, limit in _widths[1:]:
+            try:
+                (delta,) = struct.unpack_from(fmt, data, ptr)
+            except struct.error:
+                raise ValueError("byte offset data truncated")
+            ptr += struct.calcsize(fmt)
+            if limit is None or delta != -limit - 1:
+                break
+        escapes.append(escape)
+        wide_deltas.append(delta)
+        payload_sizes.append(ptr - escape - 1)
+
+    end = ptr + length - count
+    if end > raw.size:
+        raise ValueError("byte offset data truncated")
+
+    deltas = raw[:end].astype(dtype)
+    if not escapes:
+        return np.cumsum(deltas, dtype=dtype)
+
+    # the escape byte itself stands in for the wide delta, the rest of the
+    # escaped payload is dropped
+    escapes = np.array(escapes)
+    payload_sizes = np.array(payload_sizes)
+    deltas[escapes] = np.array(wide_deltas, dtype=np.int64).astype(dtype)
+    is_delta = np.ones(end, dtype=bool)
+    for size in np.unique(payload_sizes):
+        starts = escapes[payload_sizes == size] + 1
+        is_delta[starts[:, None] + np.arange(size)] = False
+    return np.cumsum(deltas[is_delta], dtype=dtype)
+
+
+def _pack_values_python(data):
+    """Pure Python reference implementation of pack_values()."""
+
     current = 0
-    packed = ""
+    packed = []
 
     for d in data:
         delta = d - current
+        current = d
         if -127 < delta < 127:
-            packed += struct.pack("b", delta)
-            current = d
+            packed.append(struct.pack("b", delta))
             continue
 
-        packed += struct.pack("b", -128)
+        packed.append(struct.pack("b", -128))
         if -32767 < delta < 32767:
-            packed += struct.pack("<h", delta)
-            current = d
+            packed.append(struct.pack("<h", delta))
             continue
 
-        packed += struct.pack("<h", -32768)
+        packed.append(struct.pack("<h", -32768))
         if -2147483647 < delta < 2147483647:
-            packed += struct.pack("<i", delta)
-            current = d
+            packed.append(struct.pack("<i", delta))
             continue
 
-        packed += struct.pack("<i", -2147483648)
-        packed += struct.pack("<q", delta)
-        current = d
+        packed.append(struct.pack("<i", -2147483648))
+        packed.append(struct.pack("<q", delta))
 
-    return packed
+    return b"".join(packed)
 
 
-def unpack_values(data, length):
-    # unpack data stream
+def _unpack_values_python(data, length):
+    """Pure Python reference implementation of unpack_values()."""
 
     values = []
 
@@ -41,7 +159,7 @@ def unpack_values(data, length):
 
     while len(values) < length:
 
-        delta = struct.unpack("b", data[ptr])[0]
+        delta = struct.unpack_from("b", data, ptr)[0]
         ptr += 1
 
         if delta != -128:
@@ -49,7 +167,7 @@ def unpack_values(data, length):
             values.append(pixel)
             continue
 
-        delta = struct.unpack("<h", data[ptr : ptr + 2])[0]
+        delta = struct.unpack_from("<h", data, ptr)[0]
         ptr += 2
 
         if delta != -32768:
@@ -57,7 +175,7 @@ def unpack_values(data, length):
             values.append(pixel)
             continue
 
-        delta = struct.unpack("<i", data[ptr : ptr + 4])[0]
+        delta = struct.unpack_from("<i", data, ptr)[0]
         ptr += 4
 
         if delta != -2147483648:
@@ -65,7 +183,7 @@ def unpack_values(data, length):
             values.append(pixel)
             continue
 
-        delta = struct.unpack("<q", data[ptr : ptr + 8])[0]
+        delta = struct.unpack_from("<q", data, ptr)[0]
         ptr += 8
         pixel += delta
         values.append(pixel)
@@ -0,0 +1,120 @@
+"""A persistent, on-disk cache of the experiment lists read from image
+headers by xia2.Schema.load_imagesets, shared between xia2 processes and
+between runs.
+
+Each entry is keyed on the image template and every parameter affecting how
+the headers are interpreted, and is only used while the modification time
+and size of every image file it was read from are unchanged. The least
+recently used entries are removed once the cache exceeds its size limit.
+If the cache directory cannot be created, e.g. as the home directory is not
+writable, the store is disabled."""
+
+import hashlib
+import json
+import logging
+import os
+
+from xia2.Handlers.Environment import get_cache_directory
+
+logger = logging.getLogger("xia2.Schema.ImagesetStore")
+
+
+def file_signatures(filenames):
+    """Return the modification time and size of each file."""
+    signatures = []
+    for filename in filenames:
+        st = os.stat(filename)
+        signatures.append([filename, st.st_mtime_ns, st.st_size])
+    return signatures
+
+
+class ImagesetStore:
+    def __init__(self, directory=None, max_size=1024):
+        """Store entries in directory (by default imagesets within the xia2
+        cache directory), limited to max_size MB in total."""
+        self._max_size = max_size * 1024 * 1024
+        try:
+            if directory is None:
+                directory = os.path.join(get_cache_directory(), "imagesets")
+            os.makedirs(directory, exist_ok=True)
+        except OSError as e:
+            logger.debug("Imageset cache not available: %s" % str(e))
+            directory = None
+        self._directory = directory
+
+    def _filename(self, key):
+        digest = hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()
+        return os.path.join(self._directory, "%s.json" % digest)
+
+    @staticmethod
+    def _normalise(key):
+        # as the key will be after a round trip through json, e.g. tuples to lists
+        return json.loads(json.dumps(key))
+
+    def get(self, key, filenames):
+        """Return the serialised experiment list stored for key, or None if
+        there is none or any of the files have changed since it was stored."""
+        if self._directory is None:
+            return None
+        key = self._normalise(key)
+        filename = self._filename(key)
+        try:
+            with open(filename) as fh:
+                entry = json.load(fh)
+            if entry["key"] != key or entry["files"] != file_signatures(filenames):
+                return None
+            # mark as recently used
+            os.utime(filename)
+        except (OSError, ValueError, KeyError):
+            return None
+        logger.debug("Using cached imagesets for %s" % key["template"])
+        return entry["experiments"]
+
+    def put(self, key, filenames, experiments):
+        """Store the serialised experiment list for key, with the signatures
+        of the files it was read from."""
+        if self._directory is None:
+            return
+        key = self._normalise(key)
+        filename = self._filename(key)
+
+        # write atomically, as other xia2 processes may be reading the cache
+        tmp_filename = "%s.%d" % (filename, os.getpid())
+        try:
+            entry = {
+                "key": key,
+                "files": file_signatures(filenames),
+                "experiments": experiments,
+            }
+            with open(tmp_filename, "w") as fh:
+                json.dump(entry, fh)
+            os.replace(tmp_filename, filename)
+        except OSError as e:
+            logger.debug("Could not write imageset cache: %s" % str(e))
+            return
+        self.prune()
+
+    def prune(self):
+        """Remove the least recently used entries until the total size of
+        the cache is within the limit."""
+        if self._directory is None:
+            return
+        entries = []
+        for name in os.listdir(self._directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                st = os.stat(os.path.join(self._directory, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self._max_size:
+                break
+            try:
+                os.remove(os.path.join(self._directory, name))
+            except OSError:
+                pass
+            total -= size
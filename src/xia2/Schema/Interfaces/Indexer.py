@@ -43,11 +43,13 @@ import logging
 import os
 from functools import reduce
 
+import xia2.Driver.timing
 from cctbx.sgtbx import bravais_types
 from dxtbx.serialize.load import _decode_dict
 from xia2.Experts.LatticeExpert import SortLattices
 from xia2.Handlers.Phil import PhilIndex
 from xia2.Handlers.Streams import banner
+from xia2.Schema.Serialization import serializable_members
 
 logger = logging.getLogger("xia2.Schema.Interfaces.Indexer")
 
@@ -220,7 +222,7 @@ class Indexer:
         obj["__module__"] = self.__class__.__module__
         obj["__name__"] = self.__class__.__name__
 
-        attributes = inspect.getmembers(self, lambda m: not inspect.isroutine(m))
+        attributes = serializable_members(self)
         for a in attributes:
             if a[0] == "_indxr_helper" and a[1] is not None:
                 lattice_cell_dict = {}
@@ -418,15 +420,20 @@ class Indexer:
 
     def index(self):
 
-        if not self.get_indexer_finish_done():
-            f = inspect.currentframe().f_back.f_back
-            m = f.f_code.co_filename
-            l = f.f_lineno
+        if self.get_indexer_finish_done():
+            return
 
-            logger.debug(
-                "Index in %s called from %s %d" % (self.__class__.__name__, m, l)
-            )
+        f = inspect.currentframe().f_back.f_back
+        m = f.f_code.co_filename
+        l = f.f_lineno
+
+        logger.debug("Index in %s called from %s %d" % (self.__class__.__name__, m, l))
+
+        sweep_name = ", ".join(s.get_name() for s in self.get_indexer_sweeps())
+        with xia2.Driver.timing.record_stage("index", sweep=sweep_name or None):
+            self._index_until_finished()
 
+    def _index_until_finished(self):
         while not self.get_indexer_finish_done():
             while not self.get_indexer_done():
                 while not self.get_indexer_prepare_done():
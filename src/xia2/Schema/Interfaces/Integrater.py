@@ -29,12 +29,12 @@
 #     This is left to the implementation to sort out.
 
 
-import inspect
 import json
 import logging
 import math
 import os
 
+import xia2.Driver.timing
 import xia2.Schema.Interfaces.Indexer
 import xia2.Schema.Interfaces.Refiner
 
@@ -46,6 +46,7 @@ from xia2.Schema.Exceptions.BadLatticeError import BadLatticeError
 
 # interfaces that this inherits from ...
 from xia2.Schema.Interfaces.FrameProcessor import FrameProcessor
+from xia2.Schema.Serialization import serializable_members
 from dxtbx.serialize.load import _decode_dict
 
 logger = logging.getLogger("xia2.Schema.Interfaces.Integrater")
@@ -144,7 +145,7 @@ class Integrater(FrameProcessor):
         obj["__module__"] = self.__class__.__module__
         obj["__name__"] = self.__class__.__name__
 
-        attributes = inspect.getmembers(self, lambda m: not inspect.isroutine(m))
+        attributes = serializable_members(self)
         for a in attributes:
             if a[0] in ("_intgr_indexer", "_intgr_refiner") and a[1] is not None:
                 obj[a[0]] = a[1].to_dict()
@@ -507,6 +508,13 @@ class Integrater(FrameProcessor):
     def integrate(self):
         """Actually perform integration until we think we are done..."""
 
+        if self.get_integrater_finish_done():
+            return self._intgr_hklout
+
+        with xia2.Driver.timing.record_stage("integrate", sweep=self._intgr_sweep_name):
+            return self._integrate_until_finished()
+
+    def _integrate_until_finished(self):
         while not self.get_integrater_finish_done():
             while not self.get_integrater_done():
                 while not self.get_integrater_prepare_done():
@@ -3,7 +3,9 @@ import json
 import logging
 import os
 
+import xia2.Driver.timing
 from dxtbx.serialize.load import _decode_dict
+from xia2.Schema.Serialization import serializable_members
 
 logger = logging.getLogger("xia2.Schema.Interfaces.Refiner")
 
@@ -50,7 +52,7 @@ class Refiner:
         obj["__module__"] = self.__class__.__module__
         obj["__name__"] = self.__class__.__name__
 
-        attributes = inspect.getmembers(self, lambda m: not (inspect.isroutine(m)))
+        attributes = serializable_members(self)
         for a in attributes:
             if a[0] == "_refinr_indexers":
                 d = {}
@@ -217,18 +219,23 @@ class Refiner:
         if self._refinr_indexers == {}:
             raise RuntimeError("no Indexer implementations assigned for refinement")
 
-        while not self.get_refiner_finish_done():
-            while not self.get_refiner_done():
-                while not self.get_refiner_prepare_done():
+        if self.get_refiner_finish_done():
+            return self._refinr_result
 
-                    self._refinr_prepare_done = True
-                    self._refine_prepare()
+        sweep_name = ", ".join(s.get_name() for s in self._refinr_sweeps)
+        with xia2.Driver.timing.record_stage("refine", sweep=sweep_name or None):
+            while not self.get_refiner_finish_done():
+                while not self.get_refiner_done():
+                    while not self.get_refiner_prepare_done():
 
-                self._refinr_done = True
-                self._refinr_result = self._refine()
+                        self._refinr_prepare_done = True
+                        self._refine_prepare()
 
-            self._refinr_finish_done = True
-            self._refine_finish()
+                    self._refinr_done = True
+                    self._refinr_result = self._refine()
+
+                self._refinr_finish_done = True
+                self._refine_finish()
 
         return self._refinr_result
 
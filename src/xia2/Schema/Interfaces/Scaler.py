@@ -4,8 +4,10 @@ import logging
 import os
 import pathlib
 
+import xia2.Driver.timing
 from dxtbx.serialize.load import _decode_dict
 from xia2.Handlers.Streams import banner
+from xia2.Schema.Serialization import serializable_members
 
 logger = logging.getLogger("xia2.Schema.Interfaces.Scaler")
 
@@ -107,7 +109,7 @@ class Scaler:
         if self._base_path:
             obj["_base_path"] = self._base_path.__fspath__()
 
-        attributes = inspect.getmembers(self, lambda m: not inspect.isroutine(m))
+        attributes = serializable_members(self)
         for a in attributes:
             if a[0] == "_scalr_xcrystal":
                 # XXX I guess we probably want this?
@@ -344,6 +346,13 @@ class Scaler:
 
         self.scaler_reset()
 
+    def prepare_scaler_sweep(self, integrater):
+        """Called once the integration of a sweep is complete, to allow any
+        preparation for scaling depending only on this sweep to start while
+        other sweeps are still being integrated. By default nothing is done
+        here, the implementations may do the work in the background."""
+        pass
+
     def scale(self):
         """Actually perform the scaling - this is delegated to the
         implementation."""
@@ -353,22 +362,26 @@ class Scaler:
 
         xname = self._scalr_xcrystal.get_name()
 
-        while not self.get_scaler_finish_done():
-            while not self.get_scaler_done():
-                while not self.get_scaler_prepare_done():
+        if self.get_scaler_finish_done():
+            return self._scalr_result
+
+        with xia2.Driver.timing.record_stage("scale", crystal=xname):
+            while not self.get_scaler_finish_done():
+                while not self.get_scaler_done():
+                    while not self.get_scaler_prepare_done():
 
-                    logger.notice(banner("Preparing %s" % xname))
+                        logger.notice(banner("Preparing %s" % xname))
 
-                    self._scalr_prepare_done = True
-                    self._scale_prepare()
+                        self._scalr_prepare_done = True
+                        self._scale_prepare()
 
-                logger.notice(banner("Scaling %s" % xname))
+                    logger.notice(banner("Scaling %s" % xname))
 
-                self._scalr_done = True
-                self._scalr_result = self._scale()
+                    self._scalr_done = True
+                    self._scalr_result = self._scale()
 
-            self._scalr_finish_done = True
-            self._scale_finish()
+                self._scalr_finish_done = True
+                self._scale_finish()
 
         return self._scalr_result
 
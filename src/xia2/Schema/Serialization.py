@@ -0,0 +1,124 @@
+"""Serialization of the Schema objects - the projects, crystals, sweeps and
+so on, and the indexers, refiners, integraters and scalers which process
+them.
+
+The fields of each object are all of its attributes which are not methods,
+as inspect.getmembers() would find, but with the fields defined by each
+class found once and cached rather than inspecting every member of every
+object. The dictionaries given by the to_dict() methods may be encoded with
+dumps(), as msgpack if available or otherwise as JSON, along with the
+version of the schema, and decoded with loads()."""
+
+import inspect
+import json
+
+from dxtbx.serialize.load import _decode_list
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# the version of the encoding written by dumps(), to be increased whenever
+# a change to the objects means that older versions could not read it
+SCHEMA_VERSION = 1
+
+_class_fields = {}
+
+
+def _fields_of_class(cls):
+    fields = _class_fields.get(cls)
+    if fields is None:
+        fields = frozenset(
+            name
+            for name, value in inspect.getmembers(cls)
+            if not name.startswith("__") and not inspect.isroutine(value)
+        )
+        _class_fields[cls] = fields
+    return fields
+
+
+def serializable_members(obj):
+    """Return the name and value of each of the fields of obj, sorted by
+    name, as inspect.getmembers(obj, lambda m: not inspect.isroutine(m))
+    would less the special (double underscore) attributes."""
+    names = set(_fields_of_class(type(obj)))
+    names.update(name for name in vars(obj) if not name.startswith("__"))
+    members = []
+    for name in sorted(names):
+        value = getattr(obj, name)
+        if not inspect.isroutine(value):
+            members.append((name, value))
+    return members
+
+
+def decode_json_dict(data):
+    """An object_hook for json.loads() restoring the numeric keys of
+    dictionaries, which JSON stores as strings. json.loads() calls this for
+    every dictionary from the innermost outwards, so the values are already
+    decoded."""
+    rv = {}
+    for key, value in data.items():
+        if isinstance(value, list):
+            value = _decode_list(value)
+        # attribute names can never be numbers
+        if not key.startswith("_"):
+            try:
+                key = float(key)
+                if int(key) == key:
+                    key = int(key)
+            except ValueError:
+                pass
+        rv[key] = value
+    return rv
+
+
+def _hashable(key):
+    if isinstance(key, list):
+        return tuple(_hashable(k) for k in key)
+    return key
+
+
+def _decode_msgpack_pairs(pairs):
+    # msgpack keeps tuple keys, which JSON cannot, but as lists
+    return {_hashable(key): value for key, value in pairs}
+
+
+def default_encoding():
+    return "msgpack" if msgpack is not None else "json"
+
+
+def dumps(obj, encoding=None):
+    """Encode obj, e.g. from a to_dict() method, as bytes, either as msgpack
+    or JSON according to encoding, by default msgpack if it is available."""
+    if encoding is None:
+        encoding = default_encoding()
+    envelope = {"__xia2_schema__": SCHEMA_VERSION, "data": obj}
+    if encoding == "msgpack":
+        if msgpack is None:
+            raise ImportError("msgpack is not available")
+        return msgpack.packb(envelope, use_bin_type=True)
+    if encoding == "json":
+        return json.dumps(
+            envelope, skipkeys=True, separators=(",", ":"), ensure_ascii=True
+        ).encode()
+    raise ValueError("Unknown encoding %s" % encoding)
+
+
+def loads(data):
+    """Decode the bytes written by dumps()."""
+    if data[:1] == b"{":
+        envelope = json.loads(data, object_hook=decode_json_dict)
+    else:
+        if msgpack is None:
+            raise ImportError("msgpack is needed to read this data")
+        envelope = msgpack.unpackb(
+            data,
+            raw=False,
+            strict_map_key=False,
+            object_pairs_hook=_decode_msgpack_pairs,
+        )
+    version = envelope.get("__xia2_schema__")
+    if version is None or version > SCHEMA_VERSION:
+        raise ValueError("Unsupported serialization version %s" % version)
+    return envelope["data"]
@@ -1,5 +1,4 @@
 import collections
-import inspect
 import os
 
 from xia2.Handlers.CIF import CIF, mmCIF
@@ -9,6 +8,7 @@ from xia2.Handlers.Streams import banner
 from xia2.Handlers.Syminfo import Syminfo
 from xia2.lib.NMolLib import compute_nmol, compute_solvent
 from xia2.Modules.Scaler.ScalerFactory import Scaler
+from xia2.Schema.Serialization import serializable_members
 from dxtbx.util import format_float_with_standard_uncertainty
 
 
@@ -30,7 +30,7 @@ class _aa_sequence:
         obj = {}
         obj["__id__"] = "aa_sequence"
 
-        attributes = inspect.getmembers(self, lambda m: not inspect.isroutine(m))
+        attributes = serializable_members(self)
         for a in attributes:
             if a[0].startswith("__"):
                 continue
@@ -70,7 +70,7 @@ class _ha_info:
         obj = {}
         obj["__id__"] = "ha_info"
 
-        attributes = inspect.getmembers(self, lambda m: not (inspect.isroutine(m)))
+        attributes = serializable_members(self)
         for a in attributes:
             if a[0].startswith("__"):
                 continue
@@ -192,22 +192,24 @@ class XCrystal:
 
     # serialization functions
 
-    def to_dict(self):
+    def to_dict(self, include_stages=True):
+        """Return the crystal as a dictionary. If include_stages is False the
+        sweeps and scaler, i.e. the state of the processing, are left out."""
         obj = {"__id__": "XCrystal"}
 
-        attributes = inspect.getmembers(self, lambda m: not (inspect.isroutine(m)))
+        attributes = serializable_members(self)
         for a in attributes:
             if a[0] == "_scaler" and a[1] is not None:
-                obj[a[0]] = a[1].to_dict()
+                obj[a[0]] = a[1].to_dict() if include_stages else None
             elif a[0] == "_wavelengths":
                 wavs = {}
                 for wname, wav in a[1].items():
-                    wavs[wname] = wav.to_dict()
+                    wavs[wname] = wav.to_dict(include_stages=include_stages)
                 obj[a[0]] = wavs
             elif a[0] == "_samples":
                 samples = {}
                 for sname, sample in a[1].items():
-                    samples[sname] = sample.to_dict()
+                    samples[sname] = sample.to_dict(include_stages=include_stages)
                 obj[a[0]] = samples
             elif a[0] == "_project":
                 # don't serialize this since the parent xproject *should* contain
@@ -802,6 +804,13 @@ class XCrystal:
 
         return self._scaler
 
+    def prepare_scaler_sweep(self, xsweep):
+        """Tell the scaler that the integration of xsweep is complete, so
+        that the preparation of this sweep for scaling can start while any
+        other sweeps are integrated."""
+        if PhilIndex.params.xia2.settings.scale.pipeline_preparation:
+            self._get_scaler().prepare_scaler_sweep(xsweep._get_integrater())
+
     def serialize(self):
         scaler = self._get_scaler()
         if scaler.get_scaler_finish_done():
@@ -2,16 +2,15 @@
 # exactly correspond to the contents of the .xinfo file.
 
 
-import inspect
 import json
 import logging
 import os
 
 import pathlib
-from dxtbx.serialize.load import _decode_list
 from xia2.Handlers.Phil import PhilIndex
 from xia2.Handlers.Syminfo import Syminfo
 from xia2.Handlers.XInfo import XInfo
+from xia2.Schema.Serialization import decode_json_dict, serializable_members
 from xia2.Schema.XCrystal import XCrystal
 from xia2.Schema.XSample import XSample
 from xia2.Schema.XWavelength import XWavelength
@@ -33,13 +32,18 @@ class XProject:
 
     # serialization functions
 
-    def to_dict(self):
+    def to_dict(self, include_stages=True):
+        """Return the project as a dictionary. If include_stages is False the
+        sweeps and scalers, i.e. the state of the processing, are left out."""
         obj = {"__id__": "XProject"}
 
-        attributes = inspect.getmembers(self, lambda m: not inspect.isroutine(m))
+        attributes = serializable_members(self)
         for a in attributes:
             if a[0] == "_crystals":
-                crystals = {cname: cryst.to_dict() for cname, cryst in a[1].items()}
+                crystals = {
+                    cname: cryst.to_dict(include_stages=include_stages)
+                    for cname, cryst in a[1].items()
+                }
                 obj[a[0]] = crystals
             elif a[0].startswith("__"):
                 continue
@@ -86,23 +90,6 @@ class XProject:
 
     @classmethod
     def from_json(cls, filename=None, string=None):
-        def _decode_dict(data):
-            """ Decode a dict to str from unicode. """
-            rv = {}
-            for key, value in data.items():
-                if isinstance(value, list):
-                    value = _decode_list(value)
-                elif isinstance(value, dict):
-                    value = _decode_dict(value)
-                try:
-                    key = float(key)
-                    if int(key) == key:
-                        key = int(key)
-                except ValueError:
-                    pass
-                rv[key] = value
-            return rv
-
         assert [filename, string].count(None) == 1
         if filename:
             with open(filename, "rb") as f:
@@ -110,7 +97,7 @@ class XProject:
             base_path = os.path.dirname(filename)
         else:
             base_path = None
-        obj = json.loads(string, object_hook=_decode_dict)
+        obj = json.loads(string, object_hook=decode_json_dict)
         return cls.from_dict(obj, base_path=base_path)
 
     def get_output(self):
@@ -1,6 +1,5 @@
-import inspect
-
 from xia2.Modules.DoseAccumulate import accumulate_dose
+from xia2.Schema.Serialization import serializable_members
 
 
 class XSample:
@@ -36,16 +35,22 @@ class XSample:
 
     # serialization functions
 
-    def to_dict(self):
+    def to_dict(self, include_stages=True):
+        """Return the sample as a dictionary. If include_stages is False only
+        the names of the sweeps are included, which is all that from_dict()
+        needs."""
         obj = {}
         obj["__id__"] = "XSample"
 
-        attributes = inspect.getmembers(self, lambda m: not (inspect.isroutine(m)))
+        attributes = serializable_members(self)
         for a in attributes:
             if a[0] == "_sweeps":
                 sweeps = []
                 for sweep in a[1]:
-                    sweeps.append(sweep.to_dict())
+                    if include_stages:
+                        sweeps.append(sweep.to_dict())
+                    else:
+                        sweeps.append({"__id__": "XSweep", "_name": sweep.get_name()})
                 obj[a[0]] = sweeps
             elif a[0] == "_crystal":
                 # don't serialize this since the parent xsample *should* contain
@@ -52,7 +52,6 @@
 
 
 import copy
-import inspect
 import logging
 import math
 import os
@@ -69,6 +68,7 @@ from xia2.Handlers.Phil import PhilIndex
 from xia2.Modules.Indexer import IndexerFactory
 from xia2.Modules.Integrater import IntegraterFactory
 from xia2.Modules.Refiner import RefinerFactory
+from xia2.Schema.Serialization import serializable_members
 
 logger = logging.getLogger("xia2.Schema.XSweep")
 
@@ -337,7 +337,7 @@ class XSweep:
         obj = {}
         obj["__id__"] = "XSweep"
 
-        attributes = inspect.getmembers(self, lambda m: not (inspect.isroutine(m)))
+        attributes = serializable_members(self)
         for a in attributes:
             if a[0] in ("_indexer", "_refiner", "_integrater") and a[1] is not None:
                 obj[a[0]] = a[1].to_dict()
@@ -23,10 +23,10 @@
 #                 reduce the least damaged data first.
 
 
-import inspect
 import logging
 
 from xia2.Handlers.Phil import PhilIndex
+from xia2.Schema.Serialization import serializable_members
 from xia2.Schema.XSweep import XSweep
 
 logger = logging.getLogger("xia2.Schema.XWavelength")
@@ -59,14 +59,17 @@ class XWavelength:
 
     # serialization functions
 
-    def to_dict(self):
+    def to_dict(self, include_stages=True):
+        """Return the wavelength as a dictionary. If include_stages is False
+        the sweeps are left out."""
         obj = {"__id__": "XWavelength"}
-        attributes = inspect.getmembers(self, lambda m: not (inspect.isroutine(m)))
+        attributes = serializable_members(self)
         for a in attributes:
             if a[0] == "_sweeps":
                 sweeps = []
-                for sweep in a[1]:
-                    sweeps.append(sweep.to_dict())
+                if include_stages:
+                    for sweep in a[1]:
+                        sweeps.append(sweep.to_dict())
                 obj[a[0]] = sweeps
             elif a[0] == "_crystal":
                 # don't serialize this since the parent xwavelength *should* contain
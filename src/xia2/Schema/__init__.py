@@ -8,6 +8,7 @@ from dxtbx.model import ExperimentList
 from dxtbx.model.experiment_list import ExperimentListTemplateImporter
 from scitbx.array_family import flex
 from xia2.Handlers.Phil import PhilIndex
+from xia2.Schema.ImagesetStore import ImagesetStore
 
 
 logger = logging.getLogger("xia2.Schema")
@@ -57,23 +58,30 @@ def load_imagesets(
         from dxtbx.model.experiment_list import GoniometerComparison
 
         params = PhilIndex.params.xia2.settings
-        compare_beam = BeamComparison(
-            wavelength_tolerance=params.input.tolerance.beam.wavelength,
-            direction_tolerance=params.input.tolerance.beam.direction,
-            polarization_normal_tolerance=params.input.tolerance.beam.polarization_normal,
-            polarization_fraction_tolerance=params.input.tolerance.beam.polarization_fraction,
-        )
-        compare_detector = DetectorComparison(
-            fast_axis_tolerance=params.input.tolerance.detector.fast_axis,
-            slow_axis_tolerance=params.input.tolerance.detector.slow_axis,
-            origin_tolerance=params.input.tolerance.detector.origin,
-        )
-        compare_goniometer = GoniometerComparison(
-            rotation_axis_tolerance=params.input.tolerance.goniometer.rotation_axis,
-            fixed_rotation_tolerance=params.input.tolerance.goniometer.fixed_rotation,
-            setting_rotation_tolerance=params.input.tolerance.goniometer.setting_rotation,
-        )
-        scan_tolerance = params.input.tolerance.scan.oscillation
+        tolerance = params.input.tolerance
+        tolerances = {
+            "beam": {
+                "wavelength_tolerance": tolerance.beam.wavelength,
+                "direction_tolerance": tolerance.beam.direction,
+                "polarization_normal_tolerance": tolerance.beam.polarization_normal,
+                "polarization_fraction_tolerance": tolerance.beam.polarization_fraction,
+            },
+            "detector": {
+                "fast_axis_tolerance": tolerance.detector.fast_axis,
+                "slow_axis_tolerance": tolerance.detector.slow_axis,
+                "origin_tolerance": tolerance.detector.origin,
+            },
+            "goniometer": {
+                "rotation_axis_tolerance": tolerance.goniometer.rotation_axis,
+                "fixed_rotation_tolerance": tolerance.goniometer.fixed_rotation,
+                "setting_rotation_tolerance": tolerance.goniometer.setting_rotation,
+            },
+            "scan": tolerance.scan.oscillation,
+        }
+        compare_beam = BeamComparison(**tolerances["beam"])
+        compare_detector = DetectorComparison(**tolerances["detector"])
+        compare_goniometer = GoniometerComparison(**tolerances["goniometer"])
+        scan_tolerance = tolerances["scan"]
 
         # If diamond anvil cell data, always use dynamic shadowing
         high_pressure = PhilIndex.params.dials.high_pressure.correction
@@ -82,6 +90,14 @@ def load_imagesets(
             "multi_panel": params.input.format.multi_panel,
         }
 
+        from dxtbx.sequence_filenames import locate_files_matching_template_string
+        from xia2.Handlers.CommandLine import CommandLine
+
+        read_all_image_headers = (
+            PhilIndex.get_python_object().xia2.settings.read_all_image_headers
+        )
+        start_ends = None
+
         if os.path.splitext(full_template_path)[-1] in known_hdf5_extensions:
             # if we are passed the correct file, use this, else look for a master
             # file (i.e. something_master.h5)
@@ -105,33 +121,34 @@ def load_imagesets(
             if master_file is None:
                 raise RuntimeError("Can't find master file for %s" % full_template_path)
 
-            unhandled = []
-            experiments = ExperimentListFactory.from_filenames(
-                [master_file],
-                verbose=False,
-                unhandled=unhandled,
-                compare_beam=compare_beam,
-                compare_detector=compare_detector,
-                compare_goniometer=compare_goniometer,
-                scan_tolerance=scan_tolerance,
-                format_kwargs=format_kwargs,
-            )
-
-            assert len(unhandled) == 0, (
-                "unhandled image files identified: %s" % unhandled
-            )
+            paths = [master_file]
 
         else:
+            paths = sorted(locate_files_matching_template_string(full_template_path))
+            if not read_all_image_headers:
+                start_ends = CommandLine.get_start_ends(full_template_path)
+                if not start_ends:
+                    start_ends.append(None)
 
-            from dxtbx.sequence_filenames import locate_files_matching_template_string
+        # everything affecting the experiments read from the image headers
+        cache_key = {
+            "template": full_template_path,
+            "read_all_image_headers": read_all_image_headers,
+            "start_ends": start_ends,
+            "format_kwargs": format_kwargs,
+            "tolerances": tolerances,
+        }
 
-            params = PhilIndex.get_python_object()
-            read_all_image_headers = params.xia2.settings.read_all_image_headers
+        experiments = None
+        store = None
+        if params.imageset_cache:
+            store = ImagesetStore(max_size=params.imageset_cache_max_size)
+            cached = store.get(cache_key, paths)
+            if cached is not None:
+                experiments = ExperimentListFactory.from_dict(cached)
 
-            if read_all_image_headers:
-                paths = sorted(
-                    locate_files_matching_template_string(full_template_path)
-                )
+        if experiments is None:
+            if start_ends is None:
                 unhandled = []
                 experiments = ExperimentListFactory.from_filenames(
                     paths,
@@ -148,12 +165,7 @@ def load_imagesets(
                 )
 
             else:
-                from xia2.Handlers.CommandLine import CommandLine
-
                 experiments = ExperimentList()
-                start_ends = CommandLine.get_start_ends(full_template_path)
-                if not start_ends:
-                    start_ends.append(None)
                 for start_end in start_ends:
                     importer = ExperimentListTemplateImporter(
                         [full_template_path],
@@ -162,6 +174,9 @@ def load_imagesets(
                     )
                     experiments.extend(importer.experiments)
 
+            if store is not None:
+                store.put(cache_key, paths, experiments.to_dict())
+
         imagesets = [
             iset for iset in experiments.imagesets() if isinstance(iset, ImageSequence)
         ]
@@ -0,0 +1,53 @@
+import threading
+import time
+
+import pytest
+
+from xia2.Applications.xia2_helpers import SweepScheduler
+
+
+def test_sweep_scheduler_shares_cores_by_size():
+    lock = threading.Lock()
+    in_use = []
+
+    def run(job, nproc):
+        with lock:
+            in_use.append(nproc)
+            assert sum(in_use) <= 8
+        time.sleep(0.01 * job / nproc)
+        with lock:
+            in_use.remove(nproc)
+        return job, nproc
+
+    scheduler = SweepScheduler(total_cores=8, max_jobs=4)
+    results = scheduler.run(run, [10, 360, 20, 30], weights=[10, 360, 20, 30])
+
+    # results in the order of the jobs, the largest job started first with
+    # the largest share of the cores
+    assert [job for job, _ in results] == [10, 360, 20, 30]
+    assert results[1][1] == max(nproc for _, nproc in results)
+    assert results[1][1] > 1
+
+    statistics = scheduler.get_statistics()
+    assert 0 < statistics["utilisation"] <= 1
+    report = scheduler.report(names=["a", "b", "c", "d"])
+    assert len(report) == 5
+    assert report[-1].startswith("Core utilisation:")
+
+
+def test_sweep_scheduler_last_job_gets_free_cores():
+    scheduler = SweepScheduler(total_cores=8, max_jobs=8)
+    assert scheduler.allocate(1, 1, 6) == 6
+    assert scheduler.allocate(1, 10, 8) == 1
+    assert scheduler.allocate(5, 10, 8) == 4
+
+
+def test_sweep_scheduler_error():
+    def run(job, nproc):
+        if job == 2:
+            raise RuntimeError("sweep %d failed" % job)
+        return job
+
+    scheduler = SweepScheduler(total_cores=2, max_jobs=2)
+    with pytest.raises(RuntimeError, match="sweep 2 failed"):
+        scheduler.run(run, [1, 2, 3], weights=[1, 1, 1])
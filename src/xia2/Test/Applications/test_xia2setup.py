@@ -94,3 +94,70 @@ def test_write_xinfo_unroll(dials_data, tmpdir):
     assert x.get_crystals()["DEFAULT"]["sweeps"]["SWEEP1"]["start_end"] == [1, 15]
     assert x.get_crystals()["DEFAULT"]["sweeps"]["SWEEP2"]["start_end"] == [16, 30]
     assert x.get_crystals()["DEFAULT"]["sweeps"]["SWEEP3"]["start_end"] == [31, 45]
+
+
+def _touch_images(directory, prefix, n=3):
+    directory.mkdir(parents=True, exist_ok=True)
+    for i in range(1, n + 1):
+        directory.joinpath(f"{prefix}_{i:03d}.cbf").touch()
+
+
+def test_scan_directory_cache(tmp_path, monkeypatch):
+    from xia2.Applications import xia2setup
+
+    _touch_images(tmp_path / "data", "image")
+    tmp_path.joinpath("data", "sub").mkdir()
+    directory = str(tmp_path / "data")
+
+    cache = {}
+    subdirectories, templates, sequences = xia2setup._scan_directory(
+        directory, cache
+    )
+    assert subdirectories == [str(tmp_path / "data" / "sub")]
+    assert templates == {str(tmp_path / "data" / "image_###.cbf")}
+    assert sequences == []
+    assert cache[directory]["templates"] == sorted(templates)
+
+    # an unchanged directory is not searched again
+    monkeypatch.setattr(xia2setup, "_visit", None)
+    assert xia2setup._scan_directory(directory, cache)[1] == templates
+
+    # nor is the cache used once it has changed
+    monkeypatch.undo()
+    _touch_images(tmp_path / "data", "other")
+    assert xia2setup._scan_directory(directory, cache)[1] == templates | {
+        str(tmp_path / "data" / "other_###.cbf")
+    }
+
+
+def test_rummage_cache_unwritable(tmp_path, monkeypatch):
+    from xia2.Applications import xia2setup
+
+    # the cache directory cannot be created below a file
+    tmp_path.joinpath("file").touch()
+    monkeypatch.setenv("XIA2_CACHE_DIR", str(tmp_path / "file" / "cache"))
+    assert xia2setup._load_rummage_cache() == {}
+    xia2setup._save_rummage_cache({"directory": {"used": 0}})
+
+
+def test_rummage_sequence_in_directory_order(tmp_path, monkeypatch):
+    from xia2.Applications import xia2setup
+    from xia2.Handlers.Phil import PhilIndex
+
+    monkeypatch.setattr(PhilIndex.params.xia2.settings, "setup_cache", False)
+    monkeypatch.setattr(xia2setup, "_get_sweeps", lambda templates: templates)
+    # only the sequence files are of interest here
+    monkeypatch.setattr(xia2setup, "is_image_name", lambda filename: False)
+    for path, sequence in (
+        ("a/b/c.seq", "AAAA"),
+        ("a/d.seq", "CCCC"),
+        ("b/c/e.seq", "DDDD"),
+        ("b/a.seq", "EEEE"),
+    ):
+        tmp_path.joinpath(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path.joinpath(path).write_text(sequence + "\n")
+
+    for _ in range(5):
+        monkeypatch.setattr(xia2setup, "latest_sequence", None)
+        xia2setup._rummage([str(tmp_path)])
+        assert xia2setup.latest_sequence == "DDDD"
@@ -0,0 +1,85 @@
+import os
+
+from xia2.Handlers.Checkpoint import CheckpointStore
+
+
+class _Stage:
+    def __init__(self, name, state):
+        self._name = name
+        self.state = state
+
+    def get_name(self):
+        return self._name
+
+    def to_dict(self):
+        return {"_name": self._name, "_state": self.state}
+
+
+class _Wavelength:
+    def __init__(self, sweeps):
+        self._sweeps = sweeps
+
+    def get_sweeps(self):
+        return self._sweeps
+
+
+class _Crystal:
+    def __init__(self, wavelengths, scaler):
+        self._wavelengths = wavelengths
+        self._scaler = scaler
+
+    def get_wavelength_names(self):
+        return list(self._wavelengths)
+
+    def get_xwavelength(self, wavelength_id):
+        return self._wavelengths[wavelength_id]
+
+
+class _Project:
+    def __init__(self, crystals):
+        self._crystals = crystals
+
+    def get_crystals(self):
+        return self._crystals
+
+    def to_dict(self, include_stages=True):
+        return {
+            "_crystals": {
+                crystal_id: {
+                    "_wavelengths": {
+                        wavelength_id: {"_sweeps": []}
+                        for wavelength_id in crystal.get_wavelength_names()
+                    },
+                    "_scaler": None,
+                }
+                for crystal_id, crystal in self._crystals.items()
+            }
+        }
+
+
+def test_write_project_rewrites_changed_sweeps(tmp_path):
+    sweep = _Stage("SWEEP1", "integrated")
+    scaler = _Stage("scaler", "unscaled")
+    project = _Project({"X1": _Crystal({"NATIVE": _Wavelength([sweep])}, scaler)})
+
+    checkpoint = CheckpointStore(str(tmp_path / "xia2-checkpoint"))
+    assert not checkpoint.exists()
+    checkpoint.write_sweep("X1", "NATIVE", sweep)
+    checkpoint.write_project(project)
+    assert checkpoint.exists()
+
+    # e.g. the scaler reindexes the sweep after it was checkpointed
+    sweep.state = "reindexed"
+    scaler.state = "scaled"
+    checkpoint.write_project(project)
+
+    written = CheckpointStore(str(tmp_path / "xia2-checkpoint"))
+    sweep_file = os.path.join("sweeps", "X1", "NATIVE", "SWEEP1.state")
+    scaler_file = os.path.join("scalers", "X1.state")
+    crystal = written._read("project.state")["_crystals"]["X1"]
+    assert crystal["_wavelengths"]["NATIVE"]["_sweeps"] == [
+        {"__checkpoint__": sweep_file}
+    ]
+    assert crystal["_scaler"] == {"__checkpoint__": scaler_file}
+    assert written._read(sweep_file)["_state"] == "reindexed"
+    assert written._read(scaler_file)["_state"] == "scaled"
@@ -0,0 +1,60 @@
+import os
+import stat
+
+from xia2.Handlers.ProgramVersions import ProgramVersions
+
+
+def _write_program(path, version):
+    path.write_text(
+        "#!/bin/sh\n"
+        'echo run >> "%s"\n'
+        'echo "## PROGRAM version %s"\n' % (path.parent / "runs", version)
+    )
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+
+
+def _parse(banner):
+    return banner.split()[-1]
+
+
+def test_program_versions(tmp_path):
+    program = tmp_path / "program"
+    _write_program(program, "1.0")
+    directory = str(tmp_path / "registry")
+
+    registry = ProgramVersions(directory=directory)
+    assert registry.get_version(str(program), _parse) == "1.0"
+    assert registry.get_version(str(program), _parse) == "1.0"
+    assert registry.report() == ["%s: 1.0" % os.path.realpath(str(program))]
+
+    # a new registry, e.g. in another process, reads the version from disk
+    registry = ProgramVersions(directory=directory)
+    assert registry.get_output(str(program)).strip() == "## PROGRAM version 1.0"
+    assert (tmp_path / "runs").read_text().count("run") == 1
+
+    # the program is run again once it has changed
+    _write_program(program, "1.10")
+    assert registry.get_version(str(program), _parse) == "1.10"
+    assert (tmp_path / "runs").read_text().count("run") == 2
+
+
+def test_program_versions_without_registry(tmp_path):
+    program = tmp_path / "program"
+    _write_program(program, "1.0")
+    # the registry directory cannot be created below a file
+    (tmp_path / "file").write_text("")
+    directory = str(tmp_path / "file" / "registry")
+
+    registry = ProgramVersions(directory=directory)
+    assert registry.get_version(str(program), _parse) == "1.0"
+    assert registry.get_version(str(program), _parse) == "1.0"
+    assert (tmp_path / "runs").read_text().count("run") == 1
+    assert registry.report() == ["%s: 1.0" % os.path.realpath(str(program))]
+
+
+def test_program_versions_unwritable_cache(tmp_path, monkeypatch):
+    (tmp_path / "file").write_text("")
+    monkeypatch.setenv("XIA2_CACHE_DIR", str(tmp_path / "file" / "cache"))
+    program = tmp_path / "program"
+    _write_program(program, "1.0")
+    assert ProgramVersions().get_version(str(program), _parse) == "1.0"
@@ -3,12 +3,18 @@ import os
 import pytest
 import sys
 
+import numpy as np
 from iotbx.reflection_file_reader import any_reflection_file
 from dxtbx.model.experiment_list import ExperimentListTemplateImporter
 
 from xia2.Handlers.Phil import PhilIndex
 from xia2.Modules.Indexer.XDSIndexer import XDSIndexer
-from xia2.Modules.Integrater.XDSIntegrater import XDSIntegrater
+from xia2.Modules.Integrater.XDSIntegrater import (
+    XDSIntegrater,
+    integrate_hkl_to_reflection_table,
+    read_integrate_hkl,
+    write_filter_hkl,
+)
 from xia2.Modules.Refiner.XDSRefiner import XDSRefiner
 from xia2.Schema.XCrystal import XCrystal
 from xia2.Schema.XWavelength import XWavelength
@@ -122,3 +128,91 @@ def exercise_xds_integrater(dials_data, tmp_dir, nproc=None):
 def test_xds_integrater_serial(regression_test, ccp4, xds, dials_data, run_in_tmpdir):
     with mock.patch.object(sys, "argv", []):
         exercise_xds_integrater(dials_data, run_in_tmpdir.strpath, nproc=1)
+
+
+_integrate_hkl_header = """\
+!FORMAT=XDS_ASCII    MERGE=FALSE    FRIEDEL'S_LAW=TRUE
+!NUMBER_OF_ITEMS_IN_EACH_DATA_RECORD=21
+!ITEM_H=1
+!ITEM_ISEG=21
+!END_OF_HEADER
+"""
+
+# h, k, l, xcal, ycal, zcal, xobs, yobs, zobs, iseg
+_integrate_hkl_records = [
+    (1, 2, 3, 101.2, 202.3, 5.6, 101.0, 202.0, 5.5, 1),
+    (-4, 5, -6, 1650.4, 310.8, 12.2, 1651.0, 311.0, 12.0, 2),
+    (7, -8, 9, 2030.9, 1803.1, 27.9, 2031.0, 1803.0, 28.0, 2),
+]
+
+
+def _write_integrate_hkl(path, records):
+    lines = [_integrate_hkl_header]
+    for h, k, l, xcal, ycal, zcal, xobs, yobs, zobs, iseg in records:
+        lines.append(
+            "%6d%6d%6d 1.000E+03 3.000E+01%9.1f%9.1f%9.1f 0.05 100 50 200"
+            "%9.1f%9.1f%9.1f 0.0 0.0 0.0 0.0 0.0 %d\n"
+            % (h, k, l, xcal, ycal, zcal, xobs, yobs, zobs, iseg)
+        )
+    lines.append("!END_OF_DATA\n")
+    path.write_text("".join(lines))
+
+
+def _detector(offsets):
+    return [
+        mock.Mock(**{"get_raw_image_offset.return_value": offset})
+        for offset in offsets
+    ]
+
+
+def test_integrate_hkl_to_reflection_table(tmp_path):
+    integrate_hkl = tmp_path / "INTEGRATE.HKL"
+    _write_integrate_hkl(integrate_hkl, _integrate_hkl_records)
+    integrated = read_integrate_hkl(str(integrate_hkl))
+    assert list(integrated["panel"]) == [0, 1, 1]
+
+    reflections = integrate_hkl_to_reflection_table(
+        integrated, _detector([(0, 0), (1500, 200)])
+    )
+    assert len(reflections) == 3
+    assert list(reflections["panel"]) == [0, 1, 1]
+    assert list(reflections["miller_index"]) == [(1, 2, 3), (-4, 5, -6), (7, -8, 9)]
+    for ref, record in zip(reflections.rows(), _integrate_hkl_records):
+        ox, oy = (0, 0) if record[-1] == 1 else (1500, 200)
+        assert ref["xyzcal.px"] == pytest.approx(
+            (record[3] - ox, record[4] - oy, record[5])
+        )
+        assert ref["xyzobs.px.value"] == pytest.approx(
+            (record[6] - ox, record[7] - oy, record[8])
+        )
+
+
+def test_write_filter_hkl(tmp_path):
+    integrate_hkl = tmp_path / "INTEGRATE.HKL"
+    _write_integrate_hkl(integrate_hkl, _integrate_hkl_records)
+    integrated = read_integrate_hkl(str(integrate_hkl))
+    filter_hkl = tmp_path / "FILTER.HKL"
+    write_filter_hkl(str(filter_hkl), integrated, np.array([True, False, True]))
+
+    # as written by xia2 before, one reflection at a time
+    expected = [
+        "%i %i %i %.1f %.1f %.1f %.1f %.1f %.1f\n"
+        % (h, k, l, xcal, ycal, zcal, 2, 2, 2)
+        for h, k, l, xcal, ycal, zcal, *_ in (
+            _integrate_hkl_records[0],
+            _integrate_hkl_records[2],
+        )
+    ]
+    assert filter_hkl.read_text().splitlines(True) == expected
+
+
+def test_integrate_hkl_no_reflections(tmp_path):
+    integrate_hkl = tmp_path / "INTEGRATE.HKL"
+    _write_integrate_hkl(integrate_hkl, [])
+    integrated = read_integrate_hkl(str(integrate_hkl))
+    reflections = integrate_hkl_to_reflection_table(integrated, _detector([(0, 0)]))
+    assert len(reflections) == 0
+
+    filter_hkl = tmp_path / "FILTER.HKL"
+    write_filter_hkl(str(filter_hkl), integrated, np.zeros(0, dtype=bool))
+    assert filter_hkl.read_text() == ""
@@ -0,0 +1,105 @@
+import math
+import random
+
+import pytest
+
+from cctbx import crystal, miller
+from cctbx.array_family import flex
+from xia2.Modules.Scaler.CCP4ScalerHelpers import (
+    compute_resolution,
+    ersatz_resolution,
+    nint,
+)
+
+
+def reference_compute_resolution(dmax, dmin, d, isig):
+    # the original, per-reflection, implementation of compute_resolution
+    def meansd(values):
+        mean = sum(values) / len(values)
+        var = sum((v - mean) * (v - mean) for v in values) / len(values)
+        return mean, math.sqrt(var)
+
+    bins = {}
+
+    smax = 1.0 / (dmax * dmax)
+    smin = 1.0 / (dmin * dmin)
+
+    for j, dj in enumerate(d):
+        s = 1.0 / (dj * dj)
+        n = nint(100.0 * (s - smax) / (smin - smax))
+        bins.setdefault(n, []).append(isig[j])
+
+    max_misig = 0.0
+    max_bin = 0
+
+    for b in sorted(bins):
+        misig = meansd(bins[b])[0]
+
+        if misig > max_misig:
+            max_misig = misig
+            max_bin = b
+
+    for b in sorted(bins):
+        if b < max_bin:
+            continue
+
+        s = smax + b * (smin - smax) / 100.0
+        misig = meansd(bins[b])[0]
+        if misig < 1.0:
+            return 1.0 / math.sqrt(s)
+
+    return dmin
+
+
+def synthetic_intensities(seed):
+    ms = miller.build_set(
+        crystal_symmetry=crystal.symmetry(
+            unit_cell=(50, 60, 70, 90, 90, 90), space_group_symbol="P1"
+        ),
+        anomalous_flag=False,
+        d_min=1.8,
+    ).expand_to_p1()
+    random.seed(seed)
+    d = ms.d_spacings().data()
+    # I/sigma falling off with resolution, dropping below 1 at ~ 2.1 A
+    sigi = flex.double(ms.size(), 1.0)
+    i = flex.double(random.gauss(12.0 * (dj - 1.8) ** 2, 1.0) for dj in d)
+    batches = flex.double(random.randint(1, 90) for _ in range(ms.size()))
+    return ms, i, sigi, batches
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_compute_resolution(seed):
+    ms, i, sigi, _ = synthetic_intensities(seed)
+    d = ms.d_spacings().data()
+    dmax, dmin = ms.d_max_min()
+    isig = i / sigi
+    expected = reference_compute_resolution(dmax, dmin, d, isig)
+    assert compute_resolution(dmax, dmin, d, isig) == expected
+    assert dmin < expected < dmax
+
+
+def test_ersatz_resolution(tmpdir):
+    ms, i, sigi, batches = synthetic_intensities(0)
+    mtz_dataset = (
+        miller.array(ms, data=i, sigmas=sigi)
+        .set_observation_type_xray_intensity()
+        .as_mtz_dataset(column_root_label="I")
+    )
+    mtz_dataset.add_column("BATCH", "B").set_values(batches.as_float())
+    hklin = tmpdir.join("synthetic.mtz").strpath
+    mtz_dataset.mtz_object().write(hklin)
+
+    batch_ranges = [(1, 30), (31, 60), (61, 90), (20, 40)]
+    resolutions = ersatz_resolution(hklin, batch_ranges)
+    assert list(resolutions) == batch_ranges
+
+    dmax, dmin = ms.d_max_min()
+    d = ms.d_spacings().data()
+    isig = i.as_float() / sigi.as_float()
+    for start, end in batch_ranges:
+        sel = (batches >= start) & (batches <= end)
+        expected = reference_compute_resolution(
+            dmax, dmin, d.select(sel), isig.select(sel)
+        )
+        assert resolutions[(start, end)] == pytest.approx(expected)
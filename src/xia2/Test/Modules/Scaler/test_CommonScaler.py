@@ -0,0 +1,95 @@
+import concurrent.futures
+import threading
+import time
+from unittest import mock
+
+import pytest
+from libtbx import Auto
+
+from xia2.Handlers.Phil import PhilIndex
+from xia2.Modules.Scaler import CommonScaler as common_scaler
+from xia2.Modules.Scaler.CommonScaler import CommonScaler
+
+
+@pytest.fixture
+def scaler():
+    scaler = CommonScaler()
+    scaler._sweep_handler = mock.Mock()
+    scaler._sweep_handler.get_epochs.return_value = [10, 20, 30, 40]
+    return scaler
+
+
+@pytest.fixture
+def pool_sizes(monkeypatch):
+    sizes = []
+    executor = concurrent.futures.ThreadPoolExecutor
+
+    def thread_pool_executor(max_workers=None):
+        sizes.append(max_workers)
+        return executor(max_workers=max_workers)
+
+    monkeypatch.setattr(
+        common_scaler.concurrent.futures, "ThreadPoolExecutor", thread_pool_executor
+    )
+    return sizes
+
+
+@pytest.mark.parametrize("njob", [1, 2, 8])
+def test_prepare_sweeps_ordered_by_epoch(njob, scaler, pool_sizes, monkeypatch):
+    monkeypatch.setattr(PhilIndex.params.xia2.settings.scale, "prepare_njob", njob)
+
+    def prepare(epoch):
+        # the later epochs finish first
+        time.sleep(0.01 * (50 - epoch) / 10)
+        return epoch * 2, threading.get_ident()
+
+    results = scaler._prepare_sweeps(prepare)
+    assert list(results) == [10, 20, 30, 40]
+    assert [result for result, _ in results.values()] == [20, 40, 60, 80]
+    if njob == 1:
+        assert pool_sizes == []
+        assert {thread for _, thread in results.values()} == {threading.get_ident()}
+    else:
+        # no more threads than sweeps
+        assert pool_sizes == [min(njob, 4)]
+
+
+def test_prepare_sweeps_epochs(scaler, pool_sizes, monkeypatch):
+    monkeypatch.setattr(PhilIndex.params.xia2.settings.scale, "prepare_njob", 8)
+    assert scaler._prepare_sweeps(str, [30, 10]) == {30: "30", 10: "10"}
+    assert pool_sizes == [2]
+    assert scaler._prepare_sweeps(str, []) == {}
+
+
+@pytest.mark.parametrize("njob", [1, 4])
+def test_prepare_sweeps_first_failure_raised(njob, scaler, monkeypatch):
+    monkeypatch.setattr(PhilIndex.params.xia2.settings.scale, "prepare_njob", njob)
+    finished = []
+
+    def prepare(epoch):
+        if epoch == 20:
+            # fail after epoch 30 has failed
+            time.sleep(0.05 if njob > 1 else 0)
+            raise RuntimeError("epoch 20 failed")
+        if epoch == 30:
+            raise ValueError("epoch 30 failed")
+        finished.append(epoch)
+        return epoch
+
+    with pytest.raises(RuntimeError, match="epoch 20 failed"):
+        scaler._prepare_sweeps(prepare)
+    if njob > 1:
+        # every sweep was prepared before the failure was raised
+        assert sorted(finished) == [10, 40]
+    else:
+        assert finished == [10]
+
+
+def test_prepare_sweeps_njob_auto(scaler, pool_sizes, monkeypatch):
+    mp_params = PhilIndex.params.xia2.settings.multiprocessing
+    monkeypatch.setattr(PhilIndex.params.xia2.settings.scale, "prepare_njob", Auto)
+    monkeypatch.setattr(mp_params, "njob", 2)
+    monkeypatch.setattr(mp_params, "nproc", 3)
+    epochs = list(range(10))
+    assert list(scaler._prepare_sweeps(str, epochs)) == epochs
+    assert pool_sizes == [6]
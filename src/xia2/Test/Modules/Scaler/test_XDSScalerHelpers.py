@@ -0,0 +1,41 @@
+from xia2.Modules.Scaler.XDSScalerHelpers import XDSScalerHelper
+
+
+def test_split_xscale_ascii_file(tmpdir):
+    xscale_hkl = tmpdir.join("XSCALE.HKL")
+    header = ["!FORMAT=XDS_ASCII    MERGE=FALSE    FRIEDEL'S_LAW=TRUE\n"]
+    for k in (1, 2):
+        header.append("! ISET= %d INPUT_FILE=run%d.HKL\n" % (k, k))
+        header.append("! ISET= %d X-RAY_WAVELENGTH=  0.97950\n" % k)
+    header.append("!END_OF_HEADER\n")
+    reflections = {1: [], 2: []}
+    records = []
+    for n in range(10):
+        k = n % 3 % 2 + 1
+        record = " 1 2 %d 1.0E+02 1.0E+01 10.0 20.0 %.1f %d %d 1 0.50\n" % (
+            n,
+            n + 0.5,
+            k,
+            k,
+        )
+        reflections[k].append(record)
+        records.append(record)
+    xscale_hkl.write("".join(header + records + ["!END_OF_DATA\n"]))
+
+    xsh = XDSScalerHelper()
+    xsh.set_working_directory(tmpdir.strpath)
+    data_map = xsh._split_xscale_ascii_file(xscale_hkl.strpath, "SCALED_")
+    assert data_map == {"run1.HKL": "SCALED_run1.HKL", "run2.HKL": "SCALED_run2.HKL"}
+
+    for k in (1, 2):
+        lines = tmpdir.join("SCALED_run%d.HKL" % k).readlines()
+        assert lines[0] == header[0]
+        isets = [line for line in lines if "ISET" in line]
+        assert isets == header[2 * k - 1 : 2 * k + 1]
+        assert lines[4:] == reflections[k] + ["!END_OF_DATA\n"]
+
+    xsh.limit_batches(
+        tmpdir.join("SCALED_run1.HKL").strpath, tmpdir.join("limited.HKL").strpath, 2, 6
+    )
+    lines = tmpdir.join("limited.HKL").readlines()
+    assert lines[4:-1] == [r for r in reflections[1] if 2 <= float(r.split()[7]) < 6]
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from xia2.Modules import Benchmark
+from xia2.Modules.Benchmark import case_names, compare_results, run_case
+
+
+@pytest.mark.parametrize("name", ["byte_offset_python", "parse_integrate_lp"])
+def test_run_case(name, tmpdir):
+    assert name in case_names()
+    result = run_case(name, 0.05, tmpdir.strpath, rounds=2)
+    assert result["name"] == name
+    assert result["params"] == {"size": 0.05}
+    assert result["stats"]["rounds"] == 2
+    assert len(result["stats"]["data"]) == 2
+    assert result["stats"]["min"] <= result["stats"]["mean"]
+    json.dumps(result)
+
+    results = {"benchmarks": [result]}
+    reference = json.loads(json.dumps(results))
+    reference["benchmarks"][0]["stats"]["mean"] *= 2
+    ((case, reference_time, mean, ratio),) = compare_results(results, reference)
+    assert case == name
+    assert ratio == pytest.approx(0.5)
+
+
+@pytest.mark.parametrize("size", [0.001, 0.05, 1.0])
+def test_backstop_mask_case_scales(size, tmpdir):
+    pytest.importorskip("xia2.Toolkit.BackstopMask")
+    result = run_case("backstop_mask", size, tmpdir.strpath, rounds=1)
+    assert "error" not in result
+    assert result["stats"]["rounds"] == 1
+
+
+def test_run_case_failure(tmpdir, monkeypatch):
+    def failing_setup(size, working_directory, rng):
+        def run():
+            raise RuntimeError("intersection not found")
+
+        return run, {}
+
+    monkeypatch.setitem(Benchmark._cases, "failing", failing_setup)
+    result = run_case("failing", 0.05, tmpdir.strpath, rounds=1)
+    assert result == {
+        "name": "failing",
+        "params": {"size": 0.05},
+        "error": "intersection not found",
+    }
+    # failed cases are left out of the comparison
+    results = {"benchmarks": [result]}
+    assert compare_results(results, results) == []
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from cctbx import crystal, miller
+from cctbx.array_family import flex
+from xia2.Modules.DeltaCcHalf import DeltaCcHalf
+
+
+@pytest.fixture
+def intensities_and_batches():
+    cs = crystal.symmetry((50, 60, 70, 90, 90, 90), "P212121")
+    ms = miller.build_set(cs, anomalous_flag=False, d_min=3.0)
+    rng = np.random.default_rng(42)
+    true = rng.exponential(1000, ms.size())
+
+    intensities = []
+    batches = []
+    for k in range(4):
+        sel = rng.integers(0, ms.size(), 5000)
+        data = true[sel] + rng.normal(0, 100 + 0.1 * true[sel])
+        ma = miller.array(
+            miller.set(cs, ms.indices().select(flex.size_t(sel.tolist()))),
+            data=flex.double(data),
+            sigmas=flex.double(sel.size, 10),
+        ).set_observation_type_xray_intensity()
+        intensities.append(ma)
+        batches.append(
+            ma.customized_copy(
+                data=flex.int((100 * k + 1 + rng.integers(0, 50, sel.size)).tolist()),
+                sigmas=None,
+            )
+        )
+    return intensities, batches
+
+
+@pytest.mark.parametrize("group_size", [None, 10])
+def test_delta_cc_half_sigma_tau(intensities_and_batches, group_size):
+    intensities, batches = intensities_and_batches
+    result = DeltaCcHalf(intensities, batches, group_size=group_size)
+
+    # compare with merging all of the other observations from scratch
+    for (group_start, group_end), test_k, cc_half in zip(
+        result._group_to_batches, result._group_to_dataset_id, result.cc_half
+    ):
+        group_sel = (batches[test_k].data() >= group_start) & (
+            batches[test_k].data() <= group_end
+        )
+        unmerged = None
+        for k, ma in enumerate(intensities):
+            if k == test_k:
+                ma = ma.select(~group_sel)
+            if unmerged is None:
+                unmerged = ma
+            else:
+                unmerged = unmerged.concatenate(ma).set_observation_type(ma)
+        assert cc_half == pytest.approx(
+            result._compute_mean_weighted_cc_half(unmerged), abs=1e-10
+        )
+
+    pooled = DeltaCcHalf(intensities, batches, group_size=group_size, nproc=2)
+    assert list(pooled.cc_half) == pytest.approx(list(result.cc_half))
@@ -0,0 +1,68 @@
+import pytest
+
+from xia2.Modules.DoseAccumulate import DoseTable, accumulate_dose
+
+
+class _Scan:
+    def __init__(self, epochs, exposure_times):
+        self._epochs = epochs
+        self._exposure_times = exposure_times
+
+    def get_epochs(self):
+        return self._epochs
+
+    def get_exposure_times(self):
+        return self._exposure_times
+
+
+class _ImageSet:
+    def __init__(self, epochs, exposure_times):
+        self._scan = _Scan(epochs, exposure_times)
+
+    def get_scan(self):
+        return self._scan
+
+
+def test_accumulate_dose():
+    imagesets = [
+        _ImageSet([10.0, 10.1, 10.2], [0.1, 0.1, 0.1]),
+        _ImageSet([5.0, 5.5], [0.5, 0.5]),
+    ]
+    dose = accumulate_dose(imagesets)
+
+    # reference: sort by epoch and accumulate the exposure times in turn
+    expected = {}
+    total = 0.0
+    for e, t in sorted(zip([10.0, 10.1, 10.2, 5.0, 5.5], [0.1] * 3 + [0.5] * 2)):
+        expected[e] = total + 0.5 * t
+        total += t
+
+    assert list(dose) == list(expected)
+    assert dict(dose) == expected
+    assert list(dose.dose_for_epochs([10.1, 5.0])) == [expected[10.1], expected[5.0]]
+    assert 5.5 in dose and 6.0 not in dose
+    with pytest.raises(KeyError):
+        dose.dose_for_epochs([6.0])
+    assert list(dose.dose_for_epochs([6.0, 5.5], default=-1)) == [-1, expected[5.5]]
+
+
+def test_dose_for_batches():
+    dose = DoseTable([0.0, 1.0, 2.0, 3.0], [0.5, 1.5, 2.5, 3.5])
+    image_to_epoch = {1: 100.0, 2: 101.0, 3: 102.0, 4: 103.0}
+
+    # epochs relative to the start of the sweep at epoch 100
+    doses = dose.dose_for_batches(
+        [1001, 1002, 1004], image_to_epoch, batch_offset=1000, epoch_offset=100.0
+    )
+    assert list(doses) == [0.5, 1.5, 3.5]
+
+    with pytest.raises(KeyError):
+        dose.dose_for_batches([1005], image_to_epoch, batch_offset=1000)
+
+
+def test_concatenate():
+    a = DoseTable([1.0, 2.0], [10.0, 20.0])
+    b = DoseTable([0.0, 2.0], [0.0, 25.0])
+    combined = DoseTable.concatenate([a, b])
+    assert dict(combined) == {0.0: 0.0, 1.0: 10.0, 2.0: 25.0}
+    assert len(DoseTable.concatenate([])) == 0
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from xia2.Modules.UnpackByteOffset import (
+    _pack_values_python,
+    _unpack_values_python,
+    pack_values,
+    unpack_values,
+)
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        [],
+        [0, 1, 2, -1, -3],
+        [126, 0, 127, 0, -127, 0, -128, 32766, 32767, -32767, -32768],
+        [2 ** 31 - 1, -(2 ** 31), 0, 2 ** 40, -(2 ** 40), 5],
+    ],
+)
+def test_byte_offset_matches_python(values):
+    packed = pack_values(values)
+    assert packed == _pack_values_python(values)
+    assert list(unpack_values(packed, len(values), dtype=np.int64)) == values
+    assert _unpack_values_python(packed, len(values)) == values
+
+
+def test_byte_offset_round_trip_frame():
+    rng = np.random.default_rng(42)
+    frame = rng.poisson(3, size=(512, 487)).astype(np.int32)
+    frame[::7, ::11] = rng.integers(0, 2 ** 20, size=frame[::7, ::11].shape)
+    frame[:, 100] = -1
+    frame[200, :] = -2
+
+    # trailing data after the compressed values should be ignored
+    packed = pack_values(frame)
+    buffer = memoryview(packed + b"\x80\x80\x80--CIF-BINARY-FORMAT-SECTION--")
+    values = unpack_values(buffer, frame.size)
+    assert values.dtype == np.int32
+    assert np.array_equal(values.reshape(frame.shape), frame)
+
+    with pytest.raises(ValueError):
+        unpack_values(packed[:-10], frame.size)
+
+
+def test_byte_offset_matches_python_frame():
+    # the timings are compared by the byte_offset cases of xia2.benchmark
+    rng = np.random.default_rng(0)
+    frame = rng.poisson(3, size=(195, 487)).astype(np.int32)
+    frame[::5, ::13] = 100000
+
+    packed = _pack_values_python(frame.ravel().tolist())
+    values = _unpack_values_python(packed, frame.size)
+
+    numpy_packed = pack_values(frame)
+    numpy_values = unpack_values(numpy_packed, frame.size)
+
+    assert numpy_packed == packed
+    assert numpy_values.tolist() == values
@@ -0,0 +1,85 @@
+import os
+
+from xia2.Schema.ImagesetStore import ImagesetStore
+
+
+def _images(tmp_path, n=3):
+    filenames = []
+    for i in range(1, n + 1):
+        filename = tmp_path / ("image_%03d.cbf" % i)
+        filename.write_bytes(b"image %d" % i)
+        filenames.append(str(filename))
+    return filenames
+
+
+def _key(template):
+    return {"template": template, "reference_geometry": None, "image_range": (1, 3)}
+
+
+def test_get_put(tmp_path):
+    filenames = _images(tmp_path)
+    store = ImagesetStore(directory=str(tmp_path / "cache"))
+    assert store.get(_key("image_###.cbf"), filenames) is None
+
+    experiments = {"__id__": "ExperimentList", "experiment": [{"scan": 0}]}
+    store.put(_key("image_###.cbf"), filenames, experiments)
+    assert store.get(_key("image_###.cbf"), filenames) == experiments
+    assert store.get(_key("other_###.cbf"), filenames) is None
+
+    # a new store, e.g. in another process, finds the entry on disk
+    store = ImagesetStore(directory=str(tmp_path / "cache"))
+    assert store.get(_key("image_###.cbf"), filenames) == experiments
+
+
+def test_invalidation(tmp_path):
+    filenames = _images(tmp_path)
+    store = ImagesetStore(directory=str(tmp_path / "cache"))
+    store.put(_key("image_###.cbf"), filenames, {"experiment": []})
+    assert store.get(_key("image_###.cbf"), filenames) is not None
+
+    # a change in the modification time of any image
+    st = os.stat(filenames[1])
+    os.utime(filenames[1], ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    assert store.get(_key("image_###.cbf"), filenames) is None
+
+    # or in its size
+    store.put(_key("image_###.cbf"), filenames, {"experiment": []})
+    st = os.stat(filenames[2])
+    with open(filenames[2], "ab") as fh:
+        fh.write(b"more")
+    os.utime(filenames[2], ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert store.get(_key("image_###.cbf"), filenames) is None
+
+
+def test_prune(tmp_path):
+    filenames = _images(tmp_path)
+    directory = tmp_path / "cache"
+    store = ImagesetStore(directory=str(directory))
+    templates = ["a_###.cbf", "b_###.cbf", "c_###.cbf"]
+    for i, template in enumerate(templates):
+        store.put(_key(template), filenames, {"experiment": []})
+        # with the oldest used least recently
+        for entry in directory.iterdir():
+            if entry.stat().st_mtime > 1000 * (i + 1):
+                os.utime(entry, (1000 * (i + 1), 1000 * (i + 1)))
+    sizes = [entry.stat().st_size for entry in directory.iterdir()]
+    assert len(sizes) == 3
+
+    # room for two of the entries
+    store = ImagesetStore(directory=str(directory), max_size=sum(sizes[:2]) / 2 ** 20)
+    store.prune()
+    assert len(list(directory.iterdir())) == 2
+    assert store.get(_key("a_###.cbf"), filenames) is None
+    assert store.get(_key("b_###.cbf"), filenames) is not None
+    assert store.get(_key("c_###.cbf"), filenames) is not None
+
+
+def test_unwritable_cache(tmp_path, monkeypatch):
+    filenames = _images(tmp_path)
+    # the cache directory cannot be created below a file
+    (tmp_path / "file").write_text("")
+    monkeypatch.setenv("XIA2_CACHE_DIR", str(tmp_path / "file" / "cache"))
+    store = ImagesetStore()
+    store.put(_key("image_###.cbf"), filenames, {"experiment": []})
+    assert store.get(_key("image_###.cbf"), filenames) is None
+    store.prune()
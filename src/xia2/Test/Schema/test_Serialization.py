@@ -0,0 +1,55 @@
+import inspect
+
+import pytest
+
+from xia2.Schema import Serialization
+from xia2.Schema.Serialization import dumps, loads, serializable_members
+
+
+class _Base:
+    _shared = 1
+    cell = property(lambda self: (1.0, 2.0, 3.0))
+
+    def method(self):
+        pass
+
+
+class _Derived(_Base):
+    _extra = None
+
+    def __init__(self):
+        self._name = "SWEEP1"
+        self._mangled = 2
+        self.__private = 3
+        self._callback = len
+
+
+def test_serializable_members():
+    obj = _Derived()
+    expected = [
+        m
+        for m in inspect.getmembers(obj, lambda m: not inspect.isroutine(m))
+        if not m[0].startswith("__")
+    ]
+    assert serializable_members(obj) == expected
+    # attributes added after the class has been seen are picked up too
+    obj._late = 4
+    assert ("_late", 4) in serializable_members(obj)
+
+
+@pytest.mark.parametrize("encoding", ["json", "msgpack"])
+def test_dumps_loads(encoding):
+    if encoding == "msgpack":
+        pytest.importorskip("msgpack")
+    obj = {"__id__": "XSweep", "_name": "SWEEP1", 1: [1.0, None], "_frames": {}}
+    data = dumps(obj, encoding=encoding)
+    assert isinstance(data, bytes)
+    assert loads(data) == obj
+
+
+def test_loads_newer_version(monkeypatch):
+    monkeypatch.setattr(Serialization, "SCHEMA_VERSION", 2)
+    data = dumps({"_name": "SWEEP1"}, encoding="json")
+    monkeypatch.setattr(Serialization, "SCHEMA_VERSION", 1)
+    with pytest.raises(ValueError):
+        loads(data)
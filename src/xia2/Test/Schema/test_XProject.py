@@ -130,6 +130,33 @@ def exercise_serialization(dials_data, tmp_dir):
     print(xproj.get_output())
     print("\n".join(xproj.summarise()))
 
+    # Test that we can checkpoint each sweep and scaler separately and back
+    from xia2.Handlers.Checkpoint import CheckpointStore
+
+    checkpoint = CheckpointStore(os.path.join(tmp_dir, "xia2-checkpoint"))
+    assert not checkpoint.exists()
+    checkpoint.write_project(xproj)
+    assert checkpoint.exists()
+    sweep_state = os.path.join("sweeps", "CRYST1", "WAVE1", "SWEEP1.state")
+    assert os.path.exists(os.path.join(tmp_dir, "xia2-checkpoint", sweep_state))
+    xcryst = list(xproj.get_crystals().values())[0]
+    xsweep = xcryst.get_xwavelength("WAVE1").get_sweeps()[0]
+    checkpoint.write_sweep("CRYST1", "WAVE1", xsweep)
+    checkpoint.write_scaler("CRYST1", xcryst)
+
+    restored = CheckpointStore(os.path.join(tmp_dir, "xia2-checkpoint")).load_project()
+    assert restored.path == base_path
+    assert json.loads(restored.as_json()) == json.loads(xproj.as_json())
+    xcryst = list(restored.get_crystals().values())[0]
+    assert xcryst.get_project() is restored
+    assert xcryst._get_integraters()[0].get_integrater_finish_done()
+
+    restored = checkpoint.load_project(include_scalers=False)
+    assert list(restored.get_crystals().values())[0]._scaler is None
+
+    checkpoint.clear()
+    assert not checkpoint.exists()
+
 
 def test_serialization(regression_test, ccp4, dials_data, run_in_tmpdir):
     with mock.patch.object(sys, "argv", []):
@@ -0,0 +1,108 @@
+import os
+
+import numpy as np
+import pytest
+
+from xia2.Modules.UnpackByteOffset import pack_values, unpack_values
+from xia2.Toolkit import BackstopMask as backstop
+from xia2.Toolkit.BackstopMask import BackstopMask, rectangle
+
+
+@pytest.fixture
+def site_file(tmp_path):
+    # a backstop arm from the left edge to just short of the centre of a
+    # 40 x 30 detector, widening with distance
+    site_file = tmp_path / "backstop.site"
+    site_file.write_text(
+        "100.0 0 13.0 20.0 13.5 20.0 16.5 0 17.0\n"
+        "200.0 0 11.0 20.0 12.0 20.0 18.0 0 19.0\n"
+        "300.0 0 9.0 20.0 10.5 20.0 19.5 0 21.0\n"
+    )
+    return str(site_file)
+
+
+@pytest.mark.parametrize(
+    "points",
+    [
+        ((0.0, 11.0), (20.0, 12.0), (20.0, 18.0), (0.0, 19.0)),
+        ((2.3, 4.7), (17.2, 1.1), (25.9, 20.4), (6.1, 27.6)),
+        ((-5.0, -3.0), (12.5, -1.0), (13.5, 9.5), (-4.0, 8.0)),
+    ],
+)
+def test_mask_indices_matches_is_inside(points):
+    nx, ny = 30, 24
+    r = rectangle(*points)
+    expected = [
+        y * nx + x
+        for y in range(ny)
+        for x in range(nx)
+        if r.is_inside((x + 0.5, y + 0.5))
+    ]
+    assert expected
+    assert list(r.mask_indices(nx, ny)) == expected
+
+
+def test_mask_indices_outside_image():
+    r = rectangle((50.0, 50.0), (60.0, 50.0), (60.0, 60.0), (50.0, 60.0))
+    assert r.mask_indices(30, 24).size == 0
+
+
+def test_mask_indices_cached(site_file, monkeypatch):
+    monkeypatch.setattr(backstop, "_mask_cache", {})
+    header = {"distance": 200.0, "size": (40, 30)}
+    indices = BackstopMask(site_file).mask_indices(header)
+    # a new BackstopMask for the same site file shares the cached mask
+    assert BackstopMask(site_file).mask_indices(header) is indices
+    assert (
+        BackstopMask(site_file).mask_indices({"distance": 300.0, "size": (40, 30)})
+        is not indices
+    )
+    expected = BackstopMask(site_file).rectangle(header).mask_indices(40, 30)
+    assert np.array_equal(indices, expected)
+
+
+def test_mask_indices_site_file_edited(site_file, monkeypatch):
+    monkeypatch.setattr(backstop, "_mask_cache", {})
+    header = {"distance": 200.0, "size": (40, 30)}
+    indices = BackstopMask(site_file).mask_indices(header)
+
+    # a narrower backstop, written as if some time later
+    with open(site_file, "w") as fh:
+        fh.write(
+            "100.0 0 14.0 20.0 14.5 20.0 15.5 0 16.0\n"
+            "300.0 0 13.0 20.0 13.5 20.0 16.5 0 17.0\n"
+        )
+    stat = os.stat(site_file)
+    os.utime(site_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    edited = BackstopMask(site_file).mask_indices(header)
+    assert 0 < edited.size < indices.size
+    assert set(edited) < set(indices)
+
+
+def test_apply_mask_xds(site_file, tmp_path):
+    nx, ny = 40, 30
+    frame = np.arange(nx * ny, dtype=np.int32) % 97
+    cbf_header = (
+        "###CBF: VERSION 1.5\r\n"
+        "X-Binary-Size-Fastest-Dimension: %d\r\n"
+        "X-Binary-Size-Second-Dimension: %d\r\n"
+        "X-Binary-Number-of-Elements: %d\r\n\r\n" % (nx, ny, nx * ny)
+    ).encode()
+    start_tag = bytes.fromhex("0c1a04d5")
+    cbf_in = tmp_path / "BKGINIT.cbf"
+    cbf_out = tmp_path / "BKGINIT_masked.cbf"
+    cbf_in.write_bytes(cbf_header + start_tag + pack_values(frame))
+
+    mask = BackstopMask(site_file)
+    header = {"distance": 200.0, "size": (nx, ny)}
+    mask.apply_mask_xds(header, str(cbf_in), str(cbf_out))
+
+    data = cbf_out.read_bytes()
+    assert data.startswith(cbf_header + start_tag)
+    values = unpack_values(memoryview(data)[len(cbf_header) + 4 :], nx * ny)
+    indices = mask.mask_indices(header)
+    assert indices.size
+    expected = frame.copy()
+    expected[indices] = -3
+    assert np.array_equal(values, expected)
@@ -298,3 +298,60 @@ def test_data_manager_filter_dose_out_of_range(protk_experiments_and_reflections
     assert len(data_manager.experiments) < len(experiments)
     for expt in data_manager.experiments:
         assert expt.scan.get_image_range() == (12, 25)
+
+
+def test_data_manager_copy_selection(protk_experiments_and_reflections):
+    experiments, reflections = protk_experiments_and_reflections
+    data_manager = ScaleAndMerge.DataManager(experiments, reflections)
+    n_reflections = data_manager.reflections.size()
+    identifiers = [expt.identifier for expt in data_manager.experiments]
+    selected = identifiers[2:5]
+
+    copied = data_manager.copy_selection(selected)
+    assert [expt.identifier for expt in copied.experiments] == selected
+    assert set(copied.reflections["id"]) == {0, 1, 2}
+    assert dict(copied.reflections.experiment_identifiers()) == dict(
+        enumerate(selected)
+    )
+    # the batch offsets are those of the whole data set
+    for expt in copied.experiments:
+        original = data_manager.experiments[identifiers.index(expt.identifier)]
+        assert expt.scan.get_batch_offset() == original.scan.get_batch_offset()
+        assert expt is not original
+
+    # and the original is unchanged by changes to the copy
+    copied.experiments[0].scan.set_batch_offset(12345)
+    copied.ids_to_identifiers_map.clear()
+    assert len(data_manager.experiments) == 8
+    assert data_manager.reflections.size() == n_reflections
+    assert data_manager.experiments[2].scan.get_batch_offset() != 12345
+    assert len(data_manager.ids_to_identifiers_map) == 8
+
+
+def test_proteinase_k_cluster_njob(regression_test, dials_data, tmpdir):
+    data_dir = dials_data("multi_crystal_proteinase_k")
+    expts = sorted(f.strpath for f in data_dir.listdir("experiments*.json"))
+    refls = sorted(f.strpath for f in data_dir.listdir("reflections*.pickle"))
+    with tmpdir.as_cwd():
+        run_multiplex(expts + refls + ["max_clusters=2", "cluster_njob=2", "nproc=1"])
+
+    for f in expected_data_files:
+        assert tmpdir.join(f).check(file=1), "expected file %s missing" % f
+
+    # the clusters scaled in separate processes are reported in cluster order
+    with tmpdir.join("xia2.multiplex.json").open("r") as fh:
+        d = json.load(fh)
+        assert list(d["datasets"].keys()) == ["All data", "cluster 6", "cluster 5"]
+    for cluster in ("cluster_5", "cluster_6"):
+        assert tmpdir.join(cluster).check(dir=1)
+        for f in ("scaled.mtz", "scaled_unmerged.mtz", "scaled.expt", "scaled.refl"):
+            assert tmpdir.join(cluster, f).check(file=1)
+        # each cluster was scaled in its own directory
+        assert tmpdir.join(cluster).listdir("*_dials.scale.log")
+
+    # Delete large temporary files to conserve disk space
+    for f in tmpdir.listdir("*.refl"):
+        f.remove()
+    for cluster in ("cluster_5", "cluster_6"):
+        for f in tmpdir.join(cluster).listdir("*.refl"):
+            f.remove()
@@ -18,11 +18,18 @@ and Mosflm."""
 import binascii
 import logging
 import math
+import os
+
+import numpy as np
 
 from xia2.Modules.UnpackByteOffset import pack_values, unpack_values
 
 logger = logging.getLogger("xia2.Toolkit.BackstopMask")
 
+# the mask indices for each version of a site file, distance and image size
+# - a new BackstopMask is made for every image to be masked, so keep these here
+_mask_cache = {}
+
 
 def mmcc(ds, xs, ys):
     """Fit a straight line
@@ -34,26 +41,20 @@ def mmcc(ds, xs, ys):
     assert len(ds) == len(xs)
     assert len(ds) == len(ys)
 
-    ds = [float(i) for i in ds]
-    xs = [float(i) for i in xs]
-    ys = [float(i) for i in ys]
-
-    _d = sum(ds) / len(ds)
-    _x = sum(xs) / len(xs)
-    _y = sum(ys) / len(ys)
+    ds = np.asarray(ds, dtype=float)
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
 
-    mx = sum((d - _d) * (x - _x) for d, x in zip(ds, xs)) / sum(
-        (d - _d) * (d - _d) for d in ds
-    )
+    dd = ds - ds.mean()
+    sdd = np.dot(dd, dd)
 
-    my = sum((d - _d) * (y - _y) for d, y in zip(ds, ys)) / sum(
-        (d - _d) * (d - _d) for d in ds
-    )
+    mx = np.dot(dd, xs - xs.mean()) / sdd
+    my = np.dot(dd, ys - ys.mean()) / sdd
 
-    cx = _x - mx * _d
-    cy = _y - my * _d
+    cx = xs.mean() - mx * ds.mean()
+    cy = ys.mean() - my * ds.mean()
 
-    return mx, my, cx, cy
+    return float(mx), float(my), float(cx), float(cy)
 
 
 def compute_fit(distances, coordinates):
@@ -177,6 +178,9 @@ class BackstopMask:
         origins and directions for positions 2 and 3, and directions for
         the vectors 2 -> 1 and 3 -> 4."""
 
+        # the version of the site file read, as the key for the cached masks
+        self._site_file = (os.path.abspath(site_file), os.stat(site_file).st_mtime_ns)
+
         # first read out the file
 
         distances = []
@@ -229,54 +233,23 @@ class BackstopMask:
 
         return p1, p2, p3, p4
 
+    def mask_indices(self, header):
+        """Return the indices into the flattened image of the pixels behind
+        the backstop. These depend only on the distance and image size, so
+        are cached."""
+
+        key = self._site_file + (header["distance"], tuple(header["size"]))
+        if key not in _mask_cache:
+            nx, ny = header["size"]
+            _mask_cache[key] = self.rectangle(header).mask_indices(int(nx), int(ny))
+        return _mask_cache[key]
+
     def apply_mask_xds(self, header, cbf_in, cbf_out):
         """Apply the calculated backstop mask to a BKGINIT.cbf - do this
         immediately after the INIT step."""
 
-        r = self.rectangle(header)
-
-        data = open(cbf_in, "rb").read()
-
-        start_tag = binascii.unhexlify("0c1a04d5")
-
-        data_offset = data.find(start_tag) + 4
-
-        cbf_header = data[: data.find(start_tag)]
-
-        fast = 0
-        slow = 0
-        length = 0
-
-        for record in cbf_header.split("\n"):
-            if "X-Binary-Size-Fastest-Dimension" in record:
-                fast = int(record.split()[-1])
-            elif "X-Binary-Size-Second-Dimension" in record:
-                slow = int(record.split()[-1])
-            elif "X-Binary-Number-of-Elements" in record:
-                length = int(record.split()[-1])
-
-        assert length == fast * slow
-        assert fast == int(header["size"][0])
-        assert slow == int(header["size"][1])
-
-        values = unpack_values(data[data_offset:], length)
-
-        # or perhaps mask it out a little more cleverly
-
-        limits = r.limits()
-
-        for x in range(int(limits[0]), int(limits[1]) + 1):
-            for y in range(int(limits[2]), int(limits[3]) + 1):
-                j = y * fast + x
-                if r.is_inside((x + 0.5, y + 0.5)):
-                    values[j] = -3
-
-        # and write out the updated file
-
-        result = cbf_header + start_tag + pack_values(values)
-
-        with open(cbf_out, "w") as fh:
-            fh.write(result)
+        nx, ny = header["size"]
+        mask_cbf(cbf_in, cbf_out, int(nx), int(ny), self.mask_indices(header))
 
     def rectangle(self, header):
         """Return a configured rectangle object to test whether pixels are
@@ -299,6 +272,47 @@ class BackstopMask:
         return rectangle(p1, p2, p3, p4)
 
 
+def mask_cbf(cbf_in, cbf_out, nx, ny, indices):
+    """Read a byte offset compressed CBF image, set the pixels at the given
+    indices into the flattened image to -3 and write the result to
+    cbf_out."""
+
+    with open(cbf_in, "rb") as fh:
+        data = fh.read()
+
+    start_tag = binascii.unhexlify("0c1a04d5")
+
+    data_offset = data.find(start_tag) + 4
+
+    cbf_header = data[: data.find(start_tag)]
+
+    fast = 0
+    slow = 0
+    length = 0
+
+    for record in cbf_header.decode("latin-1").split("\n"):
+        if "X-Binary-Size-Fastest-Dimension" in record:
+            fast = int(record.split()[-1])
+        elif "X-Binary-Size-Second-Dimension" in record:
+            slow = int(record.split()[-1])
+        elif "X-Binary-Number-of-Elements" in record:
+            length = int(record.split()[-1])
+
+    assert length == fast * slow
+    assert fast == nx
+    assert slow == ny
+
+    values = unpack_values(memoryview(data)[data_offset:], length)
+    values[indices] = -3
+
+    # and write out the updated file
+
+    result = cbf_header + start_tag + pack_values(values)
+
+    with open(cbf_out, "wb") as fh:
+        fh.write(result)
+
+
 class rectangle:
     """A class to represent a rectange."""
 
@@ -332,6 +346,30 @@ class rectangle:
 
         return min(xs), max(xs), min(ys), max(ys)
 
+    def mask_indices(self, nx, ny):
+        """Return the indices into a flattened nx by ny image of the pixels
+        whose centres are inside the rectangle."""
+
+        x0, x1, y0, y1 = self.limits()
+        x0, y0 = max(int(x0), 0), max(int(y0), 0)
+        x1, y1 = min(int(x1), nx - 1), min(int(y1), ny - 1)
+        if x1 < x0 or y1 < y0:
+            return np.zeros(0, dtype=np.intp)
+
+        x = np.arange(x0, x1 + 1)[np.newaxis, :]
+        y = np.arange(y0, y1 + 1)[:, np.newaxis]
+        inside = np.ones((y.size, x.size), dtype=bool)
+        for (a, b, c), sign in (
+            (self._l12, self._in12),
+            (self._l23, self._in23),
+            (self._l34, self._in34),
+            (self._l41, self._in41),
+        ):
+            inside &= sign * (a * (x + 0.5) + b * (y + 0.5) + c) >= 0.0
+
+        ys, xs = np.nonzero(inside)
+        return (ys + y0) * nx + (xs + x0)
+
     def is_inside(self, p):
         if self._in12 * self._evaluate(self._l12, p) < 0.0:
             return False
@@ -4,11 +4,20 @@ import os
 from xia2.Decorators.DecoratorFactory import DecoratorFactory
 from xia2.Driver.DriverFactory import DriverFactory
 from xia2.Handlers.Phil import PhilIndex
+from xia2.Handlers.ProgramVersions import get_program_versions
 from xia2.Wrappers.CCP4.AimlessHelpers import parse_aimless_xml
 
 logger = logging.getLogger("xia2.Wrappers.CCP4.Aimless")
 
 
+def _parse_aimless_version(banner):
+    version = None
+    for record in banner.split("\n"):
+        if "##" in record and "AIMLESS" in record:
+            version = record.split()[5]
+    return version
+
+
 def Aimless(DriverType=None, absorption_correction=None, decay_correction=None):
     """A factory for AimlessWrapper classes."""
 
@@ -27,23 +36,15 @@ def Aimless(DriverType=None, absorption_correction=None, decay_correction=None):
             if not os.path.exists(self.get_executable()):
                 raise RuntimeError("aimless binary not found")
 
-            self.start()
-            self.close_wait()
-
-            version = None
-
-            for record in self.get_all_output():
-                if "##" in record and "AIMLESS" in record:
-                    version = record.split()[5]
+            version = get_program_versions().get_version(
+                self.get_executable(), _parse_aimless_version
+            )
 
             if not version:
                 raise RuntimeError("version not found")
 
             logger.debug("Using version: %s" % version)
 
-            # clear all the header junk
-            self.reset()
-
             # input and output files
             self._scalepack = False
             self._chef_unmerged = False
@@ -51,6 +51,19 @@ def Integrate(DriverType=None):
 
             self._integration_report = {}
 
+            # only the profile modelling error message is needed from the
+            # standard output, so do not keep all of it in memory
+            self._profile_modelling_error = []
+            self.set_output_record_limit(100)
+            self.add_output_callback(self._find_profile_modelling_error)
+
+        def _find_profile_modelling_error(self, record):
+            if self._profile_modelling_error or (
+                "Too few reflections for profile modelling" in record
+            ):
+                if len(self._profile_modelling_error) < 3:
+                    self._profile_modelling_error.append(record)
+
         def get_per_image_statistics(self):
             return self._per_image_statistics
 
@@ -203,17 +216,17 @@ def Integrate(DriverType=None):
                     "gaussian_rs.min_spots.overall=%d" % self._min_spots_overall
                 )
 
+            self._profile_modelling_error = []
             self.start()
             self.close_wait()
 
-            dials_output = self.get_all_output()
-            for n, record in enumerate(dials_output):
-                if "Too few reflections for profile modelling" in record:
-                    raise DIALSIntegrateError(
-                        "%s\n%s, %s\nsee %%s for more details"
-                        % tuple(dials_output[n + i].strip() for i in (0, 1, 2))
-                        % self.get_log_file()
-                    )
+            if self._profile_modelling_error:
+                message = [record.strip() for record in self._profile_modelling_error]
+                message += [""] * (3 - len(message))
+                raise DIALSIntegrateError(
+                    "%s\n%s, %s\nsee %%s for more details" % tuple(message)
+                    % self.get_log_file()
+                )
 
             self.check_for_errors()
 
@@ -1,11 +1,12 @@
 import datetime
 import logging
 import os
-import subprocess
 import time
 
 from scitbx import matrix
 
+from xia2.Handlers.ProgramVersions import get_program_versions
+
 logger = logging.getLogger("xia2.Wrappers.XDS.XDS")
 
 
@@ -17,40 +18,33 @@ class XDSException(Exception):
         return str(self.value)
 
 
-_xds_version_cache = None
+def _parse_xds_version(banner):
+    assert "VERSION" in banner
+    first_line = banner.split("\n")[1].strip()
+    version = str(first_line.split("(")[1].split(")")[0])
+    assert "VERSION" in version, version
+    return version
 
 
 def get_xds_version():
-    global _xds_version_cache
-    if _xds_version_cache is None:
-        xds_version_str = subprocess.check_output("xds")
-        assert b"VERSION" in xds_version_str
-        first_line = xds_version_str.split(b"\n")[1].strip().decode("latin-1")
-
-        _xds_version_cache = str(first_line.split("(")[1].split(")")[0])
-        assert "VERSION" in _xds_version_cache, _xds_version_cache
-
-    return _xds_version_cache
+    return get_program_versions().get_version("xds", _parse_xds_version)
 
 
-_running_xds_version_stamp = None
+def _parse_xds_version_stamp(banner):
+    assert "VERSION" in banner
+    first_line = banner.split("\n")[1].strip()
+    if "BUILT=" not in banner:
+        format_str = "***** XDS *****  (VERSION  %B %d, %Y)"
+        date = datetime.datetime.strptime(first_line, format_str)
+        return date.year * 10000 + date.month * 100 + date.day
+    s = first_line.index("BUILT=") + 6
+    return int(first_line[s : s + 8])
 
 
 def _running_xds_version():
-    global _running_xds_version_stamp
-    if _running_xds_version_stamp is None:
-        xds_version_str = subprocess.check_output("xds")
-        assert b"VERSION" in xds_version_str
-        first_line = xds_version_str.split("\n")[1].strip().decode("latin-1")
-        if b"BUILT=" not in xds_version_str:
-            format_str = "***** XDS *****  (VERSION  %B %d, %Y)"
-            date = datetime.datetime.strptime(first_line, format_str)
-            _running_xds_version_stamp = date.year * 10000 + date.month * 100 + date.day
-        else:
-            s = first_line.index("BUILT=") + 6
-            _running_xds_version_stamp = int(first_line[s : s + 8])
-
-    return _running_xds_version_stamp
+    # also record the version of xds, for the list of programs used
+    get_xds_version()
+    return _parse_xds_version_stamp(get_program_versions().get_output("xds"))
 
 
 def add_xds_version_to_mtz_history(mtz_file):
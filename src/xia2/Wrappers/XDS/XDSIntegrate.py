@@ -63,6 +63,13 @@ def XDSIntegrate(DriverType=None, params=None):
             else:
                 self.set_executable("xds_par")
 
+            # only the error reports are needed from the standard output,
+            # so do not keep all of it in memory
+
+            self._error_records = []
+            self.set_output_record_limit(100)
+            self.add_output_callback(self._find_error_records)
+
             # generic bits
 
             self._data_range = (0, 0)
@@ -127,6 +134,10 @@ def XDSIntegrate(DriverType=None, params=None):
         def get_per_image_statistics(self):
             return self._per_image_statistics
 
+        def _find_error_records(self, record):
+            if "!!!" in record or "license expired" in record:
+                self._error_records.append(record)
+
         def run(self):
             """Run integrate."""
 
@@ -288,11 +299,12 @@ def XDSIntegrate(DriverType=None, params=None):
                 if src != dst:
                     shutil.copyfile(src, dst)
 
+            self._error_records = []
             self.start()
             self.close_wait()
 
-            xds_check_version_supported(self.get_all_output())
-            xds_check_error(self.get_all_output())
+            xds_check_version_supported(self._error_records)
+            xds_check_error(self._error_records)
 
             # look for errors
             # like this perhaps - what the hell does this mean?
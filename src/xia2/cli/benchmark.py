@@ -0,0 +1,76 @@
+import json
+import logging
+import os
+import sys
+
+import iotbx.phil
+import xia2.Handlers.Streams
+from xia2.Modules.Benchmark import case_names, compare_results, run_benchmarks
+from xia2.XIA2Version import Version
+
+logger = logging.getLogger("xia2.cli.benchmark")
+
+phil_scope = iotbx.phil.parse(
+    """\
+include scope xia2.Modules.Benchmark.phil_scope
+compare = None
+  .type = path
+  .help = "The results of an earlier run, e.g. for a previous release, to "
+          "compare with"
+output {
+  directory = xia2-benchmark
+    .type = path
+    .help = "Directory for the synthetic data"
+  json = xia2-benchmark.json
+    .type = path
+  log = xia2.benchmark.log
+    .type = path
+}
+""",
+    process_includes=True,
+)
+
+
+def run(args=sys.argv[1:]):
+    if "-h" in args or "--help" in args:
+        print("Available cases: %s\n" % " ".join(case_names()))
+        phil_scope.show(attributes_level=1)
+        return
+
+    interp = phil_scope.command_line_argument_interpreter()
+    params, unhandled = interp.process_and_fetch(
+        args, custom_processor="collect_remaining"
+    )
+    if unhandled:
+        sys.exit("Unrecognised arguments: %s" % " ".join(unhandled))
+    diff_phil = phil_scope.fetch_diff(params).as_str()
+    params = params.extract()
+
+    xia2.Handlers.Streams.setup_logging(logfile=params.output.log)
+    logger.info(Version)
+    if diff_phil:
+        logger.info("The following parameters have been modified:\n%s", diff_phil)
+
+    try:
+        results = run_benchmarks(params, os.path.abspath(params.output.directory))
+    except ValueError as e:
+        sys.exit(str(e))
+
+    with open(params.output.json, "w") as fh:
+        json.dump(results, fh, indent=2)
+    logger.info("Benchmark results written to %s", params.output.json)
+
+    if params.compare:
+        with open(params.compare) as fh:
+            reference = json.load(fh)
+        logger.info(
+            "\nComparison with %s (xia2 %s):",
+            params.compare,
+            reference.get("version"),
+        )
+        for name, reference_time, mean, ratio in compare_results(
+            results, reference
+        ):
+            logger.info(
+                "%-24s %9.4fs -> %9.4fs (x%.2f)", name, reference_time, mean, ratio
+            )
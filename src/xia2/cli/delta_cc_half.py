@@ -155,6 +155,7 @@ def run(args=sys.argv[1:]):
         d_min=params.d_min,
         cc_one_half_method=params.cc_one_half_method,
         group_size=params.group_size,
+        nproc=params.nproc,
     )
     logger.info(tabulate(result.get_table(), headers="firstrow"))
     hist_filename = "delta_cc_hist.png"
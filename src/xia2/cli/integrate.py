@@ -4,6 +4,7 @@ import sys
 import traceback
 
 from xia2.Applications.xia2_main import check_environment, help
+import xia2.Driver.timing
 import xia2.Handlers.Streams
 
 logger = logging.getLogger("xia2.cli.integrate")
@@ -28,6 +29,7 @@ def run():
         from .xia2_main import xia2_main
 
         xia2_main(stop_after="integrate")
+        xia2.Driver.timing.write_profile(os.path.join(wd, "xia2-profile.json"))
         logger.info("Status: normal termination")
 
     except Exception as e:
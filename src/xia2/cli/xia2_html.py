@@ -1,3 +1,5 @@
+import concurrent.futures
+import copy
 import glob
 import html
 import json
@@ -5,13 +7,16 @@ import logging
 import os
 import re
 import sys
+import time
 import traceback
 from collections import OrderedDict
 
 from libtbx import phil
 import xia2
+import xia2.Driver.timing
 from xia2.Modules.Report import Report
 from xia2.Handlers.Citations import Citations
+from xia2.Handlers.Files import FileHandler
 import xia2.Handlers.Streams
 
 logger = logging.getLogger("xia2.cli.html")
@@ -25,7 +30,7 @@ def run(args):
     generate_xia2_html(xinfo, args=args)
 
 
-def generate_xia2_html(xinfo, filename="xia2.html", params=None, args=[]):
+def generate_xia2_html(xinfo, filename="xia2.html", params=None, args=[], nproc=1):
     assert params is None or len(args) == 0
     if params is None:
         from xia2.Modules.Analysis import phil_scope
@@ -63,174 +68,83 @@ def generate_xia2_html(xinfo, filename="xia2.html", params=None, args=[]):
 
     individual_dataset_reports = {}
 
-    for cname, xcryst in xinfo.get_crystals().items():
-        reflection_files = xcryst.get_scaled_merged_reflections()
-        for wname, unmerged_mtz in reflection_files["mtz_unmerged"].items():
-            xwav = xcryst.get_xwavelength(wname)
-
-            from xia2.Modules.MultiCrystalAnalysis import batch_phil_scope
-
-            scope = phil.parse(batch_phil_scope)
-            scaler = xcryst._scaler
-            try:
-                for si in scaler._sweep_information.values():
-                    batch_params = scope.extract().batch[0]
-                    batch_params.id = si["sname"]
-                    batch_params.range = si["batches"]
-                    params.batch.append(batch_params)
-            except AttributeError:
-                for si in scaler._sweep_handler._sweep_information.values():
-                    batch_params = scope.extract().batch[0]
-                    batch_params.id = si.get_sweep_name()
-                    batch_params.range = si.get_batch_range()
-                    params.batch.append(batch_params)
-
-            report_path = xinfo.path.joinpath(cname, "report")
-            report_path.mkdir(parents=True, exist_ok=True)
-            report = Report.from_unmerged_mtz(
-                unmerged_mtz, params, report_dir=str(report_path)
-            )
-
-            xtriage_success, xtriage_warnings, xtriage_danger = None, None, None
-            if params.xtriage_analysis:
+    # the report for each wavelength, and the html for each log file, are
+    # independent so may be generated concurrently
+    pool = None
+    if nproc > 1:
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=nproc)
+    try:
+        jobs = []
+        for cname, xcryst in xinfo.get_crystals().items():
+            reflection_files = xcryst.get_scaled_merged_reflections()
+            for wname, unmerged_mtz in reflection_files["mtz_unmerged"].items():
+                xwav = xcryst.get_xwavelength(wname)
+
+                from xia2.Modules.MultiCrystalAnalysis import batch_phil_scope
+
+                scope = phil.parse(batch_phil_scope)
+                scaler = xcryst._scaler
                 try:
+                    for si in scaler._sweep_information.values():
+                        batch_params = scope.extract().batch[0]
+                        batch_params.id = si["sname"]
+                        batch_params.range = si["batches"]
+                        params.batch.append(batch_params)
+                except AttributeError:
+                    for si in scaler._sweep_handler._sweep_information.values():
+                        batch_params = scope.extract().batch[0]
+                        batch_params.id = si.get_sweep_name()
+                        batch_params.range = si.get_batch_range()
+                        params.batch.append(batch_params)
+
+                report_path = xinfo.path.joinpath(cname, "report")
+                report_path.mkdir(parents=True, exist_ok=True)
+                jobs.append(
                     (
-                        xtriage_success,
-                        xtriage_warnings,
-                        xtriage_danger,
-                    ) = report.xtriage_report()
-                except Exception as e:
-                    params.xtriage_analysis = False
-                    logger.debug("Exception running xtriage:")
-                    logger.debug(e, exc_info=True)
-
-            (
-                overall_stats_table,
-                merging_stats_table,
-                stats_plots,
-            ) = report.resolution_plots_and_stats()
-
-            d = {}
-            d["merging_statistics_table"] = merging_stats_table
-            d["overall_statistics_table"] = overall_stats_table
-
-            individual_dataset_reports[wname] = d
-
-            json_data = {}
-
-            if params.xtriage_analysis:
-                json_data["xtriage"] = (
-                    xtriage_success + xtriage_warnings + xtriage_danger
-                )
-
-            json_data.update(stats_plots)
-            json_data.update(report.batch_dependent_plots())
-            json_data.update(report.intensity_stats_plots(run_xtriage=False))
-            json_data.update(report.pychef_plots())
-            json_data.update(report.pychef_plots(n_bins=1))
-
-            from scitbx.array_family import flex
-
-            max_points = 500
-            for g in (
-                "scale_rmerge_vs_batch",
-                "completeness_vs_dose",
-                "rcp_vs_dose",
-                "scp_vs_dose",
-                "rd_vs_batch_difference",
-            ):
-                for i, data in enumerate(json_data[g]["data"]):
-                    x = data["x"]
-                    n = len(x)
-                    if n > max_points:
-                        step = n // max_points
-                        sel = (flex.int_range(n) % step) == 0
-                        data["x"] = list(flex.int(data["x"]).select(sel))
-                        data["y"] = list(flex.double(data["y"]).select(sel))
-
-            resolution_graphs = OrderedDict(
-                (k + "_" + wname, json_data[k])
-                for k in (
-                    "cc_one_half",
-                    "i_over_sig_i",
-                    "second_moments",
-                    "wilson_intensity_plot",
-                    "completeness",
-                    "multiplicity_vs_resolution",
-                )
-                if k in json_data
-            )
-
-            if params.include_radiation_damage:
-                batch_graphs = OrderedDict(
-                    (k + "_" + wname, json_data[k])
-                    for k in (
-                        "scale_rmerge_vs_batch",
-                        "i_over_sig_i_vs_batch",
-                        "completeness_vs_dose",
-                        "rcp_vs_dose",
-                        "scp_vs_dose",
-                        "rd_vs_batch_difference",
+                        wname,
+                        xwav.get_wavelength(),
+                        unmerged_mtz,
+                        copy.deepcopy(params),
+                        str(report_path),
                     )
                 )
-            else:
-                batch_graphs = OrderedDict(
-                    (k + "_" + wname, json_data[k])
-                    for k in ("scale_rmerge_vs_batch", "i_over_sig_i_vs_batch")
-                )
 
-            misc_graphs = OrderedDict(
-                (k, json_data[k])
-                for k in (
-                    "cumulative_intensity_distribution",
-                    "l_test",
-                    "multiplicities",
-                )
-                if k in json_data
-            )
+        log_dir = os.path.join(os.path.abspath(os.path.curdir), "LogFiles")
+        logfiles = glob.glob(os.path.join(log_dir, "*.log"))
 
-            for k, v in report.multiplicity_plots().items():
-                misc_graphs[k + "_" + wname] = {"img": v}
-
-            d["resolution_graphs"] = resolution_graphs
-            d["batch_graphs"] = batch_graphs
-            d["misc_graphs"] = misc_graphs
-            d["xtriage"] = {
-                "success": xtriage_success,
-                "warnings": xtriage_warnings,
-                "danger": xtriage_danger,
-            }
-
-            merging_stats = report.merging_stats
-            merging_stats_anom = report.merging_stats_anom
-
-            overall = merging_stats.overall
-            overall_anom = merging_stats_anom.overall
-            outer_shell = merging_stats.bins[-1]
-            outer_shell_anom = merging_stats_anom.bins[-1]
-
-            column = [
-                wname,
-                str(xwav.get_wavelength()),
-                "%.2f - %.2f (%.2f - %.2f)"
-                % (overall.d_max, overall.d_min, outer_shell.d_max, outer_shell.d_min),
-                "%.2f (%.2f)"
-                % (overall.completeness * 100, outer_shell.completeness * 100),
-                f"{overall.mean_redundancy:.2f} ({outer_shell.mean_redundancy:.2f})",
-                f"{overall.cc_one_half:.4f} ({outer_shell.cc_one_half:.4f})",
-                "%.2f (%.2f)"
-                % (overall.i_over_sigma_mean, outer_shell.i_over_sigma_mean),
-                f"{overall.r_merge:.4f} ({outer_shell.r_merge:.4f})",
-                # anomalous statistics
-                "%.2f (%.2f)"
-                % (
-                    overall_anom.anom_completeness * 100,
-                    outer_shell_anom.anom_completeness * 100,
-                ),
-                "%.2f (%.2f)"
-                % (overall_anom.mean_redundancy, outer_shell_anom.mean_redundancy),
-            ]
-            columns.append(column)
+        if pool:
+            futures = [pool.submit(wavelength_report, *job) for job in jobs]
+            logfile_times = pool.map(_timed_logfile_html, logfiles)
+            results = (future.result() for future in futures)
+        else:
+            results = _serial_wavelength_reports(jobs, params)
+            logfile_times = map(_timed_logfile_html, logfiles)
+
+        for result in results:
+            xia2.Driver.timing.record(result["timing"])
+            # the report may have been generated in another process, so
+            # record its xtriage log here
+            if result["xtriage_log"]:
+                FileHandler.record_log_file("Xtriage", result["xtriage_log"])
+            if not result["xtriage_analysis"]:
+                params.xtriage_analysis = False
+            individual_dataset_reports[result["wname"]] = result["report"]
+            json_data = result["json_data"]
+            unit_cell = result["unit_cell"]
+            columns.append(result["column"])
+
+        logfile_times = list(logfile_times)
+        if logfile_times:
+            xia2.Driver.timing.record(
+                {
+                    "command": "xia2.report log files",
+                    "time_start": min(t[0] for t in logfile_times),
+                    "time_end": max(t[1] for t in logfile_times),
+                }
+            )
+    finally:
+        if pool:
+            pool.shutdown()
 
     table = [[c[i] for c in columns] for i in range(len(columns[0]))]
 
@@ -242,7 +156,6 @@ def generate_xia2_html(xinfo, filename="xia2.html", params=None, args=[]):
     ]
     space_group = space_groups[0].symbol_and_number()
     alternative_space_groups = [sg.symbol_and_number() for sg in space_groups[1:]]
-    unit_cell = str(report.intensities.unit_cell())
 
     # reflection files
 
@@ -337,10 +250,7 @@ def generate_xia2_html(xinfo, filename="xia2.html", params=None, args=[]):
 
     # log files
     log_files_table = []
-    log_dir = os.path.join(os.path.abspath(os.path.curdir), "LogFiles")
-    g = glob.glob(os.path.join(log_dir, "*.log"))
-    for logfile in g:
-        html_file = make_logfile_html(logfile)
+    for logfile in logfiles:
         html_file = os.path.splitext(logfile)[0] + ".html"
         if os.path.exists(html_file):
             log_files_table.append(
@@ -396,6 +306,171 @@ def generate_xia2_html(xinfo, filename="xia2.html", params=None, args=[]):
         f.write(html_source.encode("utf-8", "xmlcharrefreplace"))
 
 
+def _serial_wavelength_reports(jobs, params):
+    # as for the reports generated one after another before, once xtriage
+    # has failed it is not run for the remaining wavelengths
+    for job in jobs:
+        job_params = job[3]
+        job_params.xtriage_analysis = (
+            job_params.xtriage_analysis and params.xtriage_analysis
+        )
+        yield wavelength_report(*job)
+
+
+def wavelength_report(wname, wavelength, unmerged_mtz, params, report_dir):
+    """Generate the report for one wavelength, returning the report sections,
+    the json data for the plots and the column of the overall statistics
+    table, with the time taken. This may run in another process, so the
+    xtriage log file is returned to be recorded by the caller."""
+    time_start = time.time()
+    report = Report.from_unmerged_mtz(unmerged_mtz, params, report_dir=report_dir)
+
+    xtriage_success, xtriage_warnings, xtriage_danger = None, None, None
+    xtriage_log = None
+    if params.xtriage_analysis:
+        try:
+            xtriage_success, xtriage_warnings, xtriage_danger = report.xtriage_report()
+            xtriage_log = os.path.join(report_dir, "xtriage.log")
+        except Exception as e:
+            params.xtriage_analysis = False
+            logger.debug("Exception running xtriage:")
+            logger.debug(e, exc_info=True)
+
+    overall_stats_table, merging_stats_table, stats_plots = (
+        report.resolution_plots_and_stats()
+    )
+
+    d = {}
+    d["merging_statistics_table"] = merging_stats_table
+    d["overall_statistics_table"] = overall_stats_table
+
+    json_data = {}
+
+    if params.xtriage_analysis:
+        json_data["xtriage"] = xtriage_success + xtriage_warnings + xtriage_danger
+
+    json_data.update(stats_plots)
+    json_data.update(report.batch_dependent_plots())
+    json_data.update(report.intensity_stats_plots(run_xtriage=False))
+    json_data.update(report.pychef_plots())
+    json_data.update(report.pychef_plots(n_bins=1))
+
+    from scitbx.array_family import flex
+
+    max_points = 500
+    for g in (
+        "scale_rmerge_vs_batch",
+        "completeness_vs_dose",
+        "rcp_vs_dose",
+        "scp_vs_dose",
+        "rd_vs_batch_difference",
+    ):
+        for i, data in enumerate(json_data[g]["data"]):
+            x = data["x"]
+            n = len(x)
+            if n > max_points:
+                step = n // max_points
+                sel = (flex.int_range(n) % step) == 0
+                data["x"] = list(flex.int(data["x"]).select(sel))
+                data["y"] = list(flex.double(data["y"]).select(sel))
+
+    resolution_graphs = OrderedDict(
+        (k + "_" + wname, json_data[k])
+        for k in (
+            "cc_one_half",
+            "i_over_sig_i",
+            "second_moments",
+            "wilson_intensity_plot",
+            "completeness",
+            "multiplicity_vs_resolution",
+        )
+        if k in json_data
+    )
+
+    if params.include_radiation_damage:
+        batch_graphs = OrderedDict(
+            (k + "_" + wname, json_data[k])
+            for k in (
+                "scale_rmerge_vs_batch",
+                "i_over_sig_i_vs_batch",
+                "completeness_vs_dose",
+                "rcp_vs_dose",
+                "scp_vs_dose",
+                "rd_vs_batch_difference",
+            )
+        )
+    else:
+        batch_graphs = OrderedDict(
+            (k + "_" + wname, json_data[k])
+            for k in ("scale_rmerge_vs_batch", "i_over_sig_i_vs_batch")
+        )
+
+    misc_graphs = OrderedDict(
+        (k, json_data[k])
+        for k in (
+            "cumulative_intensity_distribution",
+            "l_test",
+            "multiplicities",
+        )
+        if k in json_data
+    )
+
+    for k, v in report.multiplicity_plots().items():
+        misc_graphs[k + "_" + wname] = {"img": v}
+
+    d["resolution_graphs"] = resolution_graphs
+    d["batch_graphs"] = batch_graphs
+    d["misc_graphs"] = misc_graphs
+    d["xtriage"] = {
+        "success": xtriage_success,
+        "warnings": xtriage_warnings,
+        "danger": xtriage_danger,
+    }
+
+    merging_stats = report.merging_stats
+    merging_stats_anom = report.merging_stats_anom
+
+    overall = merging_stats.overall
+    overall_anom = merging_stats_anom.overall
+    outer_shell = merging_stats.bins[-1]
+    outer_shell_anom = merging_stats_anom.bins[-1]
+
+    column = [
+        wname,
+        str(wavelength),
+        "%.2f - %.2f (%.2f - %.2f)"
+        % (overall.d_max, overall.d_min, outer_shell.d_max, outer_shell.d_min),
+        "%.2f (%.2f)" % (overall.completeness * 100, outer_shell.completeness * 100),
+        f"{overall.mean_redundancy:.2f} ({outer_shell.mean_redundancy:.2f})",
+        f"{overall.cc_one_half:.4f} ({outer_shell.cc_one_half:.4f})",
+        "%.2f (%.2f)" % (overall.i_over_sigma_mean, outer_shell.i_over_sigma_mean),
+        f"{overall.r_merge:.4f} ({outer_shell.r_merge:.4f})",
+        # anomalous statistics
+        "%.2f (%.2f)"
+        % (
+            overall_anom.anom_completeness * 100,
+            outer_shell_anom.anom_completeness * 100,
+        ),
+        "%.2f (%.2f)"
+        % (overall_anom.mean_redundancy, outer_shell_anom.mean_redundancy),
+    ]
+
+    return {
+        "wname": wname,
+        "report": d,
+        "json_data": json_data,
+        "column": column,
+        "unit_cell": str(report.intensities.unit_cell()),
+        "xtriage_log": xtriage_log,
+        "xtriage_analysis": params.xtriage_analysis,
+        "timing": {
+            "command": "xia2.report %s" % wname,
+            "time_start": time_start,
+            "time_end": time.time(),
+        },
+    }
+
+
 def make_logfile_html(logfile):
     tables = extract_loggraph_tables(logfile)
     if not tables:
@@ -453,6 +528,12 @@ def make_logfile_html(logfile):
     return html_file
 
 
+def _timed_logfile_html(logfile):
+    time_start = time.time()
+    make_logfile_html(logfile)
+    return time_start, time.time()
+
+
 def rst2html(rst):
     from docutils.core import publish_string
     from docutils.writers.html4css1 import Writer, HTMLTranslator
@@ -1,5 +1,7 @@
+import glob
 import logging
 import os
+import pathlib
 import sys
 import time
 import traceback
@@ -10,15 +12,21 @@ from libtbx import group_args
 import xia2.Driver.timing
 import xia2.Handlers.Streams
 import xia2.XIA2Version
-from xia2.Applications.xia2_helpers import process_one_sweep
+from xia2.Applications.xia2_helpers import (
+    SweepScheduler,
+    process_one_sweep,
+    write_sweep_state,
+)
 from xia2.Applications.xia2_main import (
     check_environment,
     get_command_line,
     help,
     write_citations,
 )
+from xia2.Handlers.Checkpoint import CheckpointStore
 from xia2.Handlers.Citations import Citations
 from xia2.Handlers.Files import cleanup
+from xia2.Handlers.ProgramVersions import get_program_versions
 from xia2.Schema.XProject import XProject
 from xia2.Schema.XSweep import XSweep
 
@@ -63,17 +71,34 @@ def xia2_main(stop_after=None):
     params = PhilIndex.get_python_object()
     mp_params = params.xia2.settings.multiprocessing
     njob = mp_params.njob
+    if mp_params.type == "async":
+        from xia2.Driver import AsyncDriver
+
+        # the programs run by the concurrent jobs share njob x nproc cores
+        AsyncDriver.set_cpu_budget(njob * mp_params.nproc)
 
     xinfo = CommandLine.get_xinfo()
     logger.info("Project directory: %s", xinfo.path)
 
-    if (
+    # the state of each sweep and crystal, written as its processing completes
+    checkpoint = CheckpointStore("xia2-checkpoint")
+    continue_from_previous_job = (
         params.xia2.settings.developmental.continue_from_previous_job
-        and os.path.exists("xia2.json")
+    )
+    if not continue_from_previous_job:
+        checkpoint.clear()
+
+    if continue_from_previous_job and (
+        checkpoint.exists() or os.path.exists("xia2.json")
     ):
-        logger.debug("==== Starting from existing xia2.json ====")
         xinfo_new = xinfo
-        xinfo = XProject.from_json(filename="xia2.json")
+        if checkpoint.exists():
+            logger.debug("==== Starting from existing checkpoint ====")
+            # the scalers are reset below, so need not be restored
+            xinfo = checkpoint.load_project(include_scalers=False)
+        else:
+            logger.debug("==== Starting from existing xia2.json ====")
+            xinfo = XProject.from_json(filename="xia2.json")
 
         crystals = xinfo.get_crystals()
         crystals_new = xinfo_new.get_crystals()
@@ -134,11 +159,21 @@ def xia2_main(stop_after=None):
 
     failover = params.xia2.settings.failover
 
-    with cleanup(xinfo.path):
+    if params.xia2.settings.developmental.project_directory:
+        # a sweep job of a parallel xia2 run: keep the log and data files
+        # apart from those of the parent job sharing the project directory
+        cleanup_path = pathlib.Path(os.getcwd()).absolute()
+    else:
+        cleanup_path = xinfo.path
+
+    with cleanup(cleanup_path):
+        checkpoint.write_project(xinfo)
+
         if mp_params.mode == "parallel" and njob > 1:
             driver_type = mp_params.type
             command_line_args = CommandLine.get_argv()[1:]
             jobs = []
+            weights = []
             for crystal_id in crystals:
                 for wavelength_id in crystals[crystal_id].get_wavelength_names():
                     wavelength = crystals[crystal_id].get_xwavelength(wavelength_id)
@@ -147,6 +182,8 @@ def xia2_main(stop_after=None):
                         sweep._get_indexer()
                         sweep._get_refiner()
                         sweep._get_integrater()
+                        start, end = sweep.get_image_range()
+                        weights.append(end - start + 1)
                         jobs.append(
                             (
                                 group_args(
@@ -168,24 +205,22 @@ def xia2_main(stop_after=None):
 
             # run every nth job on the current computer (no need to submit to qsub)
             for i_job, arg in enumerate(jobs):
-                if (i_job % njob) == 0:
+                if (i_job % njob) == 0 and driver_type != "async":
                     arg[0].driver_type = default_driver_type
 
-            nproc = mp_params.nproc
-            qsub_command = mp_params.qsub_command or "qsub"
-            qsub_command = "%s -V -cwd -pe smp %d" % (qsub_command, nproc)
+            # share all of the cores between the sweeps in proportion to their
+            # size, rather than a fixed nproc for each sweep
+            scheduler = SweepScheduler(
+                total_cores=njob * mp_params.nproc, max_jobs=njob
+            )
 
-            from libtbx import easy_mp
+            def run_one_sweep(job, nproc):
+                job[0].nproc = nproc
+                return process_one_sweep(job)
 
-            results = easy_mp.parallel_map(
-                process_one_sweep,
-                jobs,
-                processes=njob,
-                method="multiprocessing",
-                qsub_command=qsub_command,
-                preserve_order=True,
-                preserve_exception_message=True,
-            )
+            results = scheduler.run(run_one_sweep, jobs, weights)
+            for record in scheduler.report(names=[j[0].sweep_id for j in jobs]):
+                logger.info(record)
 
             # Hack to update sweep with the serialized indexers/refiners/integraters
             i_sweep = 0
@@ -208,6 +243,7 @@ def xia2_main(stop_after=None):
                             sweep._indexer = new_sweep._indexer
                             sweep._refiner = new_sweep._refiner
                             sweep._integrater = new_sweep._integrater
+                            checkpoint.write_sweep(crystal_id, wavelength_id, sweep)
                         i_sweep += 1
                     for sweep in remove_sweeps:
                         wavelength.remove_sweep(sweep)
@@ -239,6 +275,9 @@ def xia2_main(stop_after=None):
                             else:
                                 sweep.get_integrater_intensities()
                             sweep.serialize()
+                            checkpoint.write_sweep(crystal_id, wavelength_id, sweep)
+                            if stop_after not in ("index", "integrate"):
+                                crystals[crystal_id].prepare_scaler_sweep(sweep)
                         except Exception as e:
                             if failover:
                                 logger.info(
@@ -253,18 +292,27 @@ def xia2_main(stop_after=None):
                         wavelength.remove_sweep(sweep)
                         sample = sweep.sample
                         sample.remove_sweep(sweep)
+                    if remove_sweeps:
+                        # the scaler may already have been given the failed sweeps
+                        crystals[crystal_id]._scaler = None
+
+            if params.xia2.settings.developmental.project_directory:
+                write_sweep_state(crystals, "xia2-sweeps.state")
 
         # save intermediate xia2.json file in case scaling step fails
         xinfo.as_json(filename="xia2.json")
+        checkpoint.write_project(xinfo)
 
         if stop_after not in ("index", "integrate"):
             logger.info(xinfo.get_output())
 
-        for crystal in list(crystals.values()):
+        for crystal_id, crystal in list(crystals.items()):
             crystal.serialize()
+            checkpoint.write_scaler(crystal_id, crystal)
 
         # save final xia2.json file in case report generation fails
         xinfo.as_json(filename="xia2.json")
+        checkpoint.write_project(xinfo)
 
         if stop_after not in ("index", "integrate"):
             # and the summary file
@@ -280,9 +328,14 @@ def xia2_main(stop_after=None):
                 params.xia2.settings.report.xtriage_analysis = False
                 params.xia2.settings.report.include_radiation_damage = False
 
-            with xia2.Driver.timing.record_step("xia2.report"):
+            with xia2.Driver.timing.record_step(
+                "xia2.report"
+            ), xia2.Driver.timing.record_stage("report"):
                 generate_xia2_html(
-                    xinfo, filename="xia2.html", params=params.xia2.settings.report
+                    xinfo,
+                    filename="xia2.html",
+                    params=params.xia2.settings.report,
+                    nproc=mp_params.nproc,
                 )
 
         duration = time.time() - start_time
@@ -328,6 +381,13 @@ def run():
         xia2_main()
         logger.debug("\nTiming report:")
         logger.debug("\n".join(xia2.Driver.timing.report()))
+        logger.debug("\nProgram versions:")
+        logger.debug("\n".join(get_program_versions().report()))
+        xia2.Driver.timing.write_profile(
+            os.path.join(wd, "xia2-profile.json"),
+            trace_filename=os.path.join(wd, "xia2-trace.json"),
+            include=sorted(glob.glob(os.path.join(wd, "xia2-profile-*.json"))),
+        )
         logger.info("Status: normal termination")
         return
     except Sorry as s: